@@ -78,6 +78,7 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "django.contrib.flatpages.middleware.FlatpageFallbackMiddleware",
     "reversion.middleware.RevisionMiddleware",
+    "main_app.middleware.DeferSourceCountUpdatesMiddleware",
 ]
 
 ROOT_URLCONF = "cantusdb.urls"
@@ -119,6 +120,27 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# The default file-based cache is shared by all the gunicorn workers of a
+# container. Set CANTUSDB_CACHE_BACKEND and CANTUSDB_CACHE_LOCATION to use
+# another backend, e.g. "django.core.cache.backends.redis.RedisCache" and
+# "redis://redis:6379", or "django.core.cache.backends.locmem.LocMemCache".
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CANTUSDB_CACHE_BACKEND",
+            "django.core.cache.backends.filebased.FileBasedCache",
+        ),
+        "LOCATION": os.getenv("CANTUSDB_CACHE_LOCATION", "/tmp/cantusdb_cache"),
+    }
+}
+
+# Tests run with a dummy cache instead (see cantusdb/test_runner.py)
+TEST_RUNNER = "cantusdb.test_runner.TestRunner"
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
@@ -18,6 +18,14 @@ class SourceKeyFilter(InputFilter):
 @admin.register(Chant)
 class ChantAdmin(BaseModelAdmin):
 
+    def reversion_register(self, model, **kwargs):
+        # the search vector is derived from the chant's other fields whenever it
+        # is saved (see signals.update_chant_search_vector()), and until it is
+        # fetched again, a saved chant holds the expression that computed it
+        # rather than its value, so it is left out of the chant's versions
+        kwargs["exclude"] = ("search_vector",)
+        super().reversion_register(model, **kwargs)
+
     def get_queryset(self, request):
         return (
             super()
@@ -59,8 +67,12 @@ class ChantAdmin(BaseModelAdmin):
         "is_last_chant_in_feast",
         "visible_status",
         "date",
+        "folio_sort_key",
         "volpiano_notes",
         "volpiano_intervals",
+        "volpiano_interval_codes",
+        "text_melody_alignment",
+        "text_melody_alignment_digest",
         "title",
         "differentiae_database",
     )
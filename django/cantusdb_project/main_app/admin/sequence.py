@@ -30,6 +30,9 @@ class SequenceAdmin(BaseModelAdmin):
         "next_chant",
         "is_last_chant_in_feast",
         "visible_status",
+        "folio_sort_key",
+        "text_melody_alignment",
+        "text_melody_alignment_digest",
     )
     list_display = ("incipit", "get_source_siglum", "genre")
     list_filter = (
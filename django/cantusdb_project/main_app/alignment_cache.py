@@ -0,0 +1,210 @@
+"""
+Cached syllabification of chant texts, and alignment of texts with melodies.
+
+The chant detail page (views.chant.ChantDetailView) and the chant editing pages
+(views.chant.SourceEditChantsView and ChantEditSyllabificationView) display a
+chant's text aligned with its melody, which volpiano_display_utilities
+computes by syllabifying the text, in Python, every time a page is rendered.
+
+The results are stored in Django's cache framework without a timeout. Their
+cache keys are a hash of the arguments of the function and of the version of
+volpiano_display_utilities, so an entry never needs to be invalidated: when a
+chant's text or melody is edited, or the library is upgraded, the new results
+are stored under new keys (and the old entries are eventually evicted).
+
+Results are cached when they are first computed, or in advance by the
+warm_alignment_cache command. Texts that can't be syllabified (that raise a
+LatinError) aren't cached.
+
+The alignment displayed on the chant detail page is also stored with each
+chant, in Chant.text_melody_alignment, along with the hash of the arguments it
+was computed from (Chant.text_melody_alignment_digest). It is recomputed when
+the chant is saved with another text or melody (see
+signals.on_chant_pre_save()), and for all the chants whose stored alignment is
+missing or out of date by the backfill_chant_alignments command. The pages
+fall back to the cached alignment when the stored one is out of date, e.g. for
+chants that were created by chant_import.py, or after the library is upgraded.
+"""
+
+from functools import lru_cache
+from hashlib import md5
+from importlib.metadata import PackageNotFoundError, version
+from typing import Any, Iterable, Optional
+
+import ujson
+from django.core.cache import cache
+from volpiano_display_utilities.cantus_text_syllabification import syllabify_text
+from volpiano_display_utilities.latin_word_syllabification import LatinError
+from volpiano_display_utilities.text_volpiano_alignment import align_text_and_volpiano
+
+from main_app.models import Chant
+
+
+@lru_cache(maxsize=None)
+def get_library_version() -> str:
+    """Return the installed version of volpiano_display_utilities."""
+    for name in ("volpiano-display-utilities", "volpiano_display_utilities"):
+        try:
+            return version(name)
+        except PackageNotFoundError:
+            pass
+    return "unknown"
+
+
+def get_alignment_digest(*args: Any) -> str:
+    """Hash the arguments of a function of volpiano_display_utilities along with
+    the version of the library (as chant texts can be long and contain characters
+    that aren't allowed in cache keys)."""
+    arguments = ujson.dumps([get_library_version(), *args], ensure_ascii=False)
+    return md5(arguments.encode(), usedforsecurity=False).hexdigest()
+
+
+def get_alignment_cache_key(function_name: str, *args: Any) -> str:
+    """Build the cache key of the result of a function of volpiano_display_utilities
+    for some arguments."""
+    return f"alignment:{function_name}:{get_alignment_digest(*args)}"
+
+
+def cached_align_text_and_volpiano(
+    chant_text: str, volpiano: str, text_presyllabified: bool = False
+) -> tuple:
+    """align_text_and_volpiano(), whose result is cached (see the module docstring).
+
+    Raises:
+        LatinError: If the text can't be syllabified
+    """
+    key = get_alignment_cache_key(
+        "align_text_and_volpiano", chant_text, volpiano, text_presyllabified
+    )
+    result = cache.get(key)
+    if result is None:
+        result = align_text_and_volpiano(
+            chant_text, volpiano, text_presyllabified=text_presyllabified
+        )
+        cache.set(key, result, timeout=None)
+    return result
+
+
+def cached_syllabify_text(
+    text: str, clean_text: bool = False, text_presyllabified: bool = False
+) -> tuple:
+    """syllabify_text(), whose result is cached (see the module docstring).
+
+    Raises:
+        LatinError: If the text can't be syllabified
+    """
+    key = get_alignment_cache_key(
+        "syllabify_text", text, clean_text, text_presyllabified
+    )
+    result = cache.get(key)
+    if result is None:
+        result = syllabify_text(
+            text=text, clean_text=clean_text, text_presyllabified=text_presyllabified
+        )
+        cache.set(key, result, timeout=None)
+    return result
+
+
+def get_chant_alignment_args(chant: Chant) -> tuple[str, str, bool]:
+    """Return the arguments of align_text_and_volpiano() for a chant with
+    volpiano, as used on the chant detail page: its syllabized text if it has
+    one, or else the text that is syllabified automatically."""
+    return (
+        chant.get_best_text_for_syllabizing(),
+        chant.volpiano,
+        bool(chant.manuscript_syllabized_full_text),
+    )
+
+
+def align_chant(chant: Chant) -> tuple:
+    """Align the text of a chant with volpiano with its melody.
+
+    Raises:
+        LatinError: If the text can't be syllabified
+    """
+    chant_text, volpiano, text_presyllabified = get_chant_alignment_args(chant)
+    return cached_align_text_and_volpiano(
+        chant_text, volpiano, text_presyllabified=text_presyllabified
+    )
+
+
+def cache_chant_alignments(chants: Iterable[Chant]) -> tuple[int, int]:
+    """Compute and cache the alignments of those chants (with volpiano) whose
+    alignment isn't cached yet, as displayed on the chant detail page.
+
+    Called by the warm_alignment_cache command.
+
+    Returns:
+        tuple[int, int]: The number of alignments computed, and the number of
+            chants whose text couldn't be syllabified
+    """
+    keys: dict[str, tuple[str, str, bool]] = {}
+    for chant in chants:
+        args = get_chant_alignment_args(chant)
+        keys[get_alignment_cache_key("align_text_and_volpiano", *args)] = args
+    missing = keys.keys() - cache.get_many(keys.keys()).keys()
+
+    results = {}
+    errors = 0
+    for key in missing:
+        chant_text, volpiano, text_presyllabified = keys[key]
+        try:
+            results[key] = align_text_and_volpiano(
+                chant_text, volpiano, text_presyllabified=text_presyllabified
+            )
+        except LatinError:
+            errors += 1
+    cache.set_many(results, timeout=None)
+    return len(results), errors
+
+
+def compute_alignment(
+    chant_text: str, volpiano: str, text_presyllabified: bool
+) -> Optional[list]:
+    """Align a text with a melody, as stored in Chant.text_melody_alignment.
+
+    Returns:
+        Optional[list]: The pairs of syllables and their neumes, or None if the
+            text can't be syllabified
+    """
+    try:
+        text_and_mel, _ = align_text_and_volpiano(
+            chant_text, volpiano, text_presyllabified=text_presyllabified
+        )
+    except LatinError:
+        return None
+    # the same structure as once loaded from the JSON field
+    return ujson.loads(ujson.dumps(text_and_mel, ensure_ascii=False))
+
+
+def update_chant_alignment(chant: Chant) -> None:
+    """When saving a Chant, recompute its stored alignment if its text or melody
+    has changed since it was computed.
+
+    Called in signals.on_chant_pre_save()
+    """
+    if not chant.volpiano:
+        chant.text_melody_alignment = None
+        chant.text_melody_alignment_digest = None
+        return
+    args = get_chant_alignment_args(chant)
+    digest = get_alignment_digest(*args)
+    if digest != chant.text_melody_alignment_digest:
+        chant.text_melody_alignment = compute_alignment(*args)
+        chant.text_melody_alignment_digest = digest
+
+
+def get_chant_alignment(chant: Chant) -> list:
+    """Return the alignment of the text of a chant with volpiano with its
+    melody: the one stored with the chant if it is up to date, or else the
+    cached one.
+
+    Raises:
+        LatinError: If the text can't be syllabified
+    """
+    if chant.text_melody_alignment is not None:
+        digest = get_alignment_digest(*get_chant_alignment_args(chant))
+        if digest == chant.text_melody_alignment_digest:
+            return chant.text_melody_alignment
+    text_and_mel, _ = align_chant(chant)
+    return text_and_mel
@@ -0,0 +1,151 @@
+"""
+Cached responses of the views that list the chants with a given Cantus ID.
+
+Cantus Index and the other databases of the Cantus Network call these views
+(views.api.json_cid_export, json_melody_export and ajax_melody_list) over and
+over for the same Cantus IDs. Their responses are stored in Django's cache
+framework, and sent with an ETag (a hash of their content) and a Last-Modified
+date, so that clients that send them back in If-None-Match or If-Modified-Since
+get a 304 response while nothing has changed.
+
+The Last-Modified date is the latest date_updated of the listed chants (set by
+the views), or the time at which the cached responses were last invalidated
+(see below), if that is later: the content of a response also changes when a
+chant is deleted or given another Cantus ID, or when a source or feast is
+renamed, which date_updated doesn't record.
+
+The cache keys of a Cantus ID include a version token (the time at which it was
+created, in nanoseconds), which is replaced when a
+chant with that Cantus ID is saved or deleted, or is given another Cantus ID
+(see signals.py, chant_import.py and the add_cantus_index_merge_events
+command). A second, global, token is replaced when a source, institution,
+feast, genre or service is saved or deleted, as their fields are displayed
+along with the chants.
+"""
+
+from functools import wraps
+from hashlib import md5
+from math import ceil
+from time import time_ns
+from typing import Callable, Iterable, Optional
+
+from django.core.cache import cache
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+from main_app.source_navigation import delete_version
+
+# cached responses are also refreshed after this many seconds
+CANTUS_ID_CACHE_TIMEOUT = 60 * 60 * 24
+
+GLOBAL_VERSION_KEY = "cantus-id-version"
+
+
+def get_cantus_id_version_key(cantus_id: str) -> str:
+    # Cantus IDs may contain characters that aren't allowed in cache keys
+    digest = md5(cantus_id.encode(), usedforsecurity=False).hexdigest()
+    return f"cantus-id-version:{digest}"
+
+
+def get_versions(cantus_id: str) -> tuple[int, int]:
+    """Return the current version tokens for a Cantus ID's cached responses,
+    creating them if they don't exist yet (or have been evicted from the cache)."""
+    keys = [GLOBAL_VERSION_KEY, get_cantus_id_version_key(cantus_id)]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # if another request has just created the token, use theirs
+            cache.add(key, time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return versions[keys[0]], versions[keys[1]]
+
+
+def invalidate_cantus_id(cantus_id: Optional[str]) -> None:
+    """Mark the cached responses of a Cantus ID as stale.
+
+    Called when a chant with this Cantus ID is saved or deleted, or when chants
+    are given this Cantus ID or another one instead.
+    """
+    if cantus_id:
+        delete_version(get_cantus_id_version_key(cantus_id))
+
+
+def invalidate_cantus_ids(cantus_ids: Iterable[Optional[str]]) -> None:
+    for cantus_id in set(cantus_ids):
+        invalidate_cantus_id(cantus_id)
+
+
+def invalidate_all_cantus_ids() -> None:
+    """Mark the cached responses of every Cantus ID as stale.
+
+    Called when a source, institution, feast, genre or service is saved or
+    deleted.
+    """
+    delete_version(GLOBAL_VERSION_KEY)
+
+
+def get_cantus_id_cache_key(
+    request: HttpRequest, view_name: str, cantus_id: str, versions: tuple[int, int]
+) -> str:
+    """Build the cache key of a response, from the view, the Cantus ID and its
+    version tokens (see get_versions()), the scheme and domain of the request
+    (as some views return absolute URLs) and whether the user is logged in (as
+    they can see unpublished sources)."""
+    base_url = request.build_absolute_uri("/")
+    authenticated = int(request.user.is_authenticated)
+    digest = md5(f"{cantus_id}\n{base_url}".encode(), usedforsecurity=False).hexdigest()
+    version = f"{versions[0]}:{versions[1]}"
+    return f"cantus-id:{version}:{view_name}:{authenticated}:{digest}"
+
+
+def set_last_modified(response: HttpResponse, chants: Iterable) -> None:
+    """Set the Last-Modified header of a response to the latest date_updated
+    of the chants it lists, if there are any."""
+    last_updated = max((chant.date_updated for chant in chants), default=None)
+    if last_updated is not None:
+        response["Last-Modified"] = http_date(last_updated.timestamp())
+
+
+def cache_cantus_id_response(view: Callable) -> Callable:
+    """Decorator for views that take a Cantus ID, which caches their successful
+    responses to GET requests (see the module docstring), and answers
+    conditional requests for them with a 304 response.
+
+    The views can set the Last-Modified header of their responses with
+    set_last_modified().
+    """
+
+    @wraps(view)
+    def wrapper(request: HttpRequest, cantus_id: str, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return view(request, cantus_id, *args, **kwargs)
+
+        versions = get_versions(cantus_id)
+        key = get_cantus_id_cache_key(request, view.__name__, cantus_id, versions)
+        response: Optional[HttpResponse] = cache.get(key)
+        if response is None:
+            response = view(request, cantus_id, *args, **kwargs)
+            if response.status_code != 200 or response.streaming:
+                return response
+            response["ETag"] = quote_etag(
+                md5(response.content, usedforsecurity=False).hexdigest()
+            )
+            # the time (in seconds, rounded up) at which the responses of the
+            # Cantus ID were last invalidated
+            last_modified = ceil(max(versions) / 1e9)
+            if response.has_header("Last-Modified"):
+                last_modified = max(
+                    last_modified, parse_http_date_safe(response["Last-Modified"]) or 0
+                )
+            response["Last-Modified"] = http_date(last_modified)
+            cache.set(key, response, CANTUS_ID_CACHE_TIMEOUT)
+
+        return get_conditional_response(
+            request,
+            etag=response["ETag"],
+            last_modified=parse_http_date_safe(response["Last-Modified"]),
+            response=response,
+        )
+
+    return wrapper
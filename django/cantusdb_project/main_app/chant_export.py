@@ -0,0 +1,119 @@
+"""
+The rows of the CSV export of a source (see views.api.csv_export), which are
+also written by the export_chants command, and read back by chant_import.
+"""
+
+from typing import Iterator
+
+from django.db.models import QuerySet
+
+from main_app.models import Source
+
+# the columns written by views.api.csv_export, in order
+CSV_COLUMNS: tuple[str, ...] = (
+    "shelfmark",
+    "holding_institution",
+    "marginalia",
+    "folio",
+    "sequence",
+    "incipit",
+    "feast",
+    "service",
+    "genre",
+    "position",
+    "cantus_id",
+    "mode",
+    "finalis",
+    "differentia",
+    "differentiae_database",
+    "fulltext_standardized",
+    "fulltext_ms",
+    "volpiano",
+    "image_link",
+    "melody_id",
+    "addendum",
+    "extra",
+    "node_id",
+)
+
+# the fields of chants and sequences in each row, after the source's shelfmark
+# and holding institution. "c_sequence" and "s_sequence" are both written to
+# the "sequence" column.
+EXPORT_FIELDS: tuple[str, ...] = (
+    "marginalia",
+    "folio",
+    "c_sequence",
+    "s_sequence",
+    "incipit",
+    "feast__name",
+    "service__name",
+    "genre__name",
+    "position",
+    "cantus_id",
+    "mode",
+    "finalis",
+    "differentia",
+    "diff_db__differentia_id",
+    "manuscript_full_text_std_spelling",
+    "manuscript_full_text",
+    "volpiano",
+    "image_link",
+    "melody_id",
+    "addendum",
+    "extra",
+    "id",
+)
+
+# number of rows fetched from the database at a time
+DEFAULT_CHUNK_SIZE = 2000
+
+# "4064" is the segment id of the sequence DB, sources in that segment have sequences instead of chants
+SEQUENCE_SEGMENT_ID = 4064
+
+
+def get_export_entries(source: Source) -> QuerySet:
+    """Return the chants of a source, or its sequences if it is in the sequence
+    database, in the order in which they are exported."""
+    if source.segment_id == SEQUENCE_SEGMENT_ID:
+        return source.sequence_set.order_by("id")
+    return source.chant_set.order_by("id")
+
+
+def iter_export_rows(
+    source: Source, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[list]:
+    """
+    Yields the rows of the CSV export of a source, with the values of the
+    columns in CSV_COLUMNS.
+
+    The source's chants or sequences are read with a server-side cursor,
+    `chunk_size` at a time, with the names of their feast, service and genre
+    joined in SQL, so that any source can be exported in the same amount of
+    memory.
+
+    Args:
+        source (Source): The source to export, with its holding institution
+        chunk_size (int): The number of chants to fetch at a time
+
+    Returns:
+        Iterator[list]: The rows of the source's chants or sequences
+    """
+    shelfmark = source.shelfmark
+    holding_institution = (
+        str(source.holding_institution) if source.holding_institution else None
+    )
+    rows = (
+        get_export_entries(source)
+        .values_list(*EXPORT_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+    for marginalia, folio, c_sequence, s_sequence, *fields in rows:
+        yield [
+            shelfmark,
+            holding_institution,
+            marginalia,
+            folio,
+            # if entry has a c_sequence, it's a Chant. If it doesn't, it's a Sequence, so write its s_sequence
+            c_sequence if c_sequence is not None else s_sequence,
+            *fields,
+        ]
@@ -0,0 +1,265 @@
+"""
+Bulk import of a source's chants from a CSV file.
+
+The CSV file has the same columns as the CSV export of a source (see
+views.api.csv_export), so a file exported from one source (or prepared in a
+spreadsheet with the same header) can be loaded into another.
+
+Saving chants one at a time runs `full_clean()` (one query per foreign key)
+and the pre_save/post_save signals for every chant. Instead, `import_chants()`:
+- validates all rows before writing anything, using the model fields'
+  validators,
+- resolves feast, service, genre and differentia names with lookup tables
+  built with one query per model,
+- computes the incipit, folio sort key and melody search fields of each chant
+  with the same functions as the pre_save signal, and inserts the chants with
+  `bulk_create()`,
+- computes the search vectors of all the new chants with a single query, and
+- recomputes the source's number_of_chants and number_of_melodies with a
+  single query.
+
+As no signals are sent, no revisions are created for the imported chants.
+"""
+
+import csv
+from typing import Iterable, Iterator, Optional, TextIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVector
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Value
+
+from main_app.cantus_id_cache import invalidate_cantus_ids
+from main_app.chant_export import CSV_COLUMNS, SEQUENCE_SEGMENT_ID
+from main_app.melody_fields import generate_melody_fields
+from main_app.models import Chant, Differentia, Feast, Genre, Service, Source
+from main_app.signals import (
+    refresh_source_counts,
+    update_chant_incipit_field,
+    update_folio_sort_key,
+)
+from main_app.source_navigation import invalidate_source_navigation
+
+User = get_user_model()
+
+# CSV columns that are copied to a field of the new chant, and that field's name.
+# "shelfmark" and "holding_institution" describe the source the chants are
+# exported from, and "node_id" is the ID of the exported chant, so they are not
+# imported.
+FIELD_COLUMNS: dict[str, str] = {
+    "marginalia": "marginalia",
+    "folio": "folio",
+    "sequence": "c_sequence",
+    "incipit": "incipit",
+    "position": "position",
+    "cantus_id": "cantus_id",
+    "mode": "mode",
+    "finalis": "finalis",
+    "differentia": "differentia",
+    "differentiae_database": "differentiae_database",
+    "fulltext_standardized": "manuscript_full_text_std_spelling",
+    "fulltext_ms": "manuscript_full_text",
+    "volpiano": "volpiano",
+    "image_link": "image_link",
+    "melody_id": "melody_id",
+    "addendum": "addendum",
+    "extra": "extra",
+}
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+class ChantImportError(Exception):
+    """Raised when a CSV file can't be imported. Nothing is written to the
+    database when this is raised.
+
+    Attributes:
+        errors (list[str]): A description of each problem found in the file
+    """
+
+    def __init__(self, errors: list[str]):
+        self.errors = errors
+        super().__init__("\n".join(errors))
+
+
+class NameLookup:
+    """Map the names used in a CSV file to the objects they refer to.
+
+    All objects of the model are fetched with a single query. Names that are
+    shared by several objects are ambiguous and can't be resolved.
+    """
+
+    def __init__(self, objects: Iterable, name_field: str):
+        self.objects: dict[str, object] = {}
+        self.ambiguous: set[str] = set()
+        for obj in objects:
+            name = getattr(obj, name_field)
+            if name in self.objects:
+                self.ambiguous.add(name)
+            self.objects[name] = obj
+
+    def get(self, name: str):
+        """Return the object with the given name.
+
+        Raises:
+            ValidationError: If no object, or several objects, have this name
+        """
+        if name in self.ambiguous:
+            raise ValidationError(f'"{name}" is ambiguous')
+        try:
+            return self.objects[name]
+        except KeyError:
+            raise ValidationError(f'"{name}" does not exist') from None
+
+
+def iter_rows(csv_file: TextIO) -> Iterator[dict[str, str]]:
+    """Read a CSV file, checking that its header has the columns of
+    views.api.csv_export.
+
+    Raises:
+        ChantImportError: If the header is missing some columns
+    """
+    reader = csv.DictReader(csv_file)
+    header = reader.fieldnames or []
+    missing_columns = [column for column in CSV_COLUMNS if column not in header]
+    if missing_columns:
+        raise ChantImportError(
+            [f"Missing column(s): {', '.join(missing_columns)}"],
+        )
+    yield from reader
+
+
+def build_chants(
+    source: Source,
+    rows: Iterable[dict[str, str]],
+    user: Optional[User] = None,
+) -> list[Chant]:
+    """Validate the rows of a CSV file and build the (unsaved) chants they describe.
+
+    Every row is validated, so that all problems in the file can be reported at once.
+
+    Raises:
+        ChantImportError: If any of the rows is invalid
+    """
+    feasts = NameLookup(Feast.objects.only("id", "name"), "name")
+    services = NameLookup(Service.objects.only("id", "name"), "name")
+    genres = NameLookup(Genre.objects.only("id", "name"), "name")
+    differentiae = NameLookup(
+        Differentia.objects.only("id", "differentia_id"), "differentia_id"
+    )
+    related_lookups: dict[str, tuple[str, NameLookup]] = {
+        "feast": ("feast", feasts),
+        "service": ("service", services),
+        "genre": ("genre", genres),
+        "differentiae_database": ("diff_db", differentiae),
+    }
+    model_fields = {
+        column: Chant._meta.get_field(field_name)
+        for column, field_name in FIELD_COLUMNS.items()
+    }
+
+    chants: list[Chant] = []
+    errors: list[str] = []
+    # row 1 is the header
+    for row_number, row in enumerate(rows, start=2):
+        chant = Chant(source=source, created_by=user, last_updated_by=user)
+        for column, field in model_fields.items():
+            value: Optional[str] = row[column] or None
+            try:
+                # runs the same validators as full_clean()
+                setattr(chant, field.name, field.clean(value, chant))
+            except ValidationError as e:
+                errors.append(f"Row {row_number}, {column}: {' '.join(e.messages)}")
+        for column, (field_name, lookup) in related_lookups.items():
+            if not row[column]:
+                continue
+            try:
+                setattr(chant, field_name, lookup.get(row[column]))
+            except ValidationError as e:
+                errors.append(f"Row {row_number}, {column}: {' '.join(e.messages)}")
+        chants.append(chant)
+
+    if errors:
+        raise ChantImportError(errors)
+    return chants
+
+
+def update_search_vectors(source: Source, chant_ids: list[int]) -> None:
+    """Compute the search vectors of several chants of a source with a single
+    UPDATE query.
+
+    The search vectors are built from the same fields, with the same weights,
+    as in Chant.index_components().
+    """
+
+    def name_of(model, field_name: str) -> Subquery:
+        return Subquery(model.objects.filter(pk=OuterRef(field_name)).values("name"))
+
+    Chant.objects.filter(pk__in=chant_ids).update(
+        search_vector=SearchVector(
+            "incipit",
+            "manuscript_full_text",
+            "manuscript_full_text_std_spelling",
+            Value(source.title or ""),
+            weight="A",
+        )
+        + SearchVector(
+            name_of(Genre, "genre"),
+            name_of(Feast, "feast"),
+            name_of(Service, "service"),
+            weight="B",
+        )
+    )
+
+
+def import_chants(
+    source: Source,
+    csv_file: TextIO,
+    user: Optional[User] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> int:
+    """Add the chants described in a CSV file to a source.
+
+    Args:
+        source (Source): The source to add the chants to
+        csv_file (TextIO): A CSV file with the columns of views.api.csv_export
+        user (User, optional): The user recorded as having created the chants
+        batch_size (int): The number of chants inserted per query
+
+    Raises:
+        ChantImportError: If the file is invalid. In that case, no chant is created.
+
+    Returns:
+        int: The number of chants created
+    """
+    if source.segment_id == SEQUENCE_SEGMENT_ID:
+        raise ChantImportError(
+            [f"Source {source.id} is in the sequence database and can't have chants"]
+        )
+
+    chants = build_chants(source, iter_rows(csv_file), user)
+    # the fields otherwise set by signals.on_chant_pre_save(), apart from the
+    # search vector, which is computed by update_search_vectors()
+    for chant in chants:
+        update_chant_incipit_field(chant)
+        update_folio_sort_key(chant)
+    chants_with_melody = [chant for chant in chants if chant.volpiano is not None]
+    melody_fields = generate_melody_fields(
+        [chant.volpiano for chant in chants_with_melody]
+    )
+    for chant, fields in zip(chants_with_melody, melody_fields):
+        (
+            chant.volpiano_notes,
+            chant.volpiano_intervals,
+            chant.volpiano_interval_codes,
+        ) = fields
+
+    with transaction.atomic():
+        for start in range(0, len(chants), batch_size):
+            Chant.objects.bulk_create(chants[start : start + batch_size])
+        update_search_vectors(source, [chant.pk for chant in chants])
+        refresh_source_counts([source.id])
+        invalidate_source_navigation(source.id)
+        invalidate_cantus_ids(chant.cantus_id for chant in chants)
+    return len(chants)
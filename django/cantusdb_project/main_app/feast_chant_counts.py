@@ -0,0 +1,79 @@
+"""
+Maintenance of the FeastChantCount table, from which the feast detail page
+(views.feast.FeastDetailView) reads the most frequent chants and the sources
+of a feast, instead of aggregating over all of the feast's chants.
+"""
+
+from typing import Iterable, Optional
+
+from django.db import connection, transaction
+
+from main_app.models import Chant, FeastChantCount, Source
+
+
+def update_feast_chant_counts(
+    source_ids: Iterable[int], feast_ids: Optional[Iterable[int]] = None
+) -> None:
+    """Recompute the FeastChantCount rows of several sources from the feast,
+    cantus_id and genre fields of their chants.
+
+    Called in signals.refresh_source_counts() and signals.update_chant_counts(),
+    and by the update_feast_chant_counts, reassign_feasts and
+    add_cantus_index_merge_events commands.
+
+    Args:
+        source_ids (Iterable[int]): The IDs of the sources to update
+        feast_ids (Iterable[int], optional): If given, only the rows of these
+            feasts are recomputed
+    """
+    source_ids = list(source_ids)
+    rows = FeastChantCount.objects.filter(source_id__in=source_ids)
+    feast_filter = ""
+    params: list = [source_ids]
+    if feast_ids is not None:
+        feast_ids = list(feast_ids)
+        rows = rows.filter(feast_id__in=feast_ids)
+        feast_filter = "AND chant.feast_id = ANY(%s)"
+        params.append(feast_ids)
+    with transaction.atomic():
+        rows.delete()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {FeastChantCount._meta.db_table} (
+                    feast_id, source_id, published, cantus_id, genre_id,
+                    count, first_chant_id, incipit
+                )
+                SELECT
+                    chant.feast_id,
+                    chant.source_id,
+                    source.published,
+                    chant.cantus_id,
+                    chant.genre_id,
+                    COUNT(*),
+                    MIN(chant.id),
+                    (ARRAY_AGG(chant.incipit ORDER BY chant.id))[1]
+                FROM {Chant._meta.db_table} AS chant
+                JOIN {Source._meta.db_table} AS source ON chant.source_id = source.id
+                WHERE chant.source_id = ANY(%s) AND chant.feast_id IS NOT NULL
+                    {feast_filter}
+                GROUP BY
+                    chant.feast_id,
+                    chant.source_id,
+                    source.published,
+                    chant.cantus_id,
+                    chant.genre_id
+                """,
+                params,
+            )
+
+
+def update_feast_chant_counts_published(source: Source) -> None:
+    """Keep the published field of a source's FeastChantCount rows in line with
+    the source's.
+
+    Called in signals.on_source_save()
+    """
+    FeastChantCount.objects.filter(source=source).exclude(
+        published=source.published
+    ).update(published=source.published)
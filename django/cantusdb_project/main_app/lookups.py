@@ -0,0 +1,25 @@
+from django.db import models
+from django.db.models import Transform
+
+
+class ImmutableUnaccent(Transform):
+    """Remove accents from a text field, like the `unaccent` lookup
+
+    Postgres' own `unaccent` function is not IMMUTABLE, so it can't be used in
+    an index expression, and queries using the `unaccent` lookup can't use an
+    index. `f_unaccent` is an immutable wrapper around it, created in migration
+    0035_f_unaccent_trigram_indexes. The trigram indexes declared in
+    Chant.Meta.indexes and Source.Meta.indexes are built on
+    `UPPER(f_unaccent(<field>))`, which is exactly what
+    `<field>__f_unaccent__icontains` and `<field>__f_unaccent__istartswith`
+    query, so these lookups let Postgres use those indexes.
+    """
+
+    bilateral = True
+    lookup_name = "f_unaccent"
+    function = "F_UNACCENT"
+    output_field = models.TextField()
+
+
+models.CharField.register_lookup(ImmutableUnaccent)
+models.TextField.register_lookup(ImmutableUnaccent)
@@ -1,8 +1,13 @@
 from typing import Optional
 from datetime import datetime
 from django.core.management.base import BaseCommand
+from django.utils import timezone
+from main_app.cantus_id_cache import invalidate_cantus_ids
+from main_app.feast_chant_counts import update_feast_chant_counts
 from main_app.models import Chant
+from main_app.source_navigation import invalidate_source_navigation
 from cantusindex import get_merged_cantus_ids
+from next_chants import update_next_chant_counts
 
 
 class Command(BaseCommand):
@@ -77,8 +82,27 @@ class Command(BaseCommand):
 
         affected_chants = Chant.objects.filter(cantus_id=old_cantus_id)
         if affected_chants:
+            source_ids: set[int] = {
+                chant.source_id for chant in affected_chants if chant.source_id
+            }
+            feast_ids: set[int] = {
+                chant.feast_id for chant in affected_chants if chant.feast_id
+            }
             try:
-                affected_chants.update(cantus_id=new_cantus_id)
+                # update() doesn't set date_updated, which update_cached_concordances
+                # --incremental relies on
+                affected_chants.update(
+                    cantus_id=new_cantus_id, date_updated=timezone.now()
+                )
+                # nor does it send the signals that keep the counts over the
+                # chants of their sources and the cached responses up to date
+                update_next_chant_counts(
+                    source_ids, cantus_ids=[old_cantus_id, new_cantus_id]
+                )
+                update_feast_chant_counts(source_ids, feast_ids=feast_ids)
+                invalidate_cantus_ids([old_cantus_id, new_cantus_id])
+                for source_id in source_ids:
+                    invalidate_source_navigation(source_id)
                 self.stdout.write(
                     self.style.SUCCESS(
                         f"Old Cantus ID: {old_cantus_id} -> New Cantus ID: {new_cantus_id}\n"
@@ -0,0 +1,138 @@
+"""
+Store the alignment of the text and melody of every chant with volpiano in
+Chant.text_melody_alignment (see alignment_cache.py), for the chants whose
+stored alignment is missing or out of date: chants created by chant_import.py
+or before the field was added, chants whose text or melody was changed with
+`update()`, and all chants after volpiano_display_utilities is upgraded.
+
+With `--jobs` greater than 1, the alignments of each batch of chants are
+computed by a pool of worker processes, while the main process reads and
+updates the chants.
+
+Run with `python manage.py backfill_chant_alignments`. Use `--all` to recompute
+the alignments of all chants, even those that are up to date.
+"""
+
+import os
+from multiprocessing import Pool
+from typing import Callable, Iterator, Optional
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from main_app.alignment_cache import (
+    compute_alignment,
+    get_alignment_digest,
+    get_chant_alignment_args,
+)
+from main_app.models import Chant
+
+# the fields of chants used to align their text and melody
+ALIGNMENT_FIELDS: tuple[str, ...] = (
+    "id",
+    "volpiano",
+    "manuscript_syllabized_full_text",
+    "manuscript_full_text",
+    "manuscript_full_text_std_spelling",
+    "incipit",
+    "text_melody_alignment_digest",
+)
+
+# the ID of a chant, the digest of its alignment's arguments and the arguments
+AlignmentTask = tuple[int, str, tuple[str, str, bool]]
+
+
+class Command(BaseCommand):
+    help = "Store the alignments of the texts and melodies of chants."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Recompute the alignments of all chants with volpiano, "
+            "not only of those whose alignment is missing or out of date.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1_000,
+            help="Number of chants to update per query (default: 1000).",
+        )
+        parser.add_argument(
+            "--jobs",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of worker processes computing the alignments "
+            "(default: the number of CPUs).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size: int = options["batch_size"]
+        tasks = self.iter_tasks(options["all"], batch_size)
+
+        if options["jobs"] > 1:
+            # worker processes must open their own database connections
+            connections.close_all()
+            with Pool(options["jobs"]) as pool:
+                updated_count = self.update_chants(tasks, batch_size, pool.map)
+        else:
+            updated_count = self.update_chants(tasks, batch_size, map)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Success! The alignments of {updated_count} chants have been stored."
+            )
+        )
+
+    def update_chants(
+        self,
+        tasks: Iterator[AlignmentTask],
+        batch_size: int,
+        map_function: Callable,
+    ) -> int:
+        """Compute the alignments of the chants, a batch at a time, with
+        `map_function` (the built-in map(), or the map() of a pool of worker
+        processes), and store them."""
+        updated_count = 0
+        batch: list[AlignmentTask] = []
+        for task in tasks:
+            batch.append(task)
+            if len(batch) >= batch_size:
+                updated_count += update_batch(
+                    list(map_function(align_chant_task, batch))
+                )
+                batch = []
+        if batch:
+            updated_count += update_batch(list(map_function(align_chant_task, batch)))
+        return updated_count
+
+    def iter_tasks(self, update_all: bool, batch_size: int) -> Iterator[AlignmentTask]:
+        """Yield the chants whose alignment needs to be computed."""
+        chants = (
+            Chant.objects.exclude(volpiano__isnull=True)
+            .exclude(volpiano="")
+            .only(*ALIGNMENT_FIELDS)
+            .order_by("id")
+        )
+        for chant in chants.iterator(chunk_size=batch_size):
+            args = get_chant_alignment_args(chant)
+            digest = get_alignment_digest(*args)
+            if update_all or digest != chant.text_melody_alignment_digest:
+                yield chant.id, digest, args
+
+
+def align_chant_task(task: AlignmentTask) -> Chant:
+    """Compute the alignment of a chant, in a worker process."""
+    chant_id, digest, args = task
+    alignment: Optional[list] = compute_alignment(*args)
+    return Chant(
+        id=chant_id,
+        text_melody_alignment=alignment,
+        text_melody_alignment_digest=digest,
+    )
+
+
+def update_batch(batch: list[Chant]) -> int:
+    return Chant.objects.bulk_update(
+        batch, ["text_melody_alignment", "text_melody_alignment_digest"]
+    )
@@ -0,0 +1,160 @@
+"""
+Compare the query plans of keyword "contains" searches with and without the
+trigram indexes declared in Chant.Meta.indexes and Source.Meta.indexes.
+
+The command generates a synthetic dataset of chants and sources inside a
+transaction, prints the output of EXPLAIN ANALYZE for the searches that used to
+be run by ChantSearchView and SourceListView (`icontains`/`unaccent__icontains`)
+and for the ones they run now (`f_unaccent__icontains`, see main_app.lookups),
+then rolls the transaction back, leaving the database unchanged.
+
+Run with `python manage.py benchmark_keyword_search`. Use `--chants` and
+`--sources` to change the size of the generated dataset.
+"""
+
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q, QuerySet
+
+from main_app.models import Chant, Segment, Source
+
+# common words, which make up most of the generated text
+WORDS: tuple[str, ...] = (
+    "alleluia",
+    "benedictus",
+    "christus",
+    "dominus",
+    "ecce",
+    "gloria",
+    "hodie",
+    "jerusalem",
+    "laudate",
+    "magnificat",
+    "natus",
+    "omnes",
+    "pater",
+    "quoniam",
+    "redemptor",
+    "sanctus",
+    "tibi",
+    "vidimus",
+    "ælleluia",
+    "fíliis",
+    "Maríam",
+)
+# a rare, accented word, which only appears in about one text in a thousand...
+RARE_WORD = "Hierusalém"
+# ...and the search term used to find it, as a user would type it
+SEARCH_TERM = "hierusalem"
+
+
+def make_text(n_words: int) -> str:
+    words = random.choices(WORDS, k=n_words)
+    if random.random() < 0.001:
+        words[random.randrange(n_words)] = RARE_WORD
+    return " ".join(words)
+
+
+class Command(BaseCommand):
+    help = (
+        "Print the query plans of keyword searches with and without trigram "
+        "indexes, using a generated dataset that is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chants",
+            type=int,
+            default=100_000,
+            help="Number of chants to generate (default: 100000).",
+        )
+        parser.add_argument(
+            "--sources",
+            type=int,
+            default=10_000,
+            help="Number of sources to generate (default: 10000).",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.generate_dataset(options["chants"], options["sources"])
+
+            self.print_plan(
+                "Chant search, before (icontains)",
+                Chant.objects.filter(
+                    Q(incipit__icontains=SEARCH_TERM)
+                    | Q(manuscript_full_text__icontains=SEARCH_TERM)
+                    | Q(manuscript_full_text_std_spelling__icontains=SEARCH_TERM)
+                ),
+            )
+            self.print_plan(
+                "Chant search, after (f_unaccent__icontains)",
+                Chant.objects.filter(
+                    Q(incipit__f_unaccent__icontains=SEARCH_TERM)
+                    | Q(manuscript_full_text__f_unaccent__icontains=SEARCH_TERM)
+                    | Q(
+                        manuscript_full_text_std_spelling__f_unaccent__icontains=SEARCH_TERM
+                    )
+                ),
+            )
+            self.print_plan(
+                "Source search, before (unaccent__icontains)",
+                Source.objects.filter(
+                    Q(shelfmark__unaccent__icontains=SEARCH_TERM)
+                    | Q(description__unaccent__icontains=SEARCH_TERM)
+                    | Q(summary__unaccent__icontains=SEARCH_TERM)
+                ),
+            )
+            self.print_plan(
+                "Source search, after (f_unaccent__icontains)",
+                Source.objects.filter(
+                    Q(shelfmark__f_unaccent__icontains=SEARCH_TERM)
+                    | Q(description__f_unaccent__icontains=SEARCH_TERM)
+                    | Q(summary__f_unaccent__icontains=SEARCH_TERM)
+                ),
+            )
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            self.style.SUCCESS("Done. The generated dataset has been rolled back.")
+        )
+
+    def generate_dataset(self, n_chants: int, n_sources: int) -> None:
+        segment = Segment.objects.create(name="Benchmark")
+        sources = Source.objects.bulk_create(
+            Source(
+                segment=segment,
+                shelfmark=f"{make_text(2)} {i}",
+                description=make_text(40),
+                summary=make_text(20),
+            )
+            for i in range(n_sources)
+        )
+        chants = []
+        for _ in range(n_chants):
+            full_text = make_text(random.randint(5, 60))
+            chants.append(
+                Chant(
+                    source=random.choice(sources),
+                    incipit=" ".join(full_text.split()[:4]),
+                    manuscript_full_text=full_text,
+                    manuscript_full_text_std_spelling=full_text,
+                )
+            )
+            if len(chants) >= 10_000:
+                Chant.objects.bulk_create(chants)
+                chants = []
+        Chant.objects.bulk_create(chants)
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {Chant._meta.db_table}")
+            cursor.execute(f"ANALYZE {Source._meta.db_table}")
+        self.stdout.write(
+            f"Generated {n_chants} chants and {n_sources} sources "
+            f'(searching for "{SEARCH_TERM}").'
+        )
+
+    def print_plan(self, label: str, queryset: QuerySet) -> None:
+        self.stdout.write(f"\n{label}:")
+        self.stdout.write(queryset.explain(analyze=True))
@@ -0,0 +1,97 @@
+"""
+Compare the time taken to compute the melody search fields of chants (see
+melody_fields.py) one chant at a time, as when a chant is saved, and a batch of
+chants at a time with generate_melody_fields(), as when chants are imported or
+the fields are backfilled by the rebuild_melody_index command.
+
+No database queries are made: the fields are computed for randomly generated
+volpiano strings.
+
+Run with `python manage.py benchmark_melody_fields`. Use `--count` to change
+the number of volpiano strings, and `--batch-size` the number of strings per
+batch.
+"""
+
+import random
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from main_app import melody_fields
+from main_app.melody_fields import (
+    generate_melody_fields,
+    generate_volpiano_interval_codes,
+    generate_volpiano_intervals,
+    generate_volpiano_notes,
+)
+
+
+class Command(BaseCommand):
+    help = "Compare computing melody search fields one chant at a time and in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--count",
+            type=int,
+            default=500_000,
+            help="Number of volpiano strings to generate (default: 500000).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1_000,
+            help="Number of volpiano strings per batch (default: 1000).",
+        )
+
+    def handle(self, *args, **options):
+        count: int = options["count"]
+        batch_size: int = options["batch_size"]
+        rng = random.Random(0)
+        volpianos = [make_volpiano(rng) for _ in range(count)]
+        self.stdout.write(
+            f"Generated {count} volpiano strings "
+            f"({sum(map(len, volpianos)) / count:.0f} characters on average)."
+        )
+
+        start = perf_counter()
+        expected = []
+        for volpiano in volpianos:
+            notes = generate_volpiano_notes(volpiano)
+            expected.append(
+                (
+                    notes,
+                    generate_volpiano_intervals(notes),
+                    generate_volpiano_interval_codes(notes),
+                )
+            )
+        self.stdout.write(f"One chant at a time: {perf_counter() - start:.2f} s")
+
+        name = "with NumPy" if melody_fields.np is not None else "NumPy not installed"
+        start = perf_counter()
+        fields = []
+        for batch_start in range(0, count, batch_size):
+            batch = volpianos[batch_start : batch_start + batch_size]
+            fields.extend(generate_melody_fields(batch))
+        self.stdout.write(
+            f"In batches of {batch_size} ({name}): {perf_counter() - start:.2f} s"
+        )
+
+        if [tuple(chant_fields) for chant_fields in fields] != expected:
+            raise AssertionError("The two approaches computed different fields.")
+        self.stdout.write(self.style.SUCCESS("Done."))
+
+
+def make_volpiano(rng: random.Random) -> str:
+    """Generate a random volpiano string: a clef, followed by words made of
+    syllables made of neumes, and a barline."""
+    words = []
+    for _ in range(rng.randint(3, 12)):
+        syllables = []
+        for _ in range(rng.randint(1, 4)):
+            neumes = [
+                "".join(rng.choices("9abcdefghjklmnopq", k=rng.randint(1, 3)))
+                for _ in range(rng.randint(1, 3))
+            ]
+            syllables.append("-".join(neumes))
+        words.append("--".join(syllables))
+    return "1---" + "---".join(words) + "---3"
@@ -0,0 +1,84 @@
+"""
+Compare the time taken to build the absolute chant and source URLs of the JSON
+exports (e.g. views.api.json_cid_export) by calling reverse() and
+request.build_absolute_uri() for every chant, as they used to, and with
+url_templates.URLTemplate, which they use now.
+
+No database queries are made: the URLs are built for generated IDs.
+
+Run with `python manage.py benchmark_url_templates`. Use `--rows` to change
+the number of chants.
+"""
+
+from timeit import repeat
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.urls import reverse
+
+from main_app.url_templates import URLTemplate
+
+
+class Command(BaseCommand):
+    help = "Compare building chant and source URLs with reverse() and URLTemplate."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            type=int,
+            default=10_000,
+            help="Number of chants to build URLs for (default: 10000).",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Number of times to time each approach; the fastest time is "
+            "reported (default: 5).",
+        )
+
+    def handle(self, *args, **options):
+        # build_absolute_uri() checks the host against ALLOWED_HOSTS
+        host = next((host for host in settings.ALLOWED_HOSTS if host), "localhost")
+        request = RequestFactory().get("/json-cid/1", SERVER_NAME=host)
+        rows = [(chant_id, chant_id // 100) for chant_id in range(options["rows"])]
+
+        def with_reverse() -> list[tuple[str, str]]:
+            return [
+                (
+                    request.build_absolute_uri(
+                        reverse("chant-detail", args=[chant_id])
+                    ),
+                    request.build_absolute_uri(
+                        reverse("source-detail", args=[source_id])
+                    ),
+                )
+                for chant_id, source_id in rows
+            ]
+
+        def with_url_templates() -> list[tuple[str, str]]:
+            chant_url = URLTemplate("chant-detail", request)
+            source_url = URLTemplate("source-detail", request)
+            return [
+                (chant_url.format(chant_id), source_url.format(source_id))
+                for chant_id, source_id in rows
+            ]
+
+        if with_reverse() != with_url_templates():
+            raise AssertionError("The two approaches build different URLs.")
+
+        times = {}
+        for name, build_urls in [
+            ("reverse() + build_absolute_uri()", with_reverse),
+            ("URLTemplate", with_url_templates),
+        ]:
+            times[name] = min(repeat(build_urls, number=1, repeat=options["repeat"]))
+            self.stdout.write(
+                f"{name}: {times[name] * 1000:.1f} ms for {len(rows)} rows"
+            )
+
+        speedup = times["reverse() + build_absolute_uri()"] / times["URLTemplate"]
+        self.stdout.write(
+            self.style.SUCCESS(f"Done. URLTemplate is {speedup:.0f} times faster.")
+        )
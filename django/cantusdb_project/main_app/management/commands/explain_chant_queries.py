@@ -0,0 +1,238 @@
+"""
+Print the query plans of the queries that the source and chant pages and the
+JSON exports make on the chants of a source, or on the chants with a given
+Cantus ID, to check that they use the indexes declared in Chant.Meta.indexes.
+
+The command generates a synthetic dataset of sources, feasts and chants inside
+a transaction, prints the output of EXPLAIN (ANALYZE, BUFFERS) for each query,
+as built by views.source, views.chant, views.api, source_navigation.py and
+signals.refresh_source_counts(), along with the indexes that the plan uses,
+then rolls the transaction back, leaving the database unchanged.
+
+Queries that read all the chants of a source may use the index that Django
+creates for the source foreign key, followed by a sort, rather than a composite
+index: for a few thousand rows, the sort is about as fast.
+
+Run with `python manage.py explain_chant_queries`. Use `--sources` and
+`--chants-per-source` to change the size of the generated dataset, and
+`--check` to fail if a query scans the whole chant table, or doesn't use any of
+the indexes expected for it.
+"""
+
+import random
+import re
+from typing import Iterable, Union
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, QuerySet
+
+from main_app.models import Chant, Feast, Segment, Source
+from main_app.models.chant import get_folio_sort_key
+from main_app.source_navigation import FEAST_CHANGES_SQL
+
+# matches the names of the indexes used in the text of a query plan
+INDEX_RE = re.compile(
+    r"(?:Index Scan|Index Only Scan)(?: Backward)? using (\S+)|Bitmap Index Scan on (\S+)"
+)
+
+# the prefixes of the names of the indexes that Django creates for
+# Chant.source (a foreign key) and Chant.cantus_id (db_index=True)
+SOURCE_FK_INDEX = f"{Chant._meta.db_table}_source_id_"
+CANTUS_ID_INDEX = f"{Chant._meta.db_table}_cantus_id_"
+
+# the number of chants per folio, and of consecutive chants of the same feast
+CHANTS_PER_FOLIO = 10
+CHANTS_PER_FEAST = 15
+
+
+class Command(BaseCommand):
+    help = (
+        "Print the query plans of the queries on the chants of a source or of a "
+        "Cantus ID, using a generated dataset that is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sources",
+            type=int,
+            default=200,
+            help="Number of sources to generate (default: 200).",
+        )
+        parser.add_argument(
+            "--chants-per-source",
+            type=int,
+            default=1_000,
+            help="Number of chants to generate in each source (default: 1000).",
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Fail if a query doesn't use any of the indexes expected for it.",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            source = self.generate_dataset(
+                options["sources"], options["chants_per_source"]
+            )
+            chant = source.chant_set.exclude(volpiano=None).order_by("id").first()
+            failures = []
+            for label, query, expected_indexes in self.get_queries(source, chant):
+                if not self.print_plan(label, query, expected_indexes):
+                    failures.append(label)
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            self.style.SUCCESS("Done. The generated dataset has been rolled back.")
+        )
+        if failures and options["check"]:
+            raise CommandError(
+                "These queries don't use the expected indexes: " + ", ".join(failures)
+            )
+
+    def get_queries(
+        self, source: Source, chant: Chant
+    ) -> list[tuple[str, Union[QuerySet, tuple[str, list]], tuple[str, ...]]]:
+        """Return the queries to explain, with the names (or name prefixes) of
+        the indexes that they are expected to use (any one of them)."""
+        chants = source.chant_set.select_related("feast", "service", "genre")
+        return [
+            (
+                "Source browse page, chants on a folio (SourceBrowseChantsView)",
+                chants.filter(folio=chant.folio).order_by(
+                    "folio_sort_key", "c_sequence"
+                ),
+                ("chant_source_folio_seq_idx",),
+            ),
+            (
+                "Source browse page, chants of a feast (SourceBrowseChantsView)",
+                chants.filter(feast__id=chant.feast_id).order_by(
+                    "folio_sort_key", "c_sequence"
+                ),
+                ("chant_source_feast_idx",),
+            ),
+            (
+                "Source inventory (SourceInventoryView)",
+                source.chant_set.select_related("feast", "service", "genre").order_by(
+                    "folio_sort_key", "c_sequence"
+                ),
+                ("chant_source_folio_key_idx", SOURCE_FK_INDEX),
+            ),
+            (
+                "Folio selector (SourceDetailView, SourceBrowseChantsView, ...)",
+                source.chant_set.values_list("folio", flat=True)
+                .distinct()
+                .order_by("folio_sort_key", "folio"),
+                ("chant_source_folio_key_idx",),
+            ),
+            (
+                "Feast selector (source_navigation.get_feast_changes())",
+                (FEAST_CHANGES_SQL, [source.id]),
+                (
+                    "chant_source_feast_idx",
+                    "chant_source_folio_key_idx",
+                    "chant_source_folio_seq_idx",
+                    SOURCE_FK_INDEX,
+                ),
+            ),
+            (
+                "Number of melodies (signals.refresh_source_counts())",
+                Chant.objects.filter(source=source)
+                .exclude(volpiano__isnull=True)
+                .exclude(volpiano__exact="")
+                .values("source")
+                .annotate(count=Count("pk"))
+                .values("count"),
+                ("chant_source_melody_idx",),
+            ),
+            (
+                "Chants with a Cantus ID (ChantByCantusIDView, json_cid_export)",
+                Chant.objects.select_related(
+                    "source", "source__holding_institution", "feast", "genre"
+                ).filter(cantus_id=chant.cantus_id, source__published=True),
+                ("chant_cantus_id_source_idx", CANTUS_ID_INDEX),
+            ),
+            (
+                "Melodies with a Cantus ID (ajax_melody_list, json_melody_export)",
+                Chant.objects.select_related("source")
+                .filter(cantus_id=chant.cantus_id, source__published=True)
+                .exclude(volpiano=None)
+                .order_by("id"),
+                ("chant_cantus_id_melody_idx",),
+            ),
+        ]
+
+    def generate_dataset(self, n_sources: int, chants_per_source: int) -> Source:
+        """Generate sources whose chants are spread over folios and feasts, and
+        return one of them."""
+        segment = Segment.objects.create(name="Benchmark")
+        sources = Source.objects.bulk_create(
+            Source(segment=segment, shelfmark=f"Source {i}", published=i % 2 == 0)
+            for i in range(n_sources)
+        )
+        feasts = Feast.objects.bulk_create(Feast(name=f"Feast {i}") for i in range(300))
+        # about ten chants per Cantus ID, spread over all the sources
+        n_cantus_ids = max(1, n_sources * chants_per_source // 10)
+        for source in sources:
+            chants = []
+            for i in range(chants_per_source):
+                folio_number, chant_number = divmod(i, CHANTS_PER_FOLIO * 2)
+                side = "r" if chant_number < CHANTS_PER_FOLIO else "v"
+                folio = f"{folio_number + 1:03d}{side}"
+                chants.append(
+                    Chant(
+                        source=source,
+                        folio=folio,
+                        folio_sort_key=get_folio_sort_key(folio),
+                        c_sequence=chant_number % CHANTS_PER_FOLIO + 1,
+                        feast=feasts[i // CHANTS_PER_FEAST % len(feasts)],
+                        cantus_id=f"{random.randrange(n_cantus_ids):06d}",
+                        volpiano="1---g--h--j---3" if random.random() < 0.3 else None,
+                    )
+                )
+            Chant.objects.bulk_create(chants)
+        with connection.cursor() as cursor:
+            for model in (Chant, Source, Feast):
+                cursor.execute(f"ANALYZE {model._meta.db_table}")
+        self.stdout.write(
+            f"Generated {n_sources} sources with {chants_per_source} chants each."
+        )
+        return sources[n_sources // 2]
+
+    def print_plan(
+        self,
+        label: str,
+        query: Union[QuerySet, tuple[str, list]],
+        expected_indexes: Iterable[str],
+    ) -> bool:
+        """Print the plan of a query, and return whether it uses any of the
+        expected indexes without scanning the whole chant table."""
+        self.stdout.write(f"\n{label}:")
+        if isinstance(query, QuerySet):
+            plan = query.explain(analyze=True, buffers=True)
+        else:
+            sql, params = query
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {sql}", params)
+                plan = "\n".join(row[0] for row in cursor.fetchall())
+        self.stdout.write(plan)
+
+        used_indexes = {
+            scan_index or bitmap_index
+            for scan_index, bitmap_index in INDEX_RE.findall(plan)
+        }
+        self.stdout.write(f"Indexes used: {', '.join(sorted(used_indexes)) or 'none'}")
+        if re.search(rf"Seq Scan on {Chant._meta.db_table}\b", plan):
+            self.stdout.write(self.style.WARNING("The whole chant table is scanned."))
+            return False
+        if any(
+            index.startswith(expected)
+            for index in used_indexes
+            for expected in expected_indexes
+        ):
+            return True
+        self.stdout.write(
+            self.style.WARNING(f"Expected one of: {', '.join(expected_indexes)}")
+        )
+        return False
@@ -0,0 +1,272 @@
+"""
+Export the chants and sequences of all published sources, one file per source,
+for analysis outside of CantusDB.
+
+Each file has the same columns as the CSV export of a source (see
+chant_export.CSV_COLUMNS), in one of these formats:
+- csv: the same file as the source's CSV export
+- jsonl: one JSON object per chant, keyed by column
+- columnar: gzip-compressed JSON Lines, where each line is a group of up to
+  `--chunk-size` chants stored column by column, like the row groups of a
+  Parquet file: `{"count": 2, "columns": {"folio": ["001r", "001v"], ...}}`
+
+A manifest.json file lists the files, with the number of chants in each and
+the metadata of their source and its holding institution.
+
+Chants are read `--chunk-size` at a time and written as they are read, so the
+memory used doesn't depend on the size of the sources. Sources are exported
+independently of each other, so they can be exported by several worker
+processes at once with `--jobs`.
+
+Run with `python manage.py export_chants /path/to/directory`. Use `--format`
+to choose the format, `--gzip` to compress csv and jsonl files,
+`--include-unpublished` to also export unpublished sources and `--source-id`
+to only export some sources.
+"""
+
+import csv
+import gzip
+import os
+from email.utils import formatdate
+from functools import partial
+from multiprocessing import Pool
+from typing import IO, Any, Callable, Iterable, Iterator
+
+import ujson
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from main_app.chant_export import CSV_COLUMNS, DEFAULT_CHUNK_SIZE, iter_export_rows
+from main_app.models import Source
+
+FORMATS: tuple[str, ...] = ("csv", "jsonl", "columnar")
+FILE_EXTENSIONS: dict[str, str] = {
+    "csv": ".csv",
+    "jsonl": ".jsonl",
+    "columnar": ".columns.jsonl.gz",
+}
+MANIFEST_FILENAME: str = "manifest.json"
+
+
+class Command(BaseCommand):
+    help = "Export the chants and sequences of published sources, one file per source."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "directory",
+            type=str,
+            help="The directory in which to write the files",
+        )
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            default="csv",
+            help="The format of the files (default: csv).",
+        )
+        parser.add_argument(
+            "--gzip",
+            action="store_true",
+            help="Compress csv and jsonl files with gzip (columnar files always are).",
+        )
+        parser.add_argument(
+            "--source-id",
+            type=int,
+            action="append",
+            help="The ID of a source to export (can be repeated). "
+            "By default, all published sources are exported.",
+        )
+        parser.add_argument(
+            "--include-unpublished",
+            action="store_true",
+            help="Also export unpublished sources.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help="Number of chants to fetch from the database at a time "
+            f"(default: {DEFAULT_CHUNK_SIZE}).",
+        )
+        parser.add_argument(
+            "--jobs",
+            type=int,
+            default=1,
+            help="Number of sources to export in parallel (default: 1).",
+        )
+
+    def handle(self, *args, **options):
+        directory: str = options["directory"]
+        os.makedirs(directory, exist_ok=True)
+
+        sources = Source.objects.all()
+        if not options["include_unpublished"]:
+            sources = sources.filter(published=True)
+        if options["source_id"]:
+            sources = sources.filter(id__in=options["source_id"])
+        source_ids = list(sources.order_by("id").values_list("id", flat=True))
+
+        export = partial(
+            export_source,
+            directory=directory,
+            export_format=options["format"],
+            compress=options["gzip"],
+            chunk_size=options["chunk_size"],
+        )
+        if options["jobs"] > 1:
+            # worker processes must open their own database connections
+            connections.close_all()
+            with Pool(options["jobs"]) as pool:
+                partitions = self.report(
+                    pool.imap_unordered(export, source_ids), len(source_ids)
+                )
+        else:
+            partitions = self.report(map(export, source_ids), len(source_ids))
+
+        partitions.sort(key=lambda partition: partition["source_id"])
+        manifest = {
+            "format": options["format"],
+            "columns": CSV_COLUMNS,
+            "generated": formatdate(usegmt=True),
+            "partitions": partitions,
+        }
+        write_file(
+            os.path.join(directory, MANIFEST_FILENAME),
+            lambda file: ujson.dump(manifest, file, indent=2),
+            compress=False,
+        )
+
+        total = sum(partition["count"] for partition in partitions)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Success! {total} chants from {len(partitions)} sources "
+                f"have been exported to {directory}."
+            )
+        )
+
+    def report(self, partitions: Iterable[dict], total: int) -> list[dict]:
+        done: list[dict] = []
+        for partition in partitions:
+            done.append(partition)
+            self.stdout.write(
+                f"[{len(done)}/{total}] Source {partition['source_id']}: "
+                f"{partition['count']} chants written to {partition['path']}."
+            )
+        return done
+
+
+def export_source(
+    source_id: int,
+    directory: str,
+    export_format: str,
+    compress: bool,
+    chunk_size: int,
+) -> dict:
+    """Write the chants or sequences of a source to a file in `directory`.
+
+    Returns:
+        dict: The source's entry in the manifest
+    """
+    source = Source.objects.select_related("holding_institution").get(id=source_id)
+    extension = FILE_EXTENSIONS[export_format]
+    if compress and export_format != "columnar":
+        extension += ".gz"
+    filename = f"source-{source_id}{extension}"
+    rows = iter_export_rows(source, chunk_size)
+    if export_format == "csv":
+        write = partial(write_csv, rows=rows)
+    elif export_format == "jsonl":
+        write = partial(write_jsonl, rows=rows)
+    else:
+        write = partial(write_columnar, rows=rows, chunk_size=chunk_size)
+    count: int = write_file(
+        os.path.join(directory, filename),
+        write,
+        compress=compress or export_format == "columnar",
+    )
+
+    institution = source.holding_institution
+    return {
+        "source_id": source.id,
+        "path": filename,
+        "count": count,
+        "shelfmark": source.shelfmark,
+        "published": source.published,
+        "segment_id": source.segment_id,
+        "holding_institution": (
+            {
+                "id": institution.id,
+                "name": institution.name,
+                "siglum": institution.siglum,
+                "city": institution.city,
+                "country": institution.country,
+            }
+            if institution
+            else None
+        ),
+    }
+
+
+def write_file(filepath: str, write: Callable[[IO[str]], Any], compress: bool) -> Any:
+    """Call `write` with a text file, which then replaces `filepath`, so that
+    readers never see a partially-written file.
+
+    Returns:
+        Any: The value returned by `write`
+    """
+    temp_filepath = os.path.join(
+        os.path.dirname(filepath), f".{os.path.basename(filepath)}.tmp"
+    )
+    try:
+        if compress:
+            with gzip.open(temp_filepath, "wt", encoding="utf-8", newline="") as file:
+                result = write(file)
+        else:
+            with open(temp_filepath, "w", encoding="utf-8", newline="") as file:
+                result = write(file)
+    except BaseException:
+        os.remove(temp_filepath)
+        raise
+    os.replace(temp_filepath, filepath)
+    return result
+
+
+def write_csv(file: IO[str], rows: Iterator[list]) -> int:
+    writer = csv.writer(file)
+    writer.writerow(CSV_COLUMNS)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def write_jsonl(file: IO[str], rows: Iterator[list]) -> int:
+    count = 0
+    for row in rows:
+        file.write(ujson.dumps(dict(zip(CSV_COLUMNS, row))))
+        file.write("\n")
+        count += 1
+    return count
+
+
+def write_columnar(file: IO[str], rows: Iterator[list], chunk_size: int) -> int:
+    count = 0
+    group: list[list] = []
+
+    def write_group() -> None:
+        columns = {
+            column: [row[index] for row in group]
+            for index, column in enumerate(CSV_COLUMNS)
+        }
+        file.write(ujson.dumps({"count": len(group), "columns": columns}))
+        file.write("\n")
+
+    for row in rows:
+        group.append(row)
+        count += 1
+        if len(group) == chunk_size:
+            write_group()
+            group = []
+    if group:
+        write_group()
+    return count
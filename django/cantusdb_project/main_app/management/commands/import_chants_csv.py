@@ -0,0 +1,88 @@
+"""
+Add the chants listed in a CSV file to a source.
+
+The CSV file must have the same columns as the CSV export of a source
+(`/csv/<source_id>`). Feasts, services, genres and differentiae are looked up
+by name (for differentiae, by their differentia ID). All rows are validated
+before anything is written; if any of them is invalid, the problems are listed
+and no chant is created. See main_app.chant_import for details.
+
+Run with `python manage.py import_chants_csv <source_id> <path to CSV file>`.
+Use `--dry-run` to only validate the file.
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from main_app.chant_import import (
+    DEFAULT_BATCH_SIZE,
+    ChantImportError,
+    build_chants,
+    import_chants,
+    iter_rows,
+)
+from main_app.models import Source
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Add the chants listed in a CSV file (in the CSV export format) to a source."
+
+    def add_arguments(self, parser):
+        parser.add_argument("source_id", type=int, help="The ID of the source.")
+        parser.add_argument("csv_path", help="The path to the CSV file.")
+        parser.add_argument(
+            "--user-id",
+            type=int,
+            help="The ID of the user to record as the creator of the chants.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f"Number of chants to insert per query (default: {DEFAULT_BATCH_SIZE}).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only validate the CSV file, without creating any chants.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            source = Source.objects.get(id=options["source_id"])
+        except Source.DoesNotExist:
+            raise CommandError(f"Source {options['source_id']} does not exist")
+        user = None
+        if options["user_id"] is not None:
+            try:
+                user = User.objects.get(id=options["user_id"])
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['user_id']} does not exist")
+
+        with open(options["csv_path"], newline="", encoding="utf-8") as csv_file:
+            try:
+                if options["dry_run"]:
+                    count = len(build_chants(source, iter_rows(csv_file), user))
+                else:
+                    count = import_chants(
+                        source, csv_file, user, batch_size=options["batch_size"]
+                    )
+            except ChantImportError as e:
+                for error in e.errors:
+                    self.stderr.write(error)
+                raise CommandError(
+                    f"{len(e.errors)} problem(s) found, no chants were created."
+                )
+
+        if options["dry_run"]:
+            self.stdout.write(
+                self.style.SUCCESS(f"The file is valid: {count} chants can be created.")
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Success! {count} chants added to source {source.id}."
+                )
+            )
@@ -10,6 +10,7 @@ from django.core.management.base import BaseCommand
 import reversion  # type: ignore[import-untyped]
 
 from main_app.models import Chant
+from main_app.signals import defer_source_count_updates
 
 
 class Command(BaseCommand):
@@ -30,7 +31,7 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         old_cantus_id = options["old_cantus_id"]
         new_cantus_id = options["new_cantus_id"]
-        with reversion.create_revision():
+        with reversion.create_revision(), defer_source_count_updates():
             chants = Chant.objects.filter(cantus_id=old_cantus_id)
             num_chants = chants.count()
             for chant in chants.iterator(chunk_size=1_000):
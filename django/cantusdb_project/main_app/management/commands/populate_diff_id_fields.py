@@ -1,4 +1,5 @@
 from main_app.models import Chant, Differentia
+from main_app.signals import defer_source_count_updates
 from django.core.management.base import BaseCommand
 from django.db.models import Q
 from typing import Optional
@@ -7,6 +8,7 @@ from django.db import transaction
 
 class Command(BaseCommand):
     @transaction.atomic
+    @defer_source_count_updates()
     def handle(self, *args, **kwargs):
         chants = Chant.objects.filter(
             Q(differentiae_database__isnull=False) & Q(diff_db__isnull=True)
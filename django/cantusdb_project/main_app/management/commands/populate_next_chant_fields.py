@@ -0,0 +1,74 @@
+"""
+Populate the next_chant and is_last_chant_in_feast fields of chants.
+
+Each source's chants are loaded with a single query, their next chants are
+computed in memory (see next_chants.compute_next_chants, which follows the
+same rules as Chant.get_next_chant), and the fields that changed are written
+back with a single UPDATE query (see next_chants.write_next_chant_fields).
+Sources are independent of each other, so they can be processed by several
+worker processes at once with `--jobs`.
+
+Run with `python manage.py populate_next_chant_fields`. Use `--source-id` to
+only process some sources.
+"""
+
+from multiprocessing import Pool
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from main_app.models import Source
+from next_chants import update_next_chant_fields
+
+
+def update_source(source_id: int) -> tuple[int, int]:
+    return source_id, update_next_chant_fields(source_id)
+
+
+class Command(BaseCommand):
+    help = "Populate the next_chant and is_last_chant_in_feast fields of chants."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source-id",
+            type=int,
+            action="append",
+            help="The ID of a source to process (can be repeated). "
+            "By default, all sources are processed.",
+        )
+        parser.add_argument(
+            "--jobs",
+            type=int,
+            default=1,
+            help="Number of sources to process in parallel (default: 1).",
+        )
+
+    def handle(self, *args, **options):
+        if options["source_id"]:
+            source_ids = options["source_id"]
+        else:
+            source_ids = list(
+                Source.objects.filter(chant__isnull=False)
+                .distinct()
+                .order_by("id")
+                .values_list("id", flat=True)
+            )
+
+        if options["jobs"] > 1:
+            # worker processes must open their own database connections
+            connections.close_all()
+            with Pool(options["jobs"]) as pool:
+                results = pool.imap_unordered(update_source, source_ids)
+                self.report(results, len(source_ids))
+        else:
+            self.report(map(update_source, source_ids), len(source_ids))
+
+        self.stdout.write(
+            self.style.SUCCESS("Success! Next chant fields have been populated.")
+        )
+
+    def report(self, results, total: int) -> None:
+        for done, (source_id, updated_count) in enumerate(results, start=1):
+            self.stdout.write(
+                f"[{done}/{total}] Source {source_id}: {updated_count} chants updated."
+            )
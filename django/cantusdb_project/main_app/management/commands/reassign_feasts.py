@@ -1,5 +1,8 @@
 from django.core.management.base import BaseCommand
+from django.utils import timezone
+from main_app.feast_chant_counts import update_feast_chant_counts
 from main_app.models import Feast, Chant, Sequence
+from main_app.source_navigation import invalidate_source_navigation
 
 
 FEAST_MAPPING = {
@@ -32,10 +35,22 @@ class Command(BaseCommand):
             # Calling save method will update 'prefix' field
             new_feast.save()
 
-            # Reassign chants
-            chants_updated = Chant.objects.filter(feast=old_feast).update(
-                feast=new_feast
+            # Reassign chants. update() doesn't set date_updated, which
+            # update_cached_concordances --incremental relies on
+            chants = Chant.objects.filter(feast=old_feast)
+            source_ids = set(
+                chants.exclude(source=None).values_list("source_id", flat=True)
             )
+            chants_updated = chants.update(feast=new_feast, date_updated=timezone.now())
+            # nor does it send the signals that keep the counts of the chants
+            # of each feast and the cached folio navigation up to date. The
+            # counts must be recomputed before the old feast's counts are
+            # deleted along with it.
+            update_feast_chant_counts(
+                source_ids, feast_ids=[old_feast.id, new_feast.id]
+            )
+            for source_id in source_ids:
+                invalidate_source_navigation(source_id)
             self.stdout.write(
                 self.style.SUCCESS(
                     f"Reassigned {chants_updated} chants from feast {old_feast_id} to {new_feast_id}"
@@ -44,7 +59,7 @@ class Command(BaseCommand):
 
             # Reassign sequences
             sequences_updated = Sequence.objects.filter(feast=old_feast).update(
-                feast=new_feast
+                feast=new_feast, date_updated=timezone.now()
             )
             self.stdout.write(
                 self.style.SUCCESS(
@@ -0,0 +1,102 @@
+"""
+Maintenance command for the melody search index.
+
+Melody search (views.api.ajax_melody_search) matches the notes a user draws
+against the `volpiano_notes` field of each chant, or, when searching for
+transpositions, the `volpiano_interval_codes` field.
+These fields are covered by trigram GIN indexes (see Chant.Meta.indexes), which
+allow Postgres to shortlist candidate chants instead of scanning the whole
+chant table.
+
+This command:
+- fills in `volpiano_notes`, `volpiano_intervals` and `volpiano_interval_codes`
+  for chants that have volpiano but are missing any of these fields (or for
+  all chants with volpiano, if `--all` is passed), e.g. after chants have
+  been updated in bulk,
+- flushes the pending-entry lists of the trigram indexes, and
+- refreshes the planner statistics for the chant table.
+
+Run with `python manage.py rebuild_melody_index`.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+
+from main_app.models import Chant
+from main_app.melody_fields import generate_melody_fields
+
+# the names of the trigram indexes declared in Chant.Meta.indexes
+MELODY_INDEXES: tuple[str, ...] = (
+    "chant_volpiano_notes_trgm",
+    "chant_volpiano_intervals_trgm",
+    "chant_volpiano_int_codes_trgm",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Populate missing melody search fields on chants and refresh the "
+        "trigram indexes used by melody search."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Recompute the melody search fields for every chant with volpiano, "
+            "not only for chants where they are missing.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1_000,
+            help="Number of chants to update per query (default: 1000).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size: int = options["batch_size"]
+        chants = Chant.objects.filter(volpiano__isnull=False).exclude(volpiano="")
+        if not options["all"]:
+            chants = chants.filter(
+                Q(volpiano_notes__isnull=True)
+                | Q(volpiano_intervals__isnull=True)
+                | Q(volpiano_interval_codes__isnull=True)
+            )
+        chants = chants.only("id", "volpiano").order_by("id")
+
+        batch: list[Chant] = []
+        updated_count = 0
+        for chant in chants.iterator(chunk_size=batch_size):
+            batch.append(chant)
+            if len(batch) >= batch_size:
+                updated_count += self.update_batch(batch)
+                batch = []
+        if batch:
+            updated_count += self.update_batch(batch)
+        self.stdout.write(f"Updated melody search fields for {updated_count} chants.")
+
+        with connection.cursor() as cursor:
+            for index_name in MELODY_INDEXES:
+                # GIN indexes buffer new entries in a "pending list" that is
+                # searched sequentially; merge it into the main index structure
+                cursor.execute(
+                    "SELECT gin_clean_pending_list(%s::regclass)", [index_name]
+                )
+            cursor.execute(f"ANALYZE {Chant._meta.db_table}")
+
+        self.stdout.write(
+            self.style.SUCCESS("Success! Melody search index has been refreshed.")
+        )
+
+    def update_batch(self, batch: list[Chant]) -> int:
+        melody_fields = generate_melody_fields([chant.volpiano for chant in batch])
+        for chant, fields in zip(batch, melody_fields):
+            (
+                chant.volpiano_notes,
+                chant.volpiano_intervals,
+                chant.volpiano_interval_codes,
+            ) = fields
+        return Chant.objects.bulk_update(
+            batch, ["volpiano_notes", "volpiano_intervals", "volpiano_interval_codes"]
+        )
@@ -1,4 +1,5 @@
 from main_app.models import Chant
+from main_app.signals import defer_source_count_updates
 from django.core.management.base import BaseCommand
 
 # This management command opens every chant in the database
@@ -6,7 +7,9 @@ from django.core.management.base import BaseCommand
 # function for each chant, which populates several fields used
 # to optimizing site performance including
 # Chant.search_vectors, Chant.volpiano_notes, Chant.volpiano_intervals,
-# Source.number_of_chants and Source.number_of_melodies.
+# Chant.volpiano_interval_codes, Chant.folio_sort_key,
+# Source.number_of_chants and Source.number_of_melodies (the source counts
+# are recomputed once per source, at the end of the command).
 
 # As of late November 2023, it is serving no immediate purpose.
 # We're keeping it around, however, as a helpful tool in case additional
@@ -22,14 +25,15 @@ class Command(BaseCommand):
         chants = Chant.objects.all()
         chants_count = chants.count()
         start_index = 0
-        while start_index <= chants_count:
-            self.stdout.write(f"processing chunk with {start_index=}")
-            chunk = chants[start_index : start_index + CHUNK_SIZE]
+        with defer_source_count_updates():
+            while start_index <= chants_count:
+                self.stdout.write(f"processing chunk with {start_index=}")
+                chunk = chants[start_index : start_index + CHUNK_SIZE]
 
-            for chant in chunk:
-                chant.save()
-            del chunk  # make sure we don't use too much RAM
-            start_index += CHUNK_SIZE
+                for chant in chunk:
+                    chant.save()
+                del chunk  # make sure we don't use too much RAM
+                start_index += CHUNK_SIZE
 
         self.stdout.write(
             self.style.SUCCESS("Success! Command has run to completion.\n")
@@ -1,17 +1,69 @@
+import gzip
+import hashlib
+import itertools
+import shutil
 import ujson
 import os
+import tempfile
+from email.utils import formatdate
 from sys import stdout
 from datetime import datetime
+from typing import Iterable, Iterator, Optional
+from django.db.models import CharField, F, Q, Value
+from django.db.models.functions import Cast, Coalesce, Substr
 from django.db.models.query import QuerySet
 from django.core.management.base import BaseCommand
+from django.utils import timezone
 from main_app.models import Chant
 
+try:
+    # brotli is optional: without it, only gzip-compressed copies are written
+    import brotli
+except ImportError:
+    brotli = None
+
 # Usage: `python manage.py update_cached_concordances`
 # or `python manage.py update_cached_concordances -d "/path/to/directory/in/which/to/save/concordances"`
+# Add `--incremental` to only re-query chants that have changed since the last run
+# and patch the previously written concordances file.
+# Add `--shard-by cantus_id` or `--shard-by source` to also split the concordances
+# into smaller files (see write_sharded_concordances).
 
 # Used for creating URIs for chant and source detail pages
 CANTUSDB_DOMAIN: str = "https://cantusdatabase.org"
 
+CONCORDANCES_FILENAME: str = "concordances.json"
+# Records when the concordances file was last written, for incremental updates
+METADATA_FILENAME: str = "concordances_metadata.json"
+
+# Sharded concordances are written to this subdirectory of the cache directory,
+# along with a manifest listing the shards
+SHARDS_DIRNAME: str = "concordances"
+MANIFEST_FILENAME: str = "manifest.json"
+SHARD_BY_OPTIONS: tuple[str, ...] = ("cantus_id", "source")
+DEFAULT_PREFIX_LENGTH: int = 3
+
+# Number of chants fetched from the database at a time
+DEFAULT_CHUNK_SIZE: int = 2_000
+
+CHANT_VALUES: tuple[str, ...] = (
+    "id",
+    "source_id",
+    "source__siglum",
+    "folio",
+    "c_sequence",
+    "incipit",
+    "feast__name",
+    "genre__name",
+    "service__name",
+    "position",
+    "cantus_id",
+    "image_link",
+    "mode",
+    "manuscript_full_text_std_spelling",
+    "volpiano",
+)
+
 
 class Command(BaseCommand):
     def add_arguments(self, parser):
@@ -24,65 +76,454 @@ class Command(BaseCommand):
             # at services:django:volumes:api_cache_volume
             default="/resources/api_cache",
         )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Only re-query chants that have changed since the last run, "
+            "and patch the existing concordances file. If there is no record of a "
+            "previous run, all concordances are written.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help="Number of chants to fetch from the database at a time "
+            f"(default: {DEFAULT_CHUNK_SIZE}).",
+        )
+        parser.add_argument(
+            "--shard-by",
+            choices=SHARD_BY_OPTIONS,
+            help="Also write the concordances split into one file per Cantus ID "
+            f"prefix or per source, to {SHARDS_DIRNAME}/ in the cache directory, "
+            f"with a {MANIFEST_FILENAME} listing the files.",
+        )
+        parser.add_argument(
+            "--prefix-length",
+            type=int,
+            default=DEFAULT_PREFIX_LENGTH,
+            help="With --shard-by cantus_id, the number of leading characters of "
+            f"the Cantus ID used to group chants (default: {DEFAULT_PREFIX_LENGTH}).",
+        )
 
     def handle(self, *args, **kwargs) -> None:
         cache_dir: str = kwargs["directory"]
-        filepath: str = f"{cache_dir}/concordances.json"
+        chunk_size: int = kwargs["chunk_size"]
+        filepath: str = os.path.join(cache_dir, CONCORDANCES_FILENAME)
+        metadata_filepath: str = os.path.join(cache_dir, METADATA_FILENAME)
+        # chants updated while this command runs will be picked up by the next run
+        run_time: datetime = timezone.now()
         start_time: str = datetime.now().isoformat()
         stdout.write(f"Running update_cached_concordances at {start_time}.\n")
-        concordances: dict = get_concordances()
-        write_time: str = datetime.now().isoformat()
         stdout.write(f"Attempting to make directory at {cache_dir} to hold cache: ")
         try:
             os.mkdir(cache_dir)
             stdout.write(f"successfully created directory at {cache_dir}.\n")
         except FileExistsError:
             stdout.write(f"directory at {cache_dir} already exists.\n")
+
+        last_run_time: Optional[datetime] = None
+        if kwargs["incremental"] and os.path.exists(filepath):
+            last_run_time = get_last_run_time(metadata_filepath)
+            if last_run_time is None:
+                stdout.write(
+                    f"No record of a previous run found at {metadata_filepath}; "
+                    "writing all concordances.\n"
+                )
+
+        concordances: Iterable[str]
+        if last_run_time is None:
+            concordances = (
+                ujson.dumps(make_chant_dict(chant))
+                for chant in iter_chant_values(
+                    Chant.objects.filter(source__published=True), chunk_size
+                )
+            )
+        else:
+            stdout.write(
+                f"Updating concordances for chants changed since {last_run_time}.\n"
+            )
+            concordances = patch_concordances(filepath, last_run_time, chunk_size)
+
+        write_time: str = datetime.now().isoformat()
         stdout.write(f"Writing concordances to {filepath} at {write_time}.\n")
-        with open(filepath, "w") as json_file:
-            ujson.dump(concordances, json_file)
+        count: int = write_concordances(filepath, concordances)
+        write_compressed_copies(filepath)
+        with open(metadata_filepath, "w") as metadata_file:
+            ujson.dump(
+                {"last_run_time": run_time.isoformat(), "count": count}, metadata_file
+            )
         end_time = datetime.now().isoformat()
         stdout.write(
-            f"Concordances successfully written to {filepath} at {end_time}.\n\n"
+            f"{count} concordances successfully written to {filepath} at {end_time}.\n"
         )
 
+        if shard_by := kwargs["shard_by"]:
+            stdout.write(f"Writing concordances sharded by {shard_by}.\n")
+            manifest: dict = write_sharded_concordances(
+                cache_dir, shard_by, kwargs["prefix_length"], chunk_size
+            )
+            end_time = datetime.now().isoformat()
+            stdout.write(
+                f"{len(manifest['shards'])} shards successfully written to "
+                f"{os.path.join(cache_dir, SHARDS_DIRNAME)} at {end_time}.\n"
+            )
+        stdout.write("\n")
+
+
+def iter_chant_values(chants: QuerySet[Chant], chunk_size: int) -> Iterator[dict]:
+    """Iterate over the values needed to build concordances for a set of chants,
+    fetching them from the database `chunk_size` chants at a time.
+
+    Args:
+        chants (QuerySet[Chant]): The chants to fetch
+        chunk_size (int): The number of chants to fetch at a time
+
+    Returns:
+        Iterator[dict]: Dictionaries of chant values, ordered by chant ID, to be
+            passed to make_chant_dict
+    """
+    values: QuerySet[dict] = (
+        chants.select_related(
+            "source",
+            "feast",
+            "genre",
+            "service",
+        )
+        .order_by("id")
+        .values(*CHANT_VALUES)
+    )
+    return values.iterator(chunk_size=chunk_size)
+
+
+def write_concordances(filepath: str, concordances: Iterable[str]) -> int:
+    """Write serialized concordances to a JSON list at `filepath`.
+
+    Concordances are written one per line to a temporary file in the same
+    directory, which then replaces `filepath`, so that readers never see a
+    partially-written file. Writing one concordance per line allows
+    patch_concordances to read the file back one concordance at a time.
+
+    Args:
+        filepath (str): The path of the file to write
+        concordances (Iterable[str]): JSON-serialized concordances
+
+    Returns:
+        int: The number of concordances written
+    """
+    temp_filepath, count, _ = write_temporary_concordances_file(
+        os.path.dirname(filepath), concordances
+    )
+    os.replace(temp_filepath, filepath)
+    return count
+
+
+def write_temporary_concordances_file(
+    directory: str, concordances: Iterable[str]
+) -> tuple[str, int, str]:
+    """Write serialized concordances to a JSON list in a new temporary file
+    in `directory`, one concordance per line.
+
+    Returns:
+        tuple[str, int, str]: The path of the temporary file, the number of
+            concordances written to it and the SHA-256 hash of its contents
+    """
+    count: int = 0
+    sha256 = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(
+        "w",
+        encoding="utf-8",
+        dir=directory,
+        prefix=".concordances-",
+        suffix=".tmp",
+        delete=False,
+    ) as temp_file:
+        try:
+            for concordance in concordances:
+                text = (",\n" if count else "[\n") + concordance
+                temp_file.write(text)
+                sha256.update(text.encode("utf-8"))
+                count += 1
+            text = "\n]\n" if count else "[\n]\n"
+            temp_file.write(text)
+            sha256.update(text.encode("utf-8"))
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        except BaseException:
+            os.remove(temp_file.name)
+            raise
+    # NamedTemporaryFile creates files only readable by their owner
+    os.chmod(temp_file.name, 0o644)
+    return temp_file.name, count, sha256.hexdigest()
+
 
-def get_concordances() -> list[dict]:
-    """Fetch all published chants in the database, and return a list
-    of dictionaries containing information on these chants.
+def get_last_run_time(metadata_filepath: str) -> Optional[datetime]:
+    """Return the time at which the concordances file was last written,
+    or None if this isn't known."""
+    try:
+        with open(metadata_filepath) as metadata_file:
+            metadata: dict = ujson.load(metadata_file)
+        return datetime.fromisoformat(metadata["last_run_time"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def iter_previous_concordances(filepath: str) -> Iterator[tuple[int, str]]:
+    """Iterate over the concordances in a file written by write_concordances.
 
     Returns:
-        list[dict]: A list of dictionaries, each representing a single chant
-            from the database
+        Iterator[tuple[int, str]]: Tuples of chant IDs and the JSON-serialized
+            concordances for those chants, ordered by chant ID
     """
+    with open(filepath) as json_file:
+        for line in json_file:
+            concordance: str = line.strip().rstrip(",")
+            if concordance in ("", "[", "]"):
+                continue
+            chant_link: str = ujson.loads(concordance)["chantlink"]
+            chant_id = int(chant_link.rstrip("/").rsplit("/", 1)[1])
+            yield chant_id, concordance
+
+
+def patch_concordances(
+    filepath: str, since: datetime, chunk_size: int
+) -> Iterator[str]:
+    """Update the concordances in a file written by write_concordances.
+
+    Only chants that have changed since `since` (or whose source, feast, genre or
+    service has) are fetched from the database. Concordances for all other
+    published chants are copied from the previous file, and concordances for
+    chants that have been deleted or unpublished are dropped.
+
+    The previous concordances, the IDs of the currently published chants and the
+    changed chants are all ordered by chant ID, so they are merged as they are
+    read, and only one of each is held in memory at a time.
 
-    stdout.write("Querying database for published chants\n")
+    Args:
+        filepath (str): The path of the previously written concordances file
+        since (datetime): The time at which the previous file was written
+        chunk_size (int): The number of chants to fetch from the database at a time
+
+    Returns:
+        Iterator[str]: JSON-serialized concordances for all published chants,
+            ordered by chant ID
+    """
     published_chants: QuerySet[Chant] = Chant.objects.filter(source__published=True)
-    values: QuerySet[dict] = published_chants.select_related(
-        "source",
-        "feast",
-        "genre",
-        "service",
-    ).values(
-        "id",
-        "source_id",
-        "source__siglum",
-        "folio",
-        "c_sequence",
-        "incipit",
-        "feast__name",
-        "genre__name",
-        "service__name",
-        "position",
-        "cantus_id",
-        "image_link",
-        "mode",
-        "manuscript_full_text_std_spelling",
-        "volpiano",
+    published_ids: Iterator[int] = (
+        published_chants.order_by("id")
+        .values_list("id", flat=True)
+        .iterator(chunk_size=chunk_size)
+    )
+    changed_chants: Iterator[dict] = iter_chant_values(
+        published_chants.filter(
+            Q(date_updated__gt=since)
+            | Q(source__date_updated__gt=since)
+            | Q(feast__date_updated__gt=since)
+            | Q(genre__date_updated__gt=since)
+            | Q(service__date_updated__gt=since)
+        ),
+        chunk_size,
     )
+    previous_concordances: Iterator[tuple[int, str]] = iter_previous_concordances(
+        filepath
+    )
+
+    changed_count: int = 0
+    next_changed: Optional[dict] = next(changed_chants, None)
+    next_previous: Optional[tuple[int, str]] = next(previous_concordances, None)
+    for chant_id in published_ids:
+        # skip chants that were changed (or published) after published_ids was queried
+        while next_changed is not None and next_changed["id"] < chant_id:
+            next_changed = next(changed_chants, None)
+        # skip chants that have been deleted or unpublished since the last run
+        while next_previous is not None and next_previous[0] < chant_id:
+            next_previous = next(previous_concordances, None)
+
+        if next_changed is not None and next_changed["id"] == chant_id:
+            yield ujson.dumps(make_chant_dict(next_changed))
+            changed_count += 1
+        elif next_previous is not None and next_previous[0] == chant_id:
+            yield next_previous[1]
+        else:
+            # the chant is missing from the previous file without having been
+            # changed since then (e.g. the file was edited by hand)
+            missing_chant: dict = next(
+                iter_chant_values(Chant.objects.filter(id=chant_id), chunk_size)
+            )
+            yield ujson.dumps(make_chant_dict(missing_chant))
+            changed_count += 1
+    stdout.write(f"Updated concordances for {changed_count} chants.\n")
+
+
+def write_compressed_copies(filepath: str) -> None:
+    """Write gzip-compressed (and, if the brotli package is installed,
+    brotli-compressed) copies of a file next to it, at `<filepath>.gz` and
+    `<filepath>.br`, so that web servers can serve them to clients that accept
+    compressed responses without compressing the file on every request
+    (e.g. nginx's `gzip_static`).
+    """
+    with open(filepath, "rb") as source_file:
+        with tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(filepath), suffix=".gz.tmp", delete=False
+        ) as temp_file:
+            with gzip.GzipFile(
+                filename="", mode="wb", fileobj=temp_file, compresslevel=6, mtime=0
+            ) as gzip_file:
+                shutil.copyfileobj(source_file, gzip_file)
+        replace_compressed_copy(temp_file.name, filepath, ".gz")
+
+        if brotli is None:
+            return
+        source_file.seek(0)
+        compressor = brotli.Compressor(quality=9)
+        with tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(filepath), suffix=".br.tmp", delete=False
+        ) as temp_file:
+            while chunk := source_file.read(1024 * 1024):
+                temp_file.write(compressor.process(chunk))
+            temp_file.write(compressor.finish())
+        replace_compressed_copy(temp_file.name, filepath, ".br")
+
+
+def replace_compressed_copy(temp_filepath: str, filepath: str, extension: str) -> None:
+    os.chmod(temp_filepath, 0o644)
+    # give the compressed copy the same modification time as the original,
+    # so that both are served with the same Last-Modified header
+    stat = os.stat(filepath)
+    os.utime(temp_filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    os.replace(temp_filepath, filepath + extension)
+
+
+def get_shard_filename(shard_key: Optional[str]) -> str:
+    """Return the name of the file holding the concordances for a shard.
 
-    concordances: list[dict] = [make_chant_dict(chant) for chant in values]
-    return concordances
+    Characters other than ASCII letters, digits and hyphens are replaced with
+    their hexadecimal code point between underscores (e.g. `.` becomes `_2e_`),
+    so that different shard keys never share a file. Chants without a shard key
+    (i.e. without a Cantus ID) are written to `_.json`.
+    """
+    if not shard_key:
+        return "_.json"
+    escaped_key: str = "".join(
+        (
+            char
+            if (char.isascii() and char.isalnum()) or char == "-"
+            else f"_{ord(char):x}_"
+        )
+        for char in shard_key
+    )
+    return f"{escaped_key}.json"
+
+
+def write_sharded_concordances(
+    cache_dir: str, shard_by: str, prefix_length: int, chunk_size: int
+) -> dict:
+    """Write the concordances for all published chants, split into one file
+    per shard, to the SHARDS_DIRNAME subdirectory of `cache_dir`.
+
+    Chants are grouped either by the first `prefix_length` characters of their
+    Cantus ID, or by their source. Each shard is written with compressed copies
+    (see write_compressed_copies). A manifest listing the shards, with the
+    number of concordances, an ETag (the SHA-256 hash of the shard's contents),
+    the last modification time and the size of each, is written to
+    MANIFEST_FILENAME in the same directory, so that clients can fetch only the
+    shards that have changed since they last checked.
+
+    Shards whose contents haven't changed since the last run are left untouched,
+    so their modification time in the manifest (and their Last-Modified header)
+    stays the same. Shards that no longer have any chants are removed.
+
+    Args:
+        cache_dir (str): The directory in which to create the shards directory
+        shard_by (str): "cantus_id" or "source"
+        prefix_length (int): The length of the Cantus ID prefix that chants are
+            grouped by, if sharding by Cantus ID
+        chunk_size (int): The number of chants to fetch from the database at a time
+
+    Returns:
+        dict: The manifest
+    """
+    shards_dir: str = os.path.join(cache_dir, SHARDS_DIRNAME)
+    os.makedirs(shards_dir, exist_ok=True)
+    manifest_filepath: str = os.path.join(shards_dir, MANIFEST_FILENAME)
+
+    previous_shards: dict = {}
+    try:
+        with open(manifest_filepath) as manifest_file:
+            previous_manifest: dict = ujson.load(manifest_file)
+        if previous_manifest.get("shard_by") == shard_by and previous_manifest.get(
+            "prefix_length"
+        ) == (prefix_length if shard_by == "cantus_id" else None):
+            previous_shards = previous_manifest["shards"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    if shard_by == "cantus_id":
+        # chants without a Cantus ID all go in the same shard
+        shard_key_expression = Coalesce(
+            Substr("cantus_id", 1, prefix_length), Value("")
+        )
+    else:
+        shard_key_expression = Cast(F("source_id"), output_field=CharField())
+    chant_values: Iterator[dict] = (
+        Chant.objects.filter(source__published=True)
+        .select_related("source", "feast", "genre", "service")
+        .annotate(shard_key=shard_key_expression)
+        .order_by("shard_key", "id")
+        .values(*CHANT_VALUES, "shard_key")
+        .iterator(chunk_size=chunk_size)
+    )
+
+    shards: dict = {}
+    for shard_key, chants in itertools.groupby(
+        chant_values, key=lambda chant: chant["shard_key"]
+    ):
+        filename: str = get_shard_filename(shard_key)
+        filepath: str = os.path.join(shards_dir, filename)
+        temp_filepath, count, etag = write_temporary_concordances_file(
+            shards_dir, (ujson.dumps(make_chant_dict(chant)) for chant in chants)
+        )
+        previous_shard: Optional[dict] = previous_shards.get(shard_key)
+        if (
+            previous_shard is not None
+            and previous_shard["etag"] == etag
+            and os.path.exists(filepath)
+        ):
+            os.remove(temp_filepath)
+            shards[shard_key] = previous_shard
+            continue
+        os.replace(temp_filepath, filepath)
+        write_compressed_copies(filepath)
+        stat = os.stat(filepath)
+        shards[shard_key] = {
+            "path": f"{SHARDS_DIRNAME}/{filename}",
+            "count": count,
+            "etag": etag,
+            "last_modified": formatdate(stat.st_mtime, usegmt=True),
+            "size": stat.st_size,
+        }
+
+    # remove shards that no longer have any chants
+    for shard_key, previous_shard in previous_shards.items():
+        if shard_key in shards:
+            continue
+        filepath = os.path.join(cache_dir, previous_shard["path"])
+        for path in (filepath, f"{filepath}.gz", f"{filepath}.br"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    manifest: dict = {
+        "shard_by": shard_by,
+        "prefix_length": prefix_length if shard_by == "cantus_id" else None,
+        "generated": formatdate(usegmt=True),
+        "shards": shards,
+    }
+    with tempfile.NamedTemporaryFile(
+        "w", dir=shards_dir, suffix=".tmp", delete=False
+    ) as temp_file:
+        ujson.dump(manifest, temp_file, indent=2)
+    os.chmod(temp_file.name, 0o644)
+    os.replace(temp_file.name, manifest_filepath)
+    return manifest
 
 
 def make_chant_dict(chant: dict) -> dict:
@@ -0,0 +1,54 @@
+"""
+Rebuild the FeastChantCount table, which records how many chants of each feast
+each source has, by Cantus ID and genre. It is used by the feast detail page
+and is kept up to date as chants are saved, so this command only needs to be
+run once, after the table is created, or after the feast, cantus_id or genre
+fields of chants have been modified in bulk (e.g. with `QuerySet.update()`).
+
+Run with `python manage.py update_feast_chant_counts`. Use `--source-id` to
+only rebuild the counts of some sources.
+"""
+
+from django.core.management.base import BaseCommand
+
+from main_app.feast_chant_counts import update_feast_chant_counts
+from main_app.models import Source
+
+
+class Command(BaseCommand):
+    help = "Rebuild the counts of chants by feast used by the feast detail page."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source-id",
+            type=int,
+            action="append",
+            help="The ID of a source to update (can be repeated). "
+            "By default, all sources are updated.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Number of sources to update per transaction (default: 100).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size: int = options["batch_size"]
+        if options["source_id"]:
+            source_ids = options["source_id"]
+        else:
+            source_ids = list(
+                Source.objects.order_by("id").values_list("id", flat=True)
+            )
+
+        for start in range(0, len(source_ids), batch_size):
+            update_feast_chant_counts(source_ids[start : start + batch_size])
+            self.stdout.write(
+                f"Updated {min(start + batch_size, len(source_ids))} "
+                f"of {len(source_ids)} sources."
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS("Success! Feast chant counts have been updated.")
+        )
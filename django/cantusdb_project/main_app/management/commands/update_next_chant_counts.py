@@ -0,0 +1,54 @@
+"""
+Rebuild the NextChantCount table, which records how often a chant with one
+Cantus ID is followed by a chant with another Cantus ID in each source. It is
+used by the json-nextchants API and is kept up to date as chants are saved, so
+this command only needs to be run once, after the table is created, or after
+Chant.next_chant has been modified in bulk (e.g. with `QuerySet.update()`).
+
+Run with `python manage.py update_next_chant_counts`. Use `--source-id` to only
+rebuild the counts of some sources.
+"""
+
+from django.core.management.base import BaseCommand
+
+from main_app.models import Source
+from next_chants import update_next_chant_counts
+
+
+class Command(BaseCommand):
+    help = "Rebuild the counts of next chants used by the json-nextchants API."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source-id",
+            type=int,
+            action="append",
+            help="The ID of a source to update (can be repeated). "
+            "By default, all sources are updated.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Number of sources to update per transaction (default: 100).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size: int = options["batch_size"]
+        if options["source_id"]:
+            source_ids = options["source_id"]
+        else:
+            source_ids = list(
+                Source.objects.order_by("id").values_list("id", flat=True)
+            )
+
+        for start in range(0, len(source_ids), batch_size):
+            update_next_chant_counts(source_ids[start : start + batch_size])
+            self.stdout.write(
+                f"Updated {min(start + batch_size, len(source_ids))} "
+                f"of {len(source_ids)} sources."
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS("Success! Next chant counts have been updated.")
+        )
@@ -0,0 +1,116 @@
+"""
+Compute the alignments of the texts and melodies of chants that are displayed
+on the chant detail page, and store those that aren't cached yet (see
+alignment_cache.py), so that the pages of chants that haven't been viewed since
+their text or melody was last edited, or since volpiano_display_utilities was
+upgraded, don't need to syllabify their text when they are first rendered.
+
+Sources are processed independently of each other, so they can be processed by
+several worker processes at once with `--jobs`.
+
+Run with `python manage.py warm_alignment_cache`. Use `--source-id` to only
+process the chants of some sources.
+"""
+
+from functools import partial
+from multiprocessing import Pool
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from main_app.alignment_cache import cache_chant_alignments
+from main_app.models import Chant
+
+# the fields of chants used to align their text and melody
+ALIGNMENT_FIELDS: tuple[str, ...] = (
+    "id",
+    "volpiano",
+    "manuscript_syllabized_full_text",
+    "manuscript_full_text",
+    "manuscript_full_text_std_spelling",
+    "incipit",
+)
+
+
+class Command(BaseCommand):
+    help = "Cache the alignments of the texts and melodies of chants."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source-id",
+            type=int,
+            action="append",
+            help="The ID of a source whose chants to process (can be repeated). "
+            "By default, the chants of all sources are processed.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1_000,
+            help="Number of chants to fetch from the database at a time "
+            "(default: 1000).",
+        )
+        parser.add_argument(
+            "--jobs",
+            type=int,
+            default=1,
+            help="Number of sources to process in parallel (default: 1).",
+        )
+
+    def handle(self, *args, **options):
+        chants = Chant.objects.exclude(volpiano__isnull=True).exclude(volpiano="")
+        if options["source_id"]:
+            chants = chants.filter(source_id__in=options["source_id"])
+        source_ids = list(
+            chants.order_by("source_id").values_list("source_id", flat=True).distinct()
+        )
+
+        warm = partial(warm_source, chunk_size=options["chunk_size"])
+        if options["jobs"] > 1:
+            # worker processes must open their own database connections
+            connections.close_all()
+            with Pool(options["jobs"]) as pool:
+                counts = list(pool.imap_unordered(warm, source_ids))
+        else:
+            counts = list(map(warm, source_ids))
+
+        computed = sum(count for count, _ in counts)
+        errors = sum(error_count for _, error_count in counts)
+        if errors:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"The text of {errors} chants couldn't be syllabified."
+                )
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Success! {computed} alignments from {len(source_ids)} sources "
+                "have been cached."
+            )
+        )
+
+
+def warm_source(source_id: int, chunk_size: int) -> tuple[int, int]:
+    """Cache the alignments of the chants of a source, `chunk_size` chants at a
+    time (see alignment_cache.cache_chant_alignments())."""
+    chants = (
+        Chant.objects.filter(source_id=source_id)
+        .exclude(volpiano__isnull=True)
+        .exclude(volpiano="")
+        .only(*ALIGNMENT_FIELDS)
+        .order_by("id")
+    )
+    computed = errors = 0
+    chunk: list[Chant] = []
+    for chant in chants.iterator(chunk_size=chunk_size):
+        chunk.append(chant)
+        if len(chunk) == chunk_size:
+            chunk_computed, chunk_errors = cache_chant_alignments(chunk)
+            computed += chunk_computed
+            errors += chunk_errors
+            chunk = []
+    if chunk:
+        chunk_computed, chunk_errors = cache_chant_alignments(chunk)
+        computed += chunk_computed
+        errors += chunk_errors
+    return computed, errors
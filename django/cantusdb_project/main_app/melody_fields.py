@@ -0,0 +1,237 @@
+"""
+The fields of chants that are derived from their volpiano for melody search
+(see views.api.ajax_melody_search): volpiano_notes, volpiano_intervals and
+volpiano_interval_codes.
+
+They are set when a chant is saved (see signals.update_volpiano_fields()), and
+for many chants at once when chants are imported (see chant_import.py) or when
+the fields are backfilled by the rebuild_melody_index command. For these,
+generate_melody_fields() computes the intervals of all the chants at once with
+NumPy, if it is installed.
+"""
+
+from operator import sub
+import re
+from typing import NamedTuple, Sequence
+
+try:
+    # numpy is optional: without it, the chants are processed one at a time
+    import numpy as np
+except ImportError:
+    np = None
+
+# volpiano characters that aren't notes, including the clefs, barlines, and
+# accidentals etc., which are removed from volpiano_notes. The `searchMelody.js`
+# on old cantus makes no reference to the b-flat accidentals ("y", "i", "z") so
+# they are removed for now. `)` stands for the lowest `g` note liquescent in
+# volpiano, its 'lower case' is `9`.
+VOLPIANO_NOTES_TABLE = str.maketrans({")": "9"} | dict.fromkeys("-1234567?. yiz"))
+
+REPEATED_CHARS_RE = re.compile(r"(.)\1+")
+
+# the pitches of volpiano notes, from the lowest to the highest
+VOLPIANO_PITCHES: str = "89abcdefghjklmnopqrs"
+# the characters encoding the intervals between adjacent notes in
+# volpiano_interval_codes, from a descent of MAX_INTERVAL_CODE steps to an ascent of
+# MAX_INTERVAL_CODE steps. Only digits and lower-case letters are used, as the
+# trigram index of the field ignores other characters and the case of letters.
+INTERVAL_CODES: str = "0123456789abcdefghijklmnopqrstuvwxy"
+MAX_INTERVAL_CODE: int = len(INTERVAL_CODES) // 2
+
+PITCH_INDEXES: dict[str, int] = {note: i for i, note in enumerate(VOLPIANO_PITCHES)}
+# the few intervals wider than MAX_INTERVAL_CODE steps (between the two ends of
+# the volpiano range) share the code of the widest interval
+CODES_BY_INTERVAL: dict[int, str] = {
+    interval: INTERVAL_CODES[
+        max(-MAX_INTERVAL_CODE, min(interval, MAX_INTERVAL_CODE)) + MAX_INTERVAL_CODE
+    ]
+    for interval in range(-len(VOLPIANO_PITCHES), len(VOLPIANO_PITCHES) + 1)
+}
+
+# below this number of chants, generate_melody_fields() doesn't use NumPy, as
+# converting the notes to arrays takes longer than processing them one at a time
+NUMPY_MIN_BATCH_SIZE = 64
+
+
+class MelodyFields(NamedTuple):
+    volpiano_notes: str
+    volpiano_intervals: str
+    volpiano_interval_codes: str
+
+
+def generate_volpiano_notes(volpiano) -> str:
+    """
+    Populate the ``volpiano_notes`` field of the ``Chant`` model
+
+    This field is used for melody search
+
+    Args:
+        volpiano (str): The content of ``chant.volpiano``
+
+    Returns:
+        str: Volpiano str with non-note chars and duplicate consecutive notes removed
+    """
+    # convert all charactors to lower-case, upper-case letters stand for liquescent
+    # of the same pitch, and remove non-note charactors
+    volpiano_notes: str = volpiano.lower().translate(VOLPIANO_NOTES_TABLE)
+    # remove duplicate consecutive chars
+    return REPEATED_CHARS_RE.sub(r"\1", volpiano_notes)
+
+
+def generate_volpiano_intervals(volpiano_notes) -> str:
+    """
+    Populate the ``volpiano_intervals`` field of the ``Chant`` model
+
+    This field is used for melody search when searching for transpositions
+
+    Args:
+        volpiano_notes (str): The content of ``chant.volpiano_notes``,
+        populated by the ``generate_volpiano_notes`` function
+
+    Returns:
+        str: A str of digits, recording the intervals between adjacent notes
+    """
+    # we model the interval between notes using the difference between the ASCII
+    # codes of corresponding letters. Replace '9' (the note G) with the char
+    # corresponding to (ASCII(a) - 1), because 'a' denotes the note A.
+    # The letter for the note B is "j" (106), note A is "h" (104), the letter
+    # "i" (105) is skipped: move all notes above A down by one letter
+    pitches: list[int] = [
+        code - (code >= 106) for code in map(ord, volpiano_notes.replace("9", "`"))
+    ]
+    # Note that intervals are encoded by counting the number of scale
+    # steps between adjacent notes: an ascending second is thus encoded
+    # as "1"; a descending third is encoded "-2", and so on.
+    return "".join(map(str, map(sub, pitches[1:], pitches[:-1])))
+
+
+def generate_volpiano_interval_codes(volpiano_notes) -> str:
+    """
+    Populate the ``volpiano_interval_codes`` field of the ``Chant`` model
+
+    This field is used for melody search when searching for transpositions.
+    Like ``volpiano_intervals``, it records the number of scale steps between
+    adjacent notes, but with exactly one character per interval (see
+    INTERVAL_CODES), so that a search for a sequence of intervals can't match
+    in the middle of another interval, as "1" matches in "-1" or "12" in
+    ``volpiano_intervals``.
+
+    Args:
+        volpiano_notes (str): The content of ``chant.volpiano_notes``,
+        populated by the ``generate_volpiano_notes`` function
+
+    Returns:
+        str: A str with one character per interval between adjacent notes
+    """
+    # characters that aren't notes (e.g. the "w" and "x" flats) are skipped
+    pitches: list[int] = [
+        PITCH_INDEXES[note] for note in volpiano_notes if note in PITCH_INDEXES
+    ]
+    return "".join(
+        CODES_BY_INTERVAL[interval] for interval in map(sub, pitches[1:], pitches[:-1])
+    )
+
+
+def generate_melody_fields(volpianos: Sequence[str]) -> list[MelodyFields]:
+    """Compute the melody search fields of several chants from their volpiano.
+
+    The results are the same as those of generate_volpiano_notes(),
+    generate_volpiano_intervals() and generate_volpiano_interval_codes(), but
+    if NumPy is installed, the intervals of large batches are computed over the
+    notes of all the chants at once.
+
+    Args:
+        volpianos (Sequence[str]): The volpiano of each chant
+
+    Returns:
+        list[MelodyFields]: The fields of each chant, in the same order
+    """
+    notes: list[str] = [generate_volpiano_notes(volpiano) for volpiano in volpianos]
+    if np is None or len(notes) < NUMPY_MIN_BATCH_SIZE:
+        return [
+            MelodyFields(
+                chant_notes,
+                generate_volpiano_intervals(chant_notes),
+                generate_volpiano_interval_codes(chant_notes),
+            )
+            for chant_notes in notes
+        ]
+    return [
+        MelodyFields(chant_notes, intervals, codes)
+        for chant_notes, intervals, codes in zip(
+            notes, batch_volpiano_intervals(notes), batch_volpiano_interval_codes(notes)
+        )
+    ]
+
+
+def to_code_points(strings: list[str]) -> tuple["np.ndarray", "np.ndarray"]:
+    """Concatenate strings into an array of code points.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The code points, and the index in them at
+            which each string starts, followed by the total number of code points
+    """
+    code_points = np.frombuffer("".join(strings).encode("utf-32-le"), dtype=np.uint32)
+    starts = np.zeros(len(strings) + 1, dtype=np.int64)
+    np.cumsum([len(string) for string in strings], out=starts[1:])
+    return code_points.astype(np.int64), starts
+
+
+def batch_volpiano_intervals(notes: list[str]) -> list[str]:
+    """generate_volpiano_intervals() over several chants' notes at once."""
+    pitches, starts = to_code_points(notes)
+    pitches[pitches == ord("9")] = ord("`")
+    pitches[pitches >= 106] -= 1
+    # the intervals between adjacent notes, including the last note of a chant
+    # and the first note of the next one, which are left out below
+    intervals = np.diff(pitches)
+    if not len(intervals):
+        return ["" for _ in notes]
+
+    # write all the intervals into a single string, and find where those of
+    # each chant start and end in it
+    low = int(intervals.min())
+    labels = [str(interval) for interval in range(low, int(intervals.max()) + 1)]
+    label_lengths = np.array([len(label) for label in labels], dtype=np.int64)
+    text = "".join(np.array(labels, dtype=object)[intervals - low])
+    # (the offset of the end of the last interval is repeated for the chants
+    # with no notes at the end of the batch)
+    offsets = np.zeros(len(pitches) + 1, dtype=np.int64)
+    np.cumsum(label_lengths[intervals - low], out=offsets[1 : len(pitches)])
+    offsets[len(pitches)] = offsets[len(pitches) - 1]
+
+    # a chant with n notes has the n - 1 intervals that follow its first note
+    ends = np.maximum(starts[1:] - 1, starts[:-1])
+    return [
+        text[begin:end]
+        for begin, end in zip(offsets[starts[:-1]].tolist(), offsets[ends].tolist())
+    ]
+
+
+def batch_volpiano_interval_codes(notes: list[str]) -> list[str]:
+    """generate_volpiano_interval_codes() over several chants' notes at once."""
+    code_points, starts = to_code_points(notes)
+    # the index of each character in VOLPIANO_PITCHES, or -1 if it isn't a note
+    pitch_indexes = np.full(128, -1, dtype=np.int64)
+    for note, index in PITCH_INDEXES.items():
+        pitch_indexes[ord(note)] = index
+    indexes = np.where(
+        code_points < 128, pitch_indexes[np.minimum(code_points, 127)], -1
+    )
+
+    # skip the characters that aren't notes, and find where the notes of each
+    # chant start among the remaining ones
+    is_pitch = indexes >= 0
+    pitches = indexes[is_pitch]
+    pitch_counts = np.zeros(len(indexes) + 1, dtype=np.int64)
+    np.cumsum(is_pitch, out=pitch_counts[1:])
+    pitch_starts = pitch_counts[starts]
+
+    intervals = np.clip(np.diff(pitches), -MAX_INTERVAL_CODE, MAX_INTERVAL_CODE)
+    codes = np.frombuffer(INTERVAL_CODES.encode("ascii"), dtype=np.uint8)
+    text = codes[intervals + MAX_INTERVAL_CODE].tobytes().decode("ascii")
+
+    ends = np.maximum(pitch_starts[1:] - 1, pitch_starts[:-1])
+    return [
+        text[begin:end] for begin, end in zip(pitch_starts[:-1].tolist(), ends.tolist())
+    ]
@@ -0,0 +1,15 @@
+from main_app.signals import defer_source_count_updates
+
+
+class DeferSourceCountUpdatesMiddleware:
+    """Recompute the chant and melody counts of the sources whose chants are
+    saved or deleted while handling a request once, at the end of the request,
+    rather than after every save (see signals.defer_source_count_updates).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with defer_source_count_updates():
+            return self.get_response(request)
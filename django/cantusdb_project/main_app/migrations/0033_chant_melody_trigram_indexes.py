@@ -0,0 +1,32 @@
+# Generated by Django 4.2.16 on 2026-10-18 05:40
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main_app", "0032_alter_source_source_completeness"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name="chant",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["volpiano_notes"],
+                name="chant_volpiano_notes_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="chant",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["volpiano_intervals"],
+                name="chant_volpiano_intervals_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.16 on 2026-10-18 05:43
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main_app", "0033_chant_melody_trigram_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="chant",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="chant_search_vector_gin"
+            ),
+        ),
+    ]
@@ -0,0 +1,102 @@
+# Generated by Django 4.2.16 on 2026-10-18 05:44
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+import django.db.models.functions.text
+import main_app.lookups
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main_app", "0034_chant_search_vector_index"),
+    ]
+
+    operations = [
+        # `unaccent` is only STABLE (its result depends on the dictionary setting),
+        # so it can't be used in index expressions. Wrap it in an IMMUTABLE function
+        # that always uses the default `unaccent` dictionary.
+        migrations.RunSQL(
+            sql="""
+                CREATE OR REPLACE FUNCTION f_unaccent(text)
+                RETURNS text
+                LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+                AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$;
+            """,
+            reverse_sql="DROP FUNCTION IF EXISTS f_unaccent(text);",
+        ),
+        migrations.AddIndex(
+            model_name="chant",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper(
+                        main_app.lookups.ImmutableUnaccent("incipit")
+                    ),
+                    name="gin_trgm_ops",
+                ),
+                name="chant_incipit_trgm",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="chant",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper(
+                        main_app.lookups.ImmutableUnaccent("manuscript_full_text")
+                    ),
+                    name="gin_trgm_ops",
+                ),
+                name="chant_ms_full_text_trgm",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="chant",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper(
+                        main_app.lookups.ImmutableUnaccent(
+                            "manuscript_full_text_std_spelling"
+                        )
+                    ),
+                    name="gin_trgm_ops",
+                ),
+                name="chant_ms_full_text_std_trgm",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="source",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper(
+                        main_app.lookups.ImmutableUnaccent("shelfmark")
+                    ),
+                    name="gin_trgm_ops",
+                ),
+                name="source_shelfmark_trgm",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="source",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper(
+                        main_app.lookups.ImmutableUnaccent("description")
+                    ),
+                    name="gin_trgm_ops",
+                ),
+                name="source_description_trgm",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="source",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper(
+                        main_app.lookups.ImmutableUnaccent("summary")
+                    ),
+                    name="gin_trgm_ops",
+                ),
+                name="source_summary_trgm",
+            ),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.16 on 2026-10-18 06:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main_app", "0035_f_unaccent_trigram_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NextChantCount",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("published", models.BooleanField()),
+                ("cantus_id", models.CharField(max_length=255)),
+                ("next_cantus_id", models.CharField(max_length=255)),
+                ("count", models.PositiveIntegerField()),
+                (
+                    "source",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="next_chant_counts",
+                        to="main_app.source",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["cantus_id", "published"],
+                        name="next_chant_count_cid_pub_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="nextchantcount",
+            constraint=models.UniqueConstraint(
+                fields=("source", "cantus_id", "next_cantus_id"),
+                name="unique_next_chant_count",
+            ),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 4.2.16 on 2026-10-18 06:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main_app", "0036_next_chant_count"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FeastChantCount",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("published", models.BooleanField()),
+                ("cantus_id", models.CharField(max_length=255, null=True)),
+                ("count", models.PositiveIntegerField()),
+                ("first_chant_id", models.IntegerField()),
+                ("incipit", models.CharField(max_length=255, null=True)),
+                (
+                    "feast",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="feast_chant_counts",
+                        to="main_app.feast",
+                    ),
+                ),
+                (
+                    "genre",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="main_app.genre",
+                    ),
+                ),
+                (
+                    "source",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="feast_chant_counts",
+                        to="main_app.source",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["feast", "published"], name="feast_chant_count_pub_idx"
+                    )
+                ],
+            },
+        ),
+    ]
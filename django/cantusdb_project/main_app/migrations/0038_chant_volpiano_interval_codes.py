@@ -0,0 +1,75 @@
+# Generated by Django 4.2.16 on 2026-10-18 06:46
+
+from itertools import islice
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+from main_app.melody_fields import generate_volpiano_interval_codes
+
+# number of chants whose volpiano_interval_codes are set per query
+BATCH_SIZE = 1_000
+
+
+def populate_volpiano_interval_codes(apps, schema_editor):
+    """Set the volpiano_interval_codes of existing chants and sequences from their
+    volpiano_notes, with one query per batch, so that searches for transpositions
+    (which use the new field) find them as soon as the migration is applied."""
+    connection = schema_editor.connection
+    for model_name in ("Chant", "Sequence"):
+        model = apps.get_model("main_app", model_name)
+        table = model._meta.db_table
+        notes = (
+            model.objects.filter(volpiano_notes__isnull=False)
+            .values_list("id", "volpiano_notes")
+            .order_by("id")
+            .iterator(chunk_size=BATCH_SIZE)
+        )
+        with connection.cursor() as cursor:
+            while batch := list(islice(notes, BATCH_SIZE)):
+                values = ", ".join(["(%s, %s)"] * len(batch))
+                params = [
+                    value
+                    for chant_id, volpiano_notes in batch
+                    for value in (
+                        chant_id,
+                        generate_volpiano_interval_codes(volpiano_notes),
+                    )
+                ]
+                cursor.execute(
+                    f"UPDATE {table} SET volpiano_interval_codes = codes.codes "
+                    f"FROM (VALUES {values}) AS codes (id, codes) "
+                    f"WHERE {table}.id = codes.id",
+                    params,
+                )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main_app", "0037_feast_chant_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chant",
+            name="volpiano_interval_codes",
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="sequence",
+            name="volpiano_interval_codes",
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.RunPython(
+            populate_volpiano_interval_codes, migrations.RunPython.noop
+        ),
+        migrations.AddIndex(
+            model_name="chant",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["volpiano_interval_codes"],
+                name="chant_volpiano_int_codes_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+    ]
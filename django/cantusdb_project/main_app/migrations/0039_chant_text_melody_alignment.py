@@ -0,0 +1,33 @@
+# Generated by Django 4.2.16 on 2026-10-18 14:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main_app", "0038_chant_volpiano_interval_codes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chant",
+            name="text_melody_alignment",
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="chant",
+            name="text_melody_alignment_digest",
+            field=models.CharField(blank=True, max_length=32, null=True),
+        ),
+        migrations.AddField(
+            model_name="sequence",
+            name="text_melody_alignment",
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="sequence",
+            name="text_melody_alignment_digest",
+            field=models.CharField(blank=True, max_length=32, null=True),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.16 on 2026-10-18 15:03
+
+from django.db import migrations, models
+
+from main_app.models.chant import get_folio_sort_key
+
+# number of distinct folios whose sort key is set per query
+BATCH_SIZE = 1_000
+
+
+def populate_folio_sort_keys(apps, schema_editor):
+    """Set the folio_sort_key of existing chants and sequences, with one query
+    per batch of distinct folios (there are far fewer folios than chants)."""
+    connection = schema_editor.connection
+    for model_name in ("Chant", "Sequence"):
+        model = apps.get_model("main_app", model_name)
+        table = model._meta.db_table
+        folios = list(
+            model.objects.filter(folio__isnull=False)
+            .values_list("folio", flat=True)
+            .distinct()
+        )
+        with connection.cursor() as cursor:
+            for start in range(0, len(folios), BATCH_SIZE):
+                batch = folios[start : start + BATCH_SIZE]
+                values = ", ".join(["(%s, %s)"] * len(batch))
+                params = [
+                    value
+                    for folio in batch
+                    for value in (folio, get_folio_sort_key(folio))
+                ]
+                cursor.execute(
+                    f"UPDATE {table} SET folio_sort_key = keys.sort_key "
+                    f"FROM (VALUES {values}) AS keys (folio, sort_key) "
+                    f"WHERE {table}.folio = keys.folio",
+                    params,
+                )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main_app", "0039_chant_text_melody_alignment"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chant",
+            name="folio_sort_key",
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name="sequence",
+            name="folio_sort_key",
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.RunPython(populate_folio_sort_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="chant",
+            index=models.Index(
+                fields=["source", "folio_sort_key", "c_sequence"],
+                name="chant_source_folio_key_idx",
+            ),
+        ),
+    ]
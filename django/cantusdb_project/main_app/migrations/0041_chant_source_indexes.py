@@ -0,0 +1,60 @@
+# Generated by Django 4.2.16 on 2026-10-18 16:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main_app", "0040_chant_folio_sort_key"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="chant",
+            name="chant_source_folio_key_idx",
+        ),
+        migrations.AddIndex(
+            model_name="chant",
+            index=models.Index(
+                fields=["source", "folio_sort_key", "c_sequence"],
+                include=("folio",),
+                name="chant_source_folio_key_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="chant",
+            index=models.Index(
+                fields=["source", "folio", "c_sequence"],
+                name="chant_source_folio_seq_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="chant",
+            index=models.Index(
+                fields=["source", "feast"], name="chant_source_feast_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="chant",
+            index=models.Index(
+                condition=models.Q(("volpiano__isnull", False)),
+                fields=["source"],
+                name="chant_source_melody_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="chant",
+            index=models.Index(
+                fields=["cantus_id", "source"], name="chant_cantus_id_source_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="chant",
+            index=models.Index(
+                condition=models.Q(("volpiano__isnull", False)),
+                fields=["cantus_id"],
+                name="chant_cantus_id_melody_idx",
+            ),
+        ),
+    ]
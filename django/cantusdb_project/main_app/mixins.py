@@ -1,9 +1,13 @@
 from typing import Any
+from django.contrib.messages import get_messages
+from django.core.cache import cache
 from django.http.response import JsonResponse, HttpResponse
 from django.http.request import HttpRequest
 from django.core.exceptions import ImproperlyConfigured
 from django.template.response import TemplateResponse
 
+from main_app.view_cache import get_view_cache_key
+
 
 class JSONResponseMixin:
     """
@@ -57,3 +61,49 @@ class JSONResponseMixin:
                 "A JSONResponseMixin must be used with a DetailView or ListView."
             ) from exc
         return template_response
+
+
+class AnonymousCacheMixin:
+    """
+    Mixin to cache the pages of a public, read-only view for anonymous
+    users (see view_cache.py).
+
+    GET requests from anonymous users are answered from the cache
+    when possible. Otherwise, the response is rendered as usual and
+    stored in the cache for `cache_timeout` seconds, unless it sets
+    cookies or isn't a 200 response. Requests from logged-in users,
+    who can see unpublished sources, always bypass the cache.
+    """
+
+    cache_timeout: int = 60 * 60
+
+    def dispatch(self, request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponse:
+        if (
+            request.method not in ("GET", "HEAD")
+            or request.user.is_authenticated
+            # pages with messages are specific to the user's session
+            or len(get_messages(request)) > 0
+        ):
+            return super().dispatch(request, *args, **kwargs)  # type: ignore[misc]
+
+        key = get_view_cache_key(request, type(self).__name__)
+        response = cache.get(key)
+        if response is not None:
+            return response
+
+        response = super().dispatch(request, *args, **kwargs)  # type: ignore[misc]
+
+        def store(response: HttpResponse) -> None:
+            if (
+                response.status_code == 200
+                and not response.cookies
+                and not request.META.get("CSRF_COOKIE_NEEDS_UPDATE")
+            ):
+                cache.set(key, response, self.cache_timeout)
+
+        if hasattr(response, "render") and callable(response.render):
+            # template responses can only be pickled once rendered
+            response.add_post_render_callback(store)
+        else:
+            store(response)
+        return response
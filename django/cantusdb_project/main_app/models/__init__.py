@@ -14,3 +14,5 @@ from main_app.models.source_identifier import SourceIdentifier
 from main_app.models.institution import Institution
 from main_app.models.institution_identifier import InstitutionIdentifier
 from main_app.models.project import Project
+from main_app.models.next_chant_count import NextChantCount
+from main_app.models.feast_chant_count import FeastChantCount
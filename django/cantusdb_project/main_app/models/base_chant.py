@@ -29,6 +29,9 @@ class BaseChant(BaseModel):
     folio = models.CharField(
         help_text="Binding order", blank=True, null=True, max_length=255, db_index=True
     )
+    # "folio_sort_key" is derived from "folio" (see chant.get_folio_sort_key()), and is
+    # used instead of it to sort chants in folio order
+    folio_sort_key = models.CharField(blank=True, null=True, max_length=255)
     # The "s_sequence" char field, used for Sequences, is used to indicate the relative positions of sequences on the page.
     # It sometimes features non-numeric characters and leading zeroes, so it's a CharField.
     s_sequence = models.CharField("Sequence", blank=True, null=True, max_length=255)
@@ -133,8 +136,18 @@ class BaseChant(BaseModel):
     # and removing consecutive repeated notes.
     # "volpiano_intervals" is extracted from the "volpiano_notes" field.
     # It records the intervals between any two adjacent volpiano notes.
+    # "volpiano_interval_codes" records the same intervals with one character each,
+    # and is the field used to search for transpositions.
     volpiano_notes = models.TextField(null=True, blank=True)
     volpiano_intervals = models.TextField(null=True, blank=True)
+    volpiano_interval_codes = models.TextField(null=True, blank=True)
+    # "text_melody_alignment" stores the chant's text aligned with its melody, as
+    # displayed on the chant detail page, and "text_melody_alignment_digest" a hash
+    # of the text and melody it was aligned from (see alignment_cache.py).
+    text_melody_alignment = models.JSONField(null=True, blank=True)
+    text_melody_alignment_digest = models.CharField(
+        max_length=32, null=True, blank=True
+    )
 
     P2V = "2v"
     P3V = "3v"
@@ -1,7 +1,94 @@
+import re
+from typing import Optional
+
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db import models
+from django.db.models import DEFERRED
+from django.db.models import Q
+from django.db.models.functions import Upper
 from django.db.models.query import QuerySet
+from main_app.lookups import ImmutableUnaccent
 from main_app.models.base_chant import BaseChant
 
 
+def get_next_folio(folio: Optional[str]) -> Optional[str]:
+    """This is useful when the 'next chant' we need is on the next folio
+    Args:
+        folio (str): the folio number of a certain chant
+    Returns:
+        str: the folio number of the next folio
+    """
+    # For chants that end with ra, rb, va, vb - don't do anything about those. That formatting will not stay.
+
+    if folio is None:
+        # this shouldn't happen, but during testing, we may have some chants without folio
+        next_folio = None
+        return next_folio
+
+    # some folios begin with an "a" - these should be treated like other folios, but preserving the leading "a"
+    if folio[0] == "a":
+        prefix, folio = folio[:1], folio[1:]
+    else:
+        prefix = ""
+
+    stem, suffix = folio[:3], folio[3:]
+    if stem.isdecimal():
+        stem_int = int(stem)
+    else:
+        next_folio = None
+        return next_folio
+
+    if suffix == "r":
+        # 001r -> 001v
+        next_folio = prefix + stem + "v"
+    elif suffix == "v":
+        next_stem = str(stem_int + 1).zfill(3)
+        next_folio = prefix + next_stem + "r"
+    elif suffix == "":
+        # 001 -> 002
+        next_folio = prefix + str(stem_int + 1).zfill(3)
+
+    # special cases: inserted pages
+    elif suffix == "w":
+        # 001w -> 001x
+        next_folio = prefix + stem + "x"
+    elif suffix == "y":
+        # 001y -> 001z
+        next_folio = prefix + stem + "z"
+    elif suffix == "a":
+        # 001a -> 001b
+        next_folio = prefix + stem + "b"
+    else:
+        # unusual/uncommon suffix
+        next_folio = None
+    return next_folio
+
+
+FOLIO_RE = re.compile(r"(?P<prefix>a?)(?P<stem>[0-9]+)(?P<suffix>.*)", re.DOTALL)
+
+
+def get_folio_sort_key(folio: Optional[str]) -> Optional[str]:
+    """Build the key by which chants are sorted by folio (BaseChant.folio_sort_key)
+
+    Folios are made of an optional "a" prefix, a stem of digits and a suffix (see
+    get_next_folio()), but the stems aren't always zero-padded to the same length,
+    so sorting folios as strings puts "10r" before "9r". In the key, the stem is
+    zero-padded to 6 digits. Folios that don't start with a stem are sorted after
+    all the others.
+
+    Args:
+        folio (str): the folio number of a certain chant
+    Returns:
+        str: the sort key of the folio
+    """
+    if folio is None:
+        return None
+    match = FOLIO_RE.fullmatch(folio)
+    if match is None:
+        return f"~{folio}"[:255]
+    return f"{match['prefix']}{int(match['stem']):06d}{match['suffix']}"[:255]
+
+
 class Chant(BaseChant):
     """The model for chants
 
@@ -11,6 +98,107 @@ class Chant(BaseChant):
     models harmonized, even if only one of the two models uses a particular field.
     """
 
+    # fields whose values when the chant was loaded are kept in loaded_values, so
+    # that saving the chant can tell what it changes without querying the database
+    # (see signals.py)
+    TRACKED_FIELDS: tuple[str, ...] = ("cantus_id", "feast_id")
+
+    class Meta:
+        indexes = [
+            # Indexes for the queries on the chants of a source, made by the source
+            # detail, browse, inventory and edit pages (views.source and
+            # views.chant) and by refresh_source_counts() in signals.py.
+            # See the explain_chant_queries command for the plans of these queries.
+            # Used to list the chants of a source in folio order (see folio_sort_key),
+            # and the folios of a source (with an index-only scan)
+            models.Index(
+                fields=["source", "folio_sort_key", "c_sequence"],
+                include=["folio"],
+                name="chant_source_folio_key_idx",
+            ),
+            # Used to list the chants on a folio of a source
+            models.Index(
+                fields=["source", "folio", "c_sequence"],
+                name="chant_source_folio_seq_idx",
+            ),
+            # Used to list the chants of a feast in a source, and the feast changes
+            # of a source (see source_navigation.get_feast_changes())
+            models.Index(fields=["source", "feast"], name="chant_source_feast_idx"),
+            # Used to count the melodies of a source (Source.number_of_melodies)
+            models.Index(
+                fields=["source"],
+                name="chant_source_melody_idx",
+                condition=Q(volpiano__isnull=False),
+            ),
+            # Indexes for the queries on the chants with a given Cantus ID, made by
+            # ChantByCantusIDView and the JSON exports (views.api), which also
+            # filter by source (Source.published).
+            models.Index(
+                fields=["cantus_id", "source"], name="chant_cantus_id_source_idx"
+            ),
+            # Used to list the melodies with a given Cantus ID
+            models.Index(
+                fields=["cantus_id"],
+                name="chant_cantus_id_melody_idx",
+                condition=Q(volpiano__isnull=False),
+            ),
+            # Trigram indexes used by melody search (views.api.ajax_melody_search).
+            # They let Postgres shortlist candidate chants for `LIKE '%...%'` and
+            # `LIKE '...%'` queries on the melody fields before rechecking the
+            # exact match, rather than scanning every chant in the database.
+            GinIndex(
+                fields=["volpiano_notes"],
+                name="chant_volpiano_notes_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+            GinIndex(
+                fields=["volpiano_intervals"],
+                name="chant_volpiano_intervals_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+            GinIndex(
+                fields=["volpiano_interval_codes"],
+                name="chant_volpiano_int_codes_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+            # Used by full-text chant search (see views.chant.filter_by_full_text).
+            GinIndex(fields=["search_vector"], name="chant_search_vector_gin"),
+            # Trigram indexes used by keyword search (views.chant.ChantSearchView).
+            # They match the `<field>__f_unaccent__icontains` and
+            # `<field>__f_unaccent__istartswith` lookups (see main_app.lookups).
+            GinIndex(
+                OpClass(Upper(ImmutableUnaccent("incipit")), name="gin_trgm_ops"),
+                name="chant_incipit_trgm",
+            ),
+            GinIndex(
+                OpClass(
+                    Upper(ImmutableUnaccent("manuscript_full_text")),
+                    name="gin_trgm_ops",
+                ),
+                name="chant_ms_full_text_trgm",
+            ),
+            GinIndex(
+                OpClass(
+                    Upper(ImmutableUnaccent("manuscript_full_text_std_spelling")),
+                    name="gin_trgm_ops",
+                ),
+                name="chant_ms_full_text_std_trgm",
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_values = instance.get_tracked_values()
+        return instance
+
+    def get_tracked_values(self) -> dict:
+        """Return the current values of the chant's TRACKED_FIELDS, or DEFERRED
+        for those that haven't been loaded."""
+        return {
+            field: self.__dict__.get(field, DEFERRED) for field in self.TRACKED_FIELDS
+        }
+
     def index_components(self) -> dict:
         """Constructs a dictionary of weighted lists of search terms.
 
@@ -50,58 +238,6 @@ class Chant(BaseChant):
             chant_object/None: the next chant object, or None if there is no next chant
         """
 
-        def get_next_folio(folio):
-            """This is useful when the 'next chant' we need is on the next folio
-            Args:
-                folio (str): the folio number of a certain chant
-            Returns:
-                str: the folio number of the next folio
-            """
-            # For chants that end with ra, rb, va, vb - don't do anything about those. That formatting will not stay.
-
-            if folio is None:
-                # this shouldn't happen, but during testing, we may have some chants without folio
-                next_folio = None
-                return next_folio
-
-            # some folios begin with an "a" - these should be treated like other folios, but preserving the leading "a"
-            if folio[0] == "a":
-                prefix, folio = folio[:1], folio[1:]
-            else:
-                prefix = ""
-
-            stem, suffix = folio[:3], folio[3:]
-            if stem.isdecimal():
-                stem_int = int(stem)
-            else:
-                next_folio = None
-                return next_folio
-
-            if suffix == "r":
-                # 001r -> 001v
-                next_folio = prefix + stem + "v"
-            elif suffix == "v":
-                next_stem = str(stem_int + 1).zfill(3)
-                next_folio = prefix + next_stem + "r"
-            elif suffix == "":
-                # 001 -> 002
-                next_folio = prefix + str(stem_int + 1).zfill(3)
-
-            # special cases: inserted pages
-            elif suffix == "w":
-                # 001w -> 001x
-                next_folio = prefix + stem + "x"
-            elif suffix == "y":
-                # 001y -> 001z
-                next_folio = prefix + stem + "z"
-            elif suffix == "a":
-                # 001a -> 001b
-                next_folio = prefix + stem + "b"
-            else:
-                # unusual/uncommon suffix
-                next_folio = None
-            return next_folio
-
         try:
             next_chant = Chant.objects.get(
                 source=self.source,
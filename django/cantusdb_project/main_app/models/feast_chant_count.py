@@ -0,0 +1,47 @@
+from django.db import models
+
+
+class FeastChantCount(models.Model):
+    """The number of chants of a feast, in a source, with a given Cantus ID and
+    genre.
+
+    This table is derived from the chants' feast, cantus_id and genre fields,
+    and is used to display the most frequent chants and the sources of a feast
+    (see views.feast.FeastDetailView). It is kept up to date when chants are
+    saved or deleted (see signals.py), and can be rebuilt with the
+    `update_feast_chant_counts` command.
+    """
+
+    # indexed by feast_chant_count_pub_idx
+    feast = models.ForeignKey(
+        "Feast",
+        on_delete=models.CASCADE,
+        related_name="feast_chant_counts",
+        db_index=False,
+    )
+    source = models.ForeignKey(
+        "Source", on_delete=models.CASCADE, related_name="feast_chant_counts"
+    )
+    # copied from source.published, so that the counts of published sources
+    # can be looked up without joining the source table
+    published = models.BooleanField()
+    cantus_id = models.CharField(max_length=255, null=True)
+    genre = models.ForeignKey(
+        "Genre", on_delete=models.CASCADE, null=True, related_name="+"
+    )
+    count = models.PositiveIntegerField()
+    # the ID and incipit of the first of these chants, so that the first
+    # incipit of each Cantus ID in the feast can be displayed
+    first_chant_id = models.IntegerField()
+    incipit = models.CharField(max_length=255, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["feast", "published"],
+                name="feast_chant_count_pub_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.feast_id}: {self.cantus_id} ({self.count})"
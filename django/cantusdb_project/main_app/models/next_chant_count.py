@@ -0,0 +1,39 @@
+from django.db import models
+
+
+class NextChantCount(models.Model):
+    """The number of chants with a given Cantus ID, in a source, whose next chant
+    has another given Cantus ID.
+
+    This table is derived from Chant.next_chant, and is used to suggest the
+    chants that usually follow a chant (see next_chants.next_chants). It is
+    kept up to date when chants are saved or deleted (see signals.py), and can
+    be rebuilt with the `update_next_chant_counts` command.
+    """
+
+    source = models.ForeignKey(
+        "Source", on_delete=models.CASCADE, related_name="next_chant_counts"
+    )
+    # copied from source.published, so that the counts of published sources
+    # can be looked up without joining the source table
+    published = models.BooleanField()
+    cantus_id = models.CharField(max_length=255)
+    next_cantus_id = models.CharField(max_length=255)
+    count = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["cantus_id", "published"],
+                name="next_chant_count_cid_pub_idx",
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["source", "cantus_id", "next_cantus_id"],
+                name="unique_next_chant_count",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.cantus_id} -> {self.next_cantus_id} ({self.count})"
@@ -1,4 +1,7 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
+from main_app.lookups import ImmutableUnaccent
 from main_app.models import BaseModel, Segment
 from django.contrib.auth import get_user_model
 
@@ -173,6 +176,25 @@ class Source(BaseModel):
     number_of_chants = models.IntegerField(blank=True, null=True)
     number_of_melodies = models.IntegerField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Trigram indexes used by the source list search
+            # (views.source.SourceListView). They match the
+            # `<field>__f_unaccent__icontains` lookup (see main_app.lookups).
+            GinIndex(
+                OpClass(Upper(ImmutableUnaccent("shelfmark")), name="gin_trgm_ops"),
+                name="source_shelfmark_trgm",
+            ),
+            GinIndex(
+                OpClass(Upper(ImmutableUnaccent("description")), name="gin_trgm_ops"),
+                name="source_description_trgm",
+            ),
+            GinIndex(
+                OpClass(Upper(ImmutableUnaccent("summary")), name="gin_trgm_ops"),
+                name="source_summary_trgm",
+            ),
+        ]
+
     def __str__(self):
         return self.heading
 
@@ -1,74 +1,189 @@
 import operator
+import threading
+from contextlib import contextmanager
 from functools import reduce
 
 from django.contrib.postgres.search import SearchVector
-from django.db import models
-from django.db.models import Value
-from django.db.models.signals import post_save, post_delete
+from django.db import models, transaction
+from django.db.models import DEFERRED, Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import m2m_changed, pre_save, post_save, post_delete
 from django.dispatch import receiver
 
-from typing import Optional
-
-import re
+from typing import Iterable, Iterator, Optional
 
+from main_app.alignment_cache import update_chant_alignment
+from main_app.cantus_id_cache import invalidate_all_cantus_ids, invalidate_cantus_id
+from main_app.feast_chant_counts import (
+    update_feast_chant_counts,
+    update_feast_chant_counts_published,
+)
+from main_app.melody_fields import generate_melody_fields
 from main_app.models import Chant
+from main_app.models.chant import get_folio_sort_key
 from main_app.models import Sequence
 from main_app.models import Feast
+from main_app.models import Genre
+from main_app.models import Institution
+from main_app.models import Service
 from main_app.models import Source
+from main_app.source_navigation import (
+    invalidate_all_source_navigation,
+    invalidate_source_navigation,
+)
+from main_app.view_cache import invalidate_view_cache
+from next_chants import update_next_chant_counts, update_next_chant_counts_published
+
+
+# Sources whose number_of_chants, number_of_melodies and next chant counts need
+# to be recomputed, collected while inside defer_source_count_updates()
+_deferred_source_counts = threading.local()
+
+
+# Fields of Chant that are derived from its other fields in on_chant_pre_save()
+CHANT_DERIVED_FIELDS: tuple[str, ...] = (
+    "incipit",
+    "folio_sort_key",
+    "volpiano_notes",
+    "volpiano_intervals",
+    "volpiano_interval_codes",
+    "text_melody_alignment",
+    "text_melody_alignment_digest",
+    "search_vector",
+)
+
+
+@receiver(pre_save, sender=Chant)
+def on_chant_pre_save(instance, **kwargs) -> None:
+    # set the derived fields on the instance, so that they are written to the
+    # database in the same query as the rest of the chant
+    update_chant_incipit_field(instance)
+    update_folio_sort_key(instance)
+    update_volpiano_fields(instance)
+    update_chant_alignment(instance)
+    update_chant_search_vector(instance)
+    if not instance._state.adding:
+        # the chant may be given another Cantus ID, in which case the cached
+        # responses of its previous Cantus ID must be refreshed too. The Cantus
+        # ID that the chant was loaded or last saved with is only queried if it
+        # wasn't loaded (see Chant.from_db())
+        previous_cantus_id = get_loaded_value(instance, "cantus_id")
+        if previous_cantus_id is DEFERRED:
+            previous_cantus_id = (
+                Chant.objects.filter(pk=instance.pk)
+                .values_list("cantus_id", flat=True)
+                .first()
+            )
+        if previous_cantus_id != instance.cantus_id:
+            invalidate_cantus_id(previous_cantus_id)
 
 
 @receiver(post_save, sender=Chant)
-def on_chant_save(instance, **kwargs) -> None:
-    update_source_chant_count(instance)
-    update_source_melody_count(instance)
-
-    update_chant_search_vector(instance)
-    update_chant_incipit_field(instance)
-    update_volpiano_fields(instance)
+def on_chant_save(instance, created, update_fields=None, **kwargs) -> None:
+    update_source_counts(instance, created)
+    invalidate_source_navigation(instance.source_id)
+    invalidate_cantus_id(instance.cantus_id)
+    instance.loaded_values = instance.get_tracked_values()
+
+    if update_fields is not None:
+        # only the fields in update_fields were written, so write the derived fields
+        Chant.objects.filter(pk=instance.pk).update(
+            **{field: getattr(instance, field) for field in CHANT_DERIVED_FIELDS}
+        )
 
 
 @receiver(post_delete, sender=Chant)
 def on_chant_delete(instance, **kwargs) -> None:
-    update_source_chant_count(instance)
-    update_source_melody_count(instance)
+    update_source_counts(instance)
+    invalidate_source_navigation(instance.source_id)
+    invalidate_cantus_id(instance.cantus_id)
+
+
+@receiver(pre_save, sender=Sequence)
+def on_sequence_pre_save(instance, **kwargs) -> None:
+    update_folio_sort_key(instance)
 
 
 @receiver(post_save, sender=Sequence)
 def on_sequence_save(instance, **kwargs) -> None:
-    update_source_chant_count(instance)
+    update_source_counts(instance)
     update_sequence_incipit_field(instance)
 
 
 @receiver(post_delete, sender=Sequence)
 def on_sequence_delete(instance, **kwargs) -> None:
-    update_source_chant_count(instance)
+    update_source_counts(instance)
+
+
+@receiver(post_save, sender=Source)
+def on_source_save(instance, **kwargs) -> None:
+    update_next_chant_counts_published(instance)
+    update_feast_chant_counts_published(instance)
 
 
 @receiver(post_save, sender=Feast)
 def on_feast_save(instance, **kwargs) -> None:
     update_prefix_field(instance)
+    invalidate_all_source_navigation()
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=Service)
+def on_genre_or_service_save(instance, **kwargs) -> None:
+    invalidate_all_source_navigation()
+
+
+@receiver(post_save, sender=Source)
+@receiver(post_delete, sender=Source)
+@receiver(post_save, sender=Institution)
+@receiver(post_delete, sender=Institution)
+@receiver(post_save, sender=Feast)
+@receiver(post_delete, sender=Feast)
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def on_chant_related_change(**kwargs) -> None:
+    # the responses cached by Cantus ID (see cantus_id_cache.py) display fields
+    # of the chants' sources, institutions, feasts, genres and services
+    invalidate_all_cantus_ids()
+
+
+@receiver(post_save)
+@receiver(post_delete)
+@receiver(m2m_changed)
+def on_main_app_change(sender, **kwargs) -> None:
+    # the pages cached for anonymous users (see view_cache.py) can display
+    # any object of the main app
+    if sender._meta.app_label == "main_app":
+        invalidate_view_cache()
 
 
 def update_chant_search_vector(instance) -> None:
-    """When saving an instance of Chant, update its search vector field.
+    """When saving an instance of Chant, set its search vector field to an
+    expression that computes the search vector from the chant's text, so that
+    it is written in the same query as the rest of the chant.
 
-    Called in on_chant_save()
+    Called in on_chant_pre_save()
     """
     index_components = instance.index_components()
-    pk = instance.pk
     search_vectors = []
 
     for weight, data in index_components.items():
         search_vectors.append(
             SearchVector(Value(data, output_field=models.TextField()), weight=weight)
         )
-    instance.__class__.objects.filter(pk=pk).update(
-        search_vector=reduce(operator.add, search_vectors)
-    )
+    instance.search_vector = reduce(operator.add, search_vectors)
 
 
-def update_source_chant_count(instance) -> None:
-    """When saving or deleting a Chant or Sequence, update its Source's number_of_chants field
+def update_source_counts(instance, created: bool = False) -> None:
+    """When saving or deleting a Chant or Sequence, update its Source's
+    number_of_chants and number_of_melodies fields, and the other counts over
+    the source's chants that the chant may have changed (see update_chant_counts())
+
+    Inside defer_source_count_updates(), the source is only marked as needing
+    to be updated, and all its counts are recomputed when the block exits (see
+    refresh_source_counts()).
 
     Called in on_chant_save(), on_chant_delete(), on_sequence_save() and on_sequence_delete()
     """
@@ -78,124 +193,155 @@ def update_source_chant_count(instance) -> None:
         source = instance.source
     except Source.DoesNotExist:
         source = None
-    if source is not None:
-        source.number_of_chants = source.chant_set.count() + source.sequence_set.count()
-        source.save()
+    if source is None:
+        return
 
+    deferred_source_ids: Optional[set[int]] = getattr(
+        _deferred_source_counts, "source_ids", None
+    )
+    if deferred_source_ids is not None:
+        deferred_source_ids.add(source.id)
+        return
 
-def update_source_melody_count(instance) -> None:
-    """When saving or deleting a Chant, update its Source's number_of_melodies field
+    recompute_source_counts([source.id])
+    if isinstance(instance, Chant):
+        update_chant_counts(instance, created)
+    # keep the in-memory source (which may be used by the caller) up to date
+    source.refresh_from_db(fields=["number_of_chants", "number_of_melodies"])
 
-    Called in on_chant_save() and on_chant_delete()
-    """
 
-    # When a source is deleted (which in turn calls on_chant_delete() on all of its chants) instance.source does not exist
-    try:
-        source = instance.source
-    except Source.DoesNotExist:
-        source = None
-    if source is not None:
-        source.number_of_melodies = (
-            source.chant_set.exclude(volpiano__isnull=True)
-            .exclude(volpiano__exact="")
-            .count()
-        )
-        source.save()
+def update_chant_counts(chant: Chant, created: bool) -> None:
+    """When saving or deleting a Chant, update the counts over the chants of its
+    source that it may have changed: the next chant counts of the Cantus IDs,
+    and the feast counts of the feasts, that it had before and after being saved.
 
+    The chant's previous values are those it was loaded with (see Chant.from_db()).
+    If they weren't loaded, all the counts of the source are recomputed.
 
-def update_volpiano_fields(instance) -> None:
-    """When saving a Chant, make sure the chant's volpiano_notes and volpiano_intervals are up-to-date
-
-    Called in on_chant_save()
+    Called in update_source_counts()
     """
+    source_ids = [chant.source_id]
+    update_next_chant_counts(
+        source_ids, cantus_ids=get_changed_values(chant, "cantus_id", created)
+    )
+    update_feast_chant_counts(
+        source_ids, feast_ids=get_changed_values(chant, "feast_id", created)
+    )
 
-    if instance.volpiano is None:
-        return
 
-    volpiano_notes = generate_volpiano_notes(instance.volpiano)
-    volpiano_intervals = generate_volpiano_intervals(volpiano_notes)
+def get_loaded_value(chant: Chant, field: str):
+    """Return the value of a field of a chant when it was loaded or last saved,
+    or DEFERRED if it isn't known."""
+    return getattr(chant, "loaded_values", {}).get(field, DEFERRED)
 
-    Chant.objects.filter(id=instance.id).update(
-        volpiano_notes=volpiano_notes,
-        volpiano_intervals=volpiano_intervals,
-    )
 
+def get_changed_values(chant: Chant, field: str, created: bool) -> Optional[set]:
+    """Return the values, other than None, that a field of a chant had before
+    and after being saved or deleted, or None if its previous value isn't known."""
+    values = {getattr(chant, field)}
+    if not created:
+        previous_value = get_loaded_value(chant, field)
+        if previous_value is DEFERRED:
+            return None
+        values.add(previous_value)
+    values.discard(None)
+    return values
 
-def generate_volpiano_notes(volpiano) -> str:
-    """
-    Populate the ``volpiano_notes`` field of the ``Chant`` model
 
-    This field is used for melody search
+def refresh_source_counts(source_ids: Iterable[int]) -> None:
+    """Recompute everything that is counted over the chants of several sources:
+    their number_of_chants and number_of_melodies fields, the counts of their
+    chants' next chants, and the counts of their chants by feast.
 
     Args:
-        volpiano (str): The content of ``chant.volpiano``
+        source_ids (Iterable[int]): The IDs of the sources to update
+    """
+    source_ids = list(source_ids)
+    recompute_source_counts(source_ids)
+    update_next_chant_counts(source_ids)
+    update_feast_chant_counts(source_ids)
 
-    Returns:
-        str: Volpiano str with non-note chars and duplicate consecutive notes removed
+
+def recompute_source_counts(source_ids: Iterable[int]) -> None:
+    """Recompute the number_of_chants and number_of_melodies fields of
+    several sources with a single UPDATE query.
+
+    number_of_chants counts a source's chants and sequences, and
+    number_of_melodies counts its chants with volpiano.
+
+    Args:
+        source_ids (Iterable[int]): The IDs of the sources to update
     """
-    # unwanted_chars are non-note chars, including the clefs, barlines, and accidentals etc.
-    # the `searchMelody.js` on old cantus makes no reference to the b-flat accidentals ("y", "i", "z")
-    # so put them in unwanted chars for now
-    unwanted_chars: list[str] = [
-        "-",
-        "1",
-        "2",
-        "3",
-        "4",
-        "5",
-        "6",
-        "7",
-        "?",
-        ".",
-        " ",
-        "y",
-        "i",
-        "z",
-    ]
-    # convert all charactors to lower-case, upper-case letters stand for liquescent of the same pitch
-    volpiano_lower: str = volpiano.lower()
-    # `)` stands for the lowest `g` note liquescent in volpiano, its 'lower case' is `9`
-    volpiano_notes: str = volpiano_lower.replace(")", "9")
-    # remove none-note charactors
-    for unwanted_char in unwanted_chars:
-        volpiano_notes = volpiano_notes.replace(unwanted_char, "")
-    # remove duplicate consecutive chars
-    volpiano_notes = re.sub(r"(.)\1+", r"\1", volpiano_notes)
-    return volpiano_notes
-
-
-def generate_volpiano_intervals(volpiano_notes) -> str:
+
+    def count_in_source(queryset: models.QuerySet) -> Coalesce:
+        counts = (
+            queryset.filter(source=OuterRef("pk"))
+            .order_by()
+            .values("source")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        return Coalesce(Subquery(counts), 0)
+
+    Source.objects.filter(pk__in=list(source_ids)).update(
+        number_of_chants=count_in_source(Chant.objects.all())
+        + count_in_source(Sequence.objects.all()),
+        number_of_melodies=count_in_source(
+            Chant.objects.exclude(volpiano__isnull=True).exclude(volpiano__exact="")
+        ),
+    )
+    # the counts are displayed on the source list and detail pages
+    invalidate_view_cache()
+
+
+@contextmanager
+def defer_source_count_updates() -> Iterator[None]:
+    """Coalesce updates of Source.number_of_chants, Source.number_of_melodies
+    and the sources' next chant counts.
+
+    Saving or deleting a chant or sequence normally recomputes its source's
+    counts straight away. Inside this block, the sources of the chants and
+    sequences that are saved or deleted are collected instead, and their counts
+    are recomputed for all of them at once when the outermost block exits (or,
+    if it exits inside a transaction, when that transaction is committed), so
+    saving many chants in the same source only recomputes its counts once.
+
+    Usage:
+        with defer_source_count_updates():
+            for chant in chants:
+                chant.save()
     """
-    Populate the ``volpiano_intervals`` field of the ``Chant`` model
+    if getattr(_deferred_source_counts, "source_ids", None) is not None:
+        # already deferring in an enclosing block, which will do the update
+        yield
+        return
 
-    This field is used for melody search when searching for transpositions
+    _deferred_source_counts.source_ids = set()
+    try:
+        yield
+    finally:
+        source_ids: set[int] = _deferred_source_counts.source_ids
+        _deferred_source_counts.source_ids = None
+        if source_ids:
+            # runs immediately when not in a transaction
+            transaction.on_commit(lambda: refresh_source_counts(source_ids))
 
-    Args:
-        volpiano_notes (str): The content of ``chant.volpiano_notes``,
-        populated by the ``generate_volpiano_notes`` function
 
-    Returns:
-        str: A str of digits, recording the intervals between adjacent notes
+def update_volpiano_fields(instance) -> None:
+    """When saving a Chant, make sure the chant's volpiano_notes, volpiano_intervals
+    and volpiano_interval_codes are up-to-date
+
+    Called in on_chant_pre_save()
     """
-    # replace '9' (the note G) with the char corresponding to (ASCII(a) - 1), because 'a' denotes the note A
-    volpiano_notes: str = volpiano_notes.replace("9", chr(ord("a") - 1))
-    # we model the interval between notes using the difference between the ASCII codes of corresponding letters
-    # the letter for the note B is "j" (106), note A is "h" (104), the letter "i" (105) is skipped
-    # move all notes above A down by one letter
-    notes_list: list = list(volpiano_notes)
-    for j, note in enumerate(notes_list):
-        if ord(note) >= 106:
-            notes_list[j] = chr(ord(note) - 1)
-
-    # `intervals` records the difference between two adjacent notes.
-    # Note that intervals are encoded by counting the number of scale
-    # steps between adjacent notes: an ascending second is thus encoded
-    # as "1"; a descending third is encoded "-2", and so on.
-    intervals: list[int] = []
-    for j in range(1, len(notes_list)):
-        intervals.append(ord(notes_list[j]) - ord(notes_list[j - 1]))
-    volpiano_intervals: str = "".join([str(interval) for interval in intervals])
-    return volpiano_intervals
+
+    if instance.volpiano is None:
+        return
+
+    (
+        instance.volpiano_notes,
+        instance.volpiano_intervals,
+        instance.volpiano_interval_codes,
+    ) = generate_melody_fields([instance.volpiano])[0]
 
 
 def update_prefix_field(instance) -> None:
@@ -209,19 +355,28 @@ def update_prefix_field(instance) -> None:
 
 
 def update_chant_incipit_field(chant: Chant) -> None:
-    """Update the incipit field of the specified Chant to be the first
+    """Set the incipit field of the specified Chant to be the first
     several words of the chant's standardized-spelling fulltext
 
+    Called in on_chant_pre_save()
+
     Args:
-        chant (Chant): The chant from the database whose `incipit` field
+        chant (Chant): The chant being saved whose `incipit` field
         is to be updated
     """
     fulltext: Optional[str] = chant.manuscript_full_text_std_spelling
     if fulltext:  # many chants in the database have only an incipit -
         # we should only update the incipit if the chant has a fulltext,
         # just in case a chant manages to get saved without a fulltext somehow
-        new_incipit: str = generate_incipit(fulltext)
-        Chant.objects.filter(id=chant.id).update(incipit=new_incipit)
+        chant.incipit = generate_incipit(fulltext)
+
+
+def update_folio_sort_key(instance) -> None:
+    """When saving a Chant or Sequence, set its folio_sort_key field from its folio
+
+    Called in on_chant_pre_save() and on_sequence_pre_save()
+    """
+    instance.folio_sort_key = get_folio_sort_key(instance.folio)
 
 
 def update_sequence_incipit_field(sequence: Sequence) -> None:
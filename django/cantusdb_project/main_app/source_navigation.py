@@ -0,0 +1,274 @@
+"""
+Cached folio navigation for the chant detail page, and feast selector for the
+source pages.
+
+The chant detail page (views.chant.ChantDetailView) lists the folios of the
+chant's source, and the chants of the chant's folio and of the previous and
+next folios, grouped by feast. The source detail, browse and edit pages list
+the folios on which the feast changes (see
+views.chant.get_feast_selector_options()). These are stored in Django's cache
+framework, so that a page view doesn't need to query the source's chants again.
+
+The cache keys of a source include a version token, which is replaced when any
+chant in the source is saved or deleted (see signals.py), so that all the
+cached entries of the source become stale at once. A second, global, token is
+replaced when a feast, genre or service is saved, as their names are displayed
+along with the chants.
+"""
+
+from collections import defaultdict
+from typing import Optional
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Q
+
+from main_app.models import Chant, Feast
+
+# cached entries are also refreshed after this many seconds
+NAVIGATION_CACHE_TIMEOUT = 60 * 60 * 24
+
+GLOBAL_VERSION_KEY = "source-navigation-version"
+
+# the fields of each chant displayed in the folio tables of chant_detail.html
+CHANT_FIELDS = (
+    "id",
+    "folio",
+    "c_sequence",
+    "position",
+    "incipit",
+    "cantus_id",
+    "feast__name",
+    "feast__description",
+    "genre__name",
+    "genre__description",
+    "service__name",
+    "service__description",
+)
+
+# the chants of a source (with a feast) whose folio or feast differs from those
+# of the previous chant, in folio order (see get_feast_changes())
+FEAST_CHANGES_SQL = f"""
+SELECT folio, feast_id, feast_name
+FROM (
+    SELECT
+        chant.id,
+        chant.folio,
+        chant.folio_sort_key,
+        chant.c_sequence,
+        chant.feast_id,
+        feast.name AS feast_name,
+        LAG(chant.folio) OVER chants_order AS previous_folio,
+        LAG(chant.feast_id) OVER chants_order AS previous_feast_id
+    FROM {Chant._meta.db_table} AS chant
+    JOIN {Feast._meta.db_table} AS feast ON feast.id = chant.feast_id
+    WHERE chant.source_id = %s
+    WINDOW chants_order AS (
+        ORDER BY chant.folio_sort_key, chant.folio, chant.c_sequence, chant.id
+    )
+) AS chants
+WHERE folio IS DISTINCT FROM previous_folio
+    OR feast_id IS DISTINCT FROM previous_feast_id
+ORDER BY folio_sort_key, folio, c_sequence, id
+"""
+
+
+def get_source_version_key(source_id: int) -> str:
+    return f"source-navigation-version:{source_id}"
+
+
+def get_versions(source_id: int) -> str:
+    """Return the current version tokens for a source's cache entries, creating
+    them if they don't exist yet (or have been evicted from the cache)."""
+    keys = [GLOBAL_VERSION_KEY, get_source_version_key(source_id)]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # if another request has just created the token, use theirs
+            cache.add(key, uuid4().hex, timeout=None)
+            versions[key] = cache.get(key)
+    return f"{versions[keys[0]]}:{versions[keys[1]]}"
+
+
+def invalidate_source_navigation(source_id: Optional[int]) -> None:
+    """Mark the cached navigation of a source as stale.
+
+    Called when a chant is saved or deleted.
+    """
+    if source_id is not None:
+        delete_version(get_source_version_key(source_id))
+
+
+def invalidate_all_source_navigation() -> None:
+    """Mark the cached navigation of every source as stale.
+
+    Called when a feast, genre or service is saved.
+    """
+    delete_version(GLOBAL_VERSION_KEY)
+
+
+def delete_version(key: str) -> None:
+    # delete the token straight away, so that the current transaction doesn't
+    # see stale entries, and again after the transaction is committed, in case
+    # another request has cached the data from before the commit in the meantime
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def group_chants_by_feast(chants: list[Chant]) -> list:
+    """Group the chants of a folio by feast, like views.chant.get_chants_with_feasts,
+    using the feasts loaded along with the chants.
+
+    Returns:
+        list: a list of [feast, [chant, chant, ...]] pairs, in the order in
+            which the feasts first appear, followed by [None, [chants without
+            a feast]]
+    """
+    feasts = {}
+    feasts_chants = defaultdict(list)
+    for chant in chants:
+        if chant.feast_id is not None:
+            feasts.setdefault(chant.feast_id, chant.feast)
+        feasts_chants[chant.feast_id].append(chant)
+    out = [[feast, feasts_chants[feast_id]] for feast_id, feast in feasts.items()]
+    out.append([None, feasts_chants[None]])
+    return out
+
+
+def get_folios(
+    source_id: int, version: str, refresh: bool = False
+) -> list[Optional[str]]:
+    """Return the folios of a source, in folio order.
+
+    Args:
+        source_id (int): The ID of the source
+        version (str): The version tokens of the source (see get_versions())
+        refresh (bool): Whether to query the folios again even if they are cached
+    """
+    key = f"source-navigation:{version}:{source_id}:folios"
+    folios = None if refresh else cache.get(key)
+    if folios is None:
+        folios = list(
+            Chant.objects.filter(source_id=source_id)
+            .values_list("folio", flat=True)
+            .distinct()
+            .order_by("folio_sort_key", "folio")
+        )
+        cache.set(key, folios, NAVIGATION_CACHE_TIMEOUT)
+    return folios
+
+
+def get_feasts_by_folio(
+    source_id: int, version: str, folios: list[Optional[str]], indexes: list[int]
+) -> dict[Optional[str], list]:
+    """Return the chants of several folios of a source, grouped by feast (see
+    group_chants_by_feast()), keyed by folio.
+
+    The folios that aren't cached are loaded with a single query.
+
+    Args:
+        source_id (int): The ID of the source
+        version (str): The version tokens of the source (see get_versions())
+        folios (list): All the folios of the source (see get_folios())
+        indexes (list[int]): The indexes of the folios to return in `folios`
+    """
+    # folios are identified by their index, as they may contain characters
+    # that aren't allowed in cache keys
+    keys = {
+        f"source-navigation:{version}:{source_id}:folio:{index}": folios[index]
+        for index in indexes
+    }
+    cached = cache.get_many(keys.keys())
+    feasts_by_folio = {keys[key]: value for key, value in cached.items()}
+
+    missing_keys = [key for key in keys if key not in cached]
+    if missing_keys:
+        missing_folios = [keys[key] for key in missing_keys]
+        chants_by_folio = defaultdict(list)
+        folio_filter = Q(folio__in=[folio for folio in missing_folios if folio])
+        if None in missing_folios:
+            folio_filter |= Q(folio__isnull=True)
+        chants = (
+            Chant.objects.filter(folio_filter, source_id=source_id)
+            .select_related("feast", "genre", "service")
+            .only(*CHANT_FIELDS)
+            .order_by("c_sequence", "id")
+        )
+        for chant in chants:
+            chants_by_folio[chant.folio].append(chant)
+        new_entries = {}
+        for key in missing_keys:
+            folio = keys[key]
+            feasts_by_folio[folio] = group_chants_by_feast(chants_by_folio[folio])
+            new_entries[key] = feasts_by_folio[folio]
+        cache.set_many(new_entries, NAVIGATION_CACHE_TIMEOUT)
+    return feasts_by_folio
+
+
+def get_folio_navigation(source_id: int, folio: Optional[str]) -> dict:
+    """Build the folio navigation context of the chant detail page.
+
+    Args:
+        source_id (int): The ID of the chant's source
+        folio (str): The chant's folio
+
+    Returns:
+        dict: The "folios", "previous_folio", "next_folio", "feasts_current_folio",
+            "feasts_previous_folio" and "feasts_next_folio" context variables
+    """
+    version = get_versions(source_id)
+    folios = get_folios(source_id, version)
+    if folio not in folios:
+        # the cached folios are stale, e.g. the chants were changed without
+        # sending the signals that replace the version token
+        folios = get_folios(source_id, version, refresh=True)
+    if folio not in folios:
+        # the chant has been moved or deleted since it was loaded
+        return {
+            "folios": folios,
+            "previous_folio": None,
+            "next_folio": None,
+            "feasts_current_folio": [],
+        }
+    index = folios.index(folio)
+    previous_folio = folios[index - 1] if index != 0 else None
+    next_folio = folios[index + 1] if index < len(folios) - 1 else None
+
+    indexes = [index]
+    if previous_folio:
+        indexes.append(index - 1)
+    if next_folio:
+        indexes.append(index + 1)
+    feasts_by_folio = get_feasts_by_folio(source_id, version, folios, indexes)
+
+    navigation = {
+        "folios": folios,
+        "previous_folio": previous_folio,
+        "next_folio": next_folio,
+        "feasts_current_folio": feasts_by_folio[folio],
+    }
+    if previous_folio:
+        navigation["feasts_previous_folio"] = feasts_by_folio[previous_folio]
+    if next_folio:
+        navigation["feasts_next_folio"] = feasts_by_folio[next_folio]
+    return navigation
+
+
+def get_feast_changes(source_id: int) -> list[tuple[Optional[str], int, str]]:
+    """Return the folio, feast ID and feast name of the chants of a source at
+    which the feast changes, going through the chants with a feast folio by
+    folio, without repeating the same folio and feast.
+
+    Only the chants whose folio or feast differs from those of the previous
+    chant are fetched, by comparing each chant with the previous one in SQL.
+    """
+    key = f"source-navigation:{get_versions(source_id)}:{source_id}:feasts"
+    feast_changes = cache.get(key)
+    if feast_changes is None:
+        with connection.cursor() as cursor:
+            cursor.execute(FEAST_CHANGES_SQL, [source_id])
+            # a feast may come back on the same folio after another feast
+            feast_changes = list(dict.fromkeys(cursor.fetchall()))
+        cache.set(key, feast_changes, NAVIGATION_CACHE_TIMEOUT)
+    return feast_changes
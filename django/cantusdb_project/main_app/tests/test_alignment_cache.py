@@ -0,0 +1,116 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from main_app import alignment_cache
+from main_app.alignment_cache import (
+    align_chant,
+    cache_chant_alignments,
+    get_chant_alignment,
+)
+from main_app.models import Chant
+from main_app.tests.make_fakes import make_fake_chant
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class AlignmentCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.chant = make_fake_chant(
+            manuscript_full_text_std_spelling="Ave maria",
+            manuscript_full_text="Ave maria",
+            manuscript_syllabized_full_text=None,
+            volpiano="1---g--h---g--h---3",
+        )
+        align = patch.object(
+            alignment_cache,
+            "align_text_and_volpiano",
+            wraps=alignment_cache.align_text_and_volpiano,
+        )
+        self.align = align.start()
+        self.addCleanup(align.stop)
+
+    def test_alignment_is_cached(self):
+        first = align_chant(self.chant)
+        second = align_chant(self.chant)
+        self.assertEqual(first, second)
+        self.assertEqual(self.align.call_count, 1)
+
+    def test_edited_chant_is_aligned_again(self):
+        align_chant(self.chant)
+        self.chant.volpiano = "1---g--k---g--h---3"
+        align_chant(self.chant)
+        self.assertEqual(self.align.call_count, 2)
+
+    def test_cache_chant_alignments(self):
+        other_chant = make_fake_chant(
+            manuscript_full_text_std_spelling="Dominus",
+            manuscript_syllabized_full_text=None,
+            volpiano="1---g--h--k---3",
+        )
+        # saving the chant stores its alignment (see StoredAlignmentTest), but
+        # doesn't cache it
+        self.align.reset_mock()
+        align_chant(self.chant)
+        self.assertEqual(cache_chant_alignments([self.chant, other_chant]), (1, 0))
+        self.assertEqual(cache_chant_alignments([self.chant, other_chant]), (0, 0))
+        align_chant(other_chant)
+        self.assertEqual(self.align.call_count, 2)
+
+    def test_warm_alignment_cache(self):
+        call_command("warm_alignment_cache", source_id=[self.chant.source_id])
+        align_chant(self.chant)
+        self.assertEqual(self.align.call_count, 1)
+
+
+class StoredAlignmentTest(TestCase):
+    def setUp(self):
+        self.chant = make_fake_chant(
+            manuscript_full_text_std_spelling="Ave maria",
+            manuscript_full_text="Ave maria",
+            manuscript_syllabized_full_text=None,
+            volpiano="1---g--h---g--h---3",
+        )
+
+    def test_alignment_is_stored(self):
+        self.chant.refresh_from_db()
+        self.assertTrue(self.chant.text_melody_alignment)
+        self.assertTrue(self.chant.text_melody_alignment_digest)
+        with patch.object(alignment_cache, "align_text_and_volpiano") as align:
+            self.assertEqual(
+                get_chant_alignment(self.chant), self.chant.text_melody_alignment
+            )
+        align.assert_not_called()
+
+    def test_alignment_is_updated(self):
+        digest = self.chant.text_melody_alignment_digest
+        self.chant.volpiano = "1---g--k---g--h---3"
+        self.chant.save()
+        self.chant.refresh_from_db()
+        self.assertNotEqual(self.chant.text_melody_alignment_digest, digest)
+        self.assertIn(
+            "k", "".join(melody for _, melody in self.chant.text_melody_alignment)
+        )
+
+        self.chant.volpiano = None
+        self.chant.save()
+        self.chant.refresh_from_db()
+        self.assertIsNone(self.chant.text_melody_alignment)
+
+    def test_backfill_chant_alignments(self):
+        Chant.objects.filter(pk=self.chant.pk).update(
+            text_melody_alignment=None, text_melody_alignment_digest=None
+        )
+        call_command("backfill_chant_alignments", jobs=1)
+        self.chant.refresh_from_db()
+        self.assertTrue(self.chant.text_melody_alignment)
+        self.assertEqual(
+            self.chant.text_melody_alignment_digest,
+            alignment_cache.get_alignment_digest(
+                *alignment_cache.get_chant_alignment_args(self.chant)
+            ),
+        )
@@ -0,0 +1,83 @@
+from time import time_ns
+from unittest.mock import patch
+
+import ujson
+from django.contrib.auth.models import AnonymousUser
+from django.http import JsonResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from main_app.tests.make_fakes import make_fake_chant, make_fake_source
+from main_app.views.api import json_cid_export
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class CantusIdCacheTest(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        # the responses cached by previous tests are for other chants, but
+        # saving a source makes them stale anyway
+        self.source = make_fake_source(published=True)
+        self.chant = make_fake_chant(source=self.source, cantus_id="001234")
+
+    def get(self, cantus_id="001234", **extra):
+        request = self.factory.get(f"/json-cid/{cantus_id}", **extra)
+        request.user = AnonymousUser()
+        return json_cid_export(request, cantus_id)
+
+    def get_incipits(self, cantus_id="001234") -> list[str]:
+        response = self.get(cantus_id)
+        return [
+            entry["chant"]["incipit"]
+            for entry in ujson.loads(response.content)["chants"]
+        ]
+
+    def test_responses_are_cached(self):
+        first = self.get()
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first["ETag"])
+        self.assertTrue(first["Last-Modified"])
+        with self.assertNumQueries(0):
+            second = self.get()
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["ETag"], first["ETag"])
+        self.assertIsInstance(second, JsonResponse)
+
+    def test_conditional_requests(self):
+        first = self.get()
+        response = self.get(HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        response = self.get(HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+        self.assertEqual(response.status_code, 304)
+        response = self.get(HTTP_IF_NONE_MATCH='"something-else"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_cache_is_invalidated_when_chants_are_saved(self):
+        first = self.get()
+        self.chant.folio = "changed folio"
+        self.chant.save()
+        response = self.get(HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], first["ETag"])
+
+        make_fake_chant(source=self.source, cantus_id="001234")
+        self.assertEqual(len(self.get_incipits()), 2)
+
+    def test_cache_is_invalidated_when_cantus_id_changes(self):
+        self.assertEqual(len(self.get_incipits("001234")), 1)
+        self.assertEqual(len(self.get_incipits("005678")), 0)
+        self.chant.cantus_id = "005678"
+        self.chant.save()
+        self.assertEqual(len(self.get_incipits("001234")), 0)
+        self.assertEqual(len(self.get_incipits("005678")), 1)
+
+    def test_last_modified_advances_when_chants_are_deleted(self):
+        first = self.get()
+        # the chant is deleted more than a second after the first response
+        with patch("main_app.cantus_id_cache.time_ns", return_value=time_ns() + 10**10):
+            self.chant.delete()
+            response = self.get(HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(ujson.loads(response.content)["chants"]), 0)
@@ -0,0 +1,84 @@
+import csv
+import gzip
+import json
+import os
+from io import StringIO
+from tempfile import TemporaryDirectory
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from main_app.chant_export import CSV_COLUMNS
+from main_app.tests.make_fakes import (
+    make_fake_chant,
+    make_fake_institution,
+    make_fake_source,
+)
+from main_app.views.api import iter_csv_export
+
+
+class TestExportChants(TestCase):
+    def setUp(self):
+        self.institution = make_fake_institution()
+        self.source = make_fake_source(
+            published=True, holding_institution=self.institution
+        )
+        self.chants = [make_fake_chant(source=self.source) for _ in range(3)]
+        self.unpublished_source = make_fake_source(published=False)
+        make_fake_chant(source=self.unpublished_source)
+
+    def export(self, *args) -> tuple[str, dict]:
+        temp_dir = TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        directory = temp_dir.name
+        call_command("export_chants", directory, *args, stdout=StringIO())
+        with open(os.path.join(directory, "manifest.json")) as manifest_file:
+            manifest = json.load(manifest_file)
+        return directory, manifest
+
+    def test_csv_matches_csv_export(self):
+        directory, manifest = self.export("--chunk-size", "2")
+
+        self.assertEqual(len(manifest["partitions"]), 1)
+        partition = manifest["partitions"][0]
+        self.assertEqual(partition["source_id"], self.source.id)
+        self.assertEqual(partition["count"], 3)
+        self.assertEqual(partition["holding_institution"]["id"], self.institution.id)
+        with open(os.path.join(directory, partition["path"]), newline="") as file:
+            self.assertEqual(file.read(), "".join(iter_csv_export(self.source)))
+
+    def test_include_unpublished(self):
+        directory, manifest = self.export("--include-unpublished", "--gzip")
+
+        source_ids = [partition["source_id"] for partition in manifest["partitions"]]
+        self.assertEqual(source_ids, [self.source.id, self.unpublished_source.id])
+        path = os.path.join(directory, manifest["partitions"][1]["path"])
+        with gzip.open(path, "rt", newline="") as file:
+            rows = list(csv.reader(file))
+        self.assertEqual(len(rows), 2)
+
+    def test_jsonl(self):
+        directory, manifest = self.export("--format", "jsonl")
+
+        path = os.path.join(directory, manifest["partitions"][0]["path"])
+        with open(path) as file:
+            chants = [json.loads(line) for line in file]
+        self.assertEqual(
+            [chant["node_id"] for chant in chants],
+            [chant.id for chant in self.chants],
+        )
+        self.assertEqual(chants[0]["incipit"], self.chants[0].incipit)
+        self.assertEqual(list(chants[0]), list(CSV_COLUMNS))
+
+    def test_columnar(self):
+        directory, manifest = self.export("--format", "columnar", "--chunk-size", "2")
+
+        path = os.path.join(directory, manifest["partitions"][0]["path"])
+        with gzip.open(path, "rt") as file:
+            groups = [json.loads(line) for line in file]
+        self.assertEqual([group["count"] for group in groups], [2, 1])
+        self.assertEqual(
+            groups[0]["columns"]["node_id"] + groups[1]["columns"]["node_id"],
+            [chant.id for chant in self.chants],
+        )
+        self.assertEqual(list(groups[0]["columns"]), list(CSV_COLUMNS))
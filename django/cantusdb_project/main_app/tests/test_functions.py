@@ -1,7 +1,10 @@
+import os
+import tempfile
 from typing import Union, Optional
 from unittest.mock import patch
 
-
+import ujson
+from django.core.management import call_command
 from django.test import TestCase
 import requests
 from requests.exceptions import SSLError, Timeout, HTTPError
@@ -15,6 +18,9 @@ from main_app.tests.make_fakes import (
     make_fake_source,
 )
 from main_app.management.commands import update_cached_concordances
+from main_app.management.commands.add_cantus_index_merge_events import (
+    Command as AddCantusIndexMergeEventsCommand,
+)
 from main_app.signals import generate_incipit
 from cantusindex import (
     get_suggested_chants,
@@ -187,13 +193,22 @@ def mock_requests_get(url: str, timeout: float) -> MockResponse:
     )
 
 
+def get_concordances() -> list[dict]:
+    """Build the concordances of all published chants, as the
+    update_cached_concordances command writes them."""
+    published_chants = Chant.objects.filter(source__published=True)
+    return [
+        update_cached_concordances.make_chant_dict(chant)
+        for chant in update_cached_concordances.iter_chant_values(
+            published_chants, update_cached_concordances.DEFAULT_CHUNK_SIZE
+        )
+    ]
+
+
 class UpdateCachedConcordancesCommandTest(TestCase):
     def test_concordances_structure(self):
         chant: Chant = make_fake_chant(cantus_id="123456")
-        concordances: list = update_cached_concordances.get_concordances()
-
-        with self.subTest(test="Ensure get_concordances returns list"):
-            self.assertIsInstance(concordances, list)
+        concordances: list = get_concordances()
 
         single_concordance = concordances[0]
         with self.subTest(test="Ensure each concordance is a dict"):
@@ -236,7 +251,7 @@ class UpdateCachedConcordancesCommandTest(TestCase):
             manuscript_full_text_std_spelling="chant in an unpublished source",
         )
 
-        concordances: list = update_cached_concordances.get_concordances()
+        concordances: list = get_concordances()
         self.assertEqual(len(concordances), 1)
 
         single_concordance: dict = concordances[0]
@@ -247,7 +262,7 @@ class UpdateCachedConcordancesCommandTest(TestCase):
     def test_concordances_values(self):
         chant: Chant = make_fake_chant()
 
-        concordances: list = update_cached_concordances.get_concordances()
+        concordances: list = get_concordances()
         single_concordance: dict = concordances[0]
 
         expected_items: tuple = (
@@ -274,6 +289,141 @@ class UpdateCachedConcordancesCommandTest(TestCase):
             with self.subTest(key=key):
                 self.assertEqual(observed_value, value)
 
+    def test_command_writes_concordances(self):
+        make_fake_chant()
+        make_fake_chant()
+        with tempfile.TemporaryDirectory() as cache_dir:
+            call_command("update_cached_concordances", directory=cache_dir)
+            with open(os.path.join(cache_dir, "concordances.json")) as json_file:
+                written_concordances: list = ujson.load(json_file)
+            with self.subTest(test="Ensure metadata for incremental runs is written"):
+                self.assertTrue(
+                    os.path.exists(
+                        os.path.join(cache_dir, "concordances_metadata.json")
+                    )
+                )
+        self.assertEqual(written_concordances, get_concordances())
+
+    def test_incremental_update(self):
+        published_source: Source = make_fake_source(published=True)
+        unchanged_chant: Chant = make_fake_chant(source=published_source)
+        changed_chant: Chant = make_fake_chant(source=published_source)
+        deleted_chant: Chant = make_fake_chant(source=published_source)
+        source_to_unpublish: Source = make_fake_source(published=True)
+        make_fake_chant(source=source_to_unpublish)
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            call_command("update_cached_concordances", directory=cache_dir)
+
+            changed_chant.manuscript_full_text_std_spelling = "changed full text"
+            changed_chant.save()
+            deleted_chant.delete()
+            source_to_unpublish.published = False
+            source_to_unpublish.save()
+            new_chant: Chant = make_fake_chant(source=published_source)
+
+            call_command(
+                "update_cached_concordances", directory=cache_dir, incremental=True
+            )
+            with open(os.path.join(cache_dir, "concordances.json")) as json_file:
+                written_concordances: list = ujson.load(json_file)
+
+        self.assertEqual(written_concordances, get_concordances())
+        written_chant_links: list[str] = [
+            concordance["chantlink"] for concordance in written_concordances
+        ]
+        self.assertEqual(
+            written_chant_links,
+            [
+                f"https://cantusdatabase.org/chant/{chant.id}/"
+                for chant in (unchanged_chant, changed_chant, new_chant)
+            ],
+        )
+        self.assertEqual(written_concordances[1]["full_text"], "changed full text")
+
+    def test_incremental_update_after_merge_event(self):
+        # Cantus ID merges are applied with QuerySet.update(), which must still
+        # mark the chants as updated for incremental runs to pick them up
+        merged_chant: Chant = make_fake_chant(cantus_id="001234")
+        make_fake_chant(cantus_id="001235")
+        with tempfile.TemporaryDirectory() as cache_dir:
+            call_command("update_cached_concordances", directory=cache_dir)
+            AddCantusIndexMergeEventsCommand().apply_transaction(
+                {"old": "001234", "new": "001235"}
+            )
+            call_command(
+                "update_cached_concordances", directory=cache_dir, incremental=True
+            )
+            with open(os.path.join(cache_dir, "concordances.json")) as json_file:
+                written_concordances: list = ujson.load(json_file)
+
+        self.assertEqual(written_concordances, get_concordances())
+        merged_concordance: dict = next(
+            concordance
+            for concordance in written_concordances
+            if concordance["chantlink"]
+            == f"https://cantusdatabase.org/chant/{merged_chant.id}/"
+        )
+        self.assertEqual(merged_concordance["cantus_id"], "001235")
+
+    def test_sharded_concordances(self):
+        chant_1: Chant = make_fake_chant(cantus_id="001234")
+        chant_2: Chant = make_fake_chant(cantus_id="001235")
+        chant_3: Chant = make_fake_chant(cantus_id="g00567.1")
+        with tempfile.TemporaryDirectory() as cache_dir:
+            call_command(
+                "update_cached_concordances",
+                directory=cache_dir,
+                shard_by="cantus_id",
+                prefix_length=3,
+            )
+            shards_dir: str = os.path.join(cache_dir, "concordances")
+            with open(os.path.join(shards_dir, "manifest.json")) as manifest_file:
+                manifest: dict = ujson.load(manifest_file)
+            with self.subTest(test="Ensure chants are grouped by Cantus ID prefix"):
+                self.assertEqual(set(manifest["shards"].keys()), {"001", "g00"})
+                self.assertEqual(manifest["shards"]["001"]["count"], 2)
+            with open(os.path.join(cache_dir, "concordances/001.json")) as json_file:
+                shard_chant_links: list[str] = [
+                    concordance["chantlink"] for concordance in ujson.load(json_file)
+                ]
+            self.assertEqual(
+                shard_chant_links,
+                [
+                    f"https://cantusdatabase.org/chant/{chant.id}/"
+                    for chant in (chant_1, chant_2)
+                ],
+            )
+            with self.subTest(test="Ensure compressed copies are written"):
+                self.assertTrue(os.path.exists(os.path.join(shards_dir, "001.json.gz")))
+                self.assertTrue(
+                    os.path.exists(os.path.join(cache_dir, "concordances.json.gz"))
+                )
+
+            # shards that haven't changed are left as they are, and shards
+            # without any chants are removed
+            unchanged_shard: dict = manifest["shards"]["001"]
+            chant_3.delete()
+            call_command(
+                "update_cached_concordances",
+                directory=cache_dir,
+                shard_by="cantus_id",
+                prefix_length=3,
+            )
+            with open(os.path.join(shards_dir, "manifest.json")) as manifest_file:
+                manifest = ujson.load(manifest_file)
+            self.assertEqual(manifest["shards"], {"001": unchanged_shard})
+            self.assertFalse(os.path.exists(os.path.join(shards_dir, "g00.json")))
+
+    def test_shard_filename(self):
+        self.assertEqual(
+            update_cached_concordances.get_shard_filename("001"), "001.json"
+        )
+        self.assertEqual(
+            update_cached_concordances.get_shard_filename("g0.1"), "g0_2e_1.json"
+        )
+        self.assertEqual(update_cached_concordances.get_shard_filename(""), "_.json")
+
 
 class IncipitSignalTest(TestCase):
     # testing an edge case in generate_incipit, within main_app/signals.py.
@@ -0,0 +1,128 @@
+import csv
+import io
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from main_app.chant_import import CSV_COLUMNS, ChantImportError, import_chants
+from main_app.models import Chant, Differentia
+from main_app.melody_fields import generate_volpiano_notes, generate_volpiano_intervals
+from main_app.tests.make_fakes import (
+    make_fake_feast,
+    make_fake_genre,
+    make_fake_service,
+    make_fake_source,
+)
+
+
+def make_csv(rows: list[dict]) -> io.StringIO:
+    csv_file = io.StringIO()
+    writer = csv.DictWriter(csv_file, fieldnames=CSV_COLUMNS, restval="")
+    writer.writeheader()
+    writer.writerows(rows)
+    csv_file.seek(0)
+    return csv_file
+
+
+class ImportChantsTest(TestCase):
+    def setUp(self):
+        self.source = make_fake_source(published=True)
+        self.feast = make_fake_feast()
+        self.genre = make_fake_genre()
+        self.service = make_fake_service()
+        self.differentia = Differentia.objects.create(differentia_id="129a")
+
+    def test_import_chants(self):
+        csv_file = make_csv(
+            [
+                {
+                    "folio": "001r",
+                    "sequence": "1",
+                    "incipit": "Ecce dominus",
+                    "feast": self.feast.name,
+                    "service": self.service.name,
+                    "genre": self.genre.name,
+                    "cantus_id": "001234",
+                    "differentiae_database": "129a",
+                    "fulltext_standardized": "Ecce dominus veniet et omnes sancti eius",
+                    "volpiano": "1---g--h---j--h---3",
+                    "node_id": "123",
+                },
+                {"folio": "001r", "sequence": "2", "incipit": "Alleluia"},
+            ]
+        )
+        count = import_chants(self.source, csv_file)
+
+        self.assertEqual(count, 2)
+        chants = self.source.chant_set.order_by("c_sequence")
+        self.assertEqual(chants.count(), 2)
+        chant, chant_without_text = chants
+        self.assertEqual(chant.folio, "001r")
+        self.assertEqual(chant.feast, self.feast)
+        self.assertEqual(chant.service, self.service)
+        self.assertEqual(chant.genre, self.genre)
+        self.assertEqual(chant.diff_db, self.differentia)
+        self.assertEqual(chant.cantus_id, "001234")
+        # derived fields
+        self.assertEqual(chant.incipit, "Ecce dominus veniet et omnes")
+        notes = generate_volpiano_notes("1---g--h---j--h---3")
+        self.assertEqual(chant.volpiano_notes, notes)
+        self.assertEqual(chant.volpiano_intervals, generate_volpiano_intervals(notes))
+        self.assertTrue(
+            Chant.objects.filter(id=chant.id, search_vector="veniet").exists()
+        )
+        self.assertEqual(chant_without_text.incipit, "Alleluia")
+        self.assertIsNone(chant_without_text.feast)
+        self.assertIsNone(chant_without_text.volpiano_notes)
+
+        self.source.refresh_from_db()
+        self.assertEqual(self.source.number_of_chants, 2)
+        self.assertEqual(self.source.number_of_melodies, 1)
+
+    def test_invalid_rows(self):
+        csv_file = make_csv(
+            [
+                {"folio": "001r", "sequence": "1", "feast": self.feast.name},
+                {"folio": "001r", "sequence": "two", "genre": "not a genre"},
+            ]
+        )
+        with self.assertRaises(ChantImportError) as cm:
+            import_chants(self.source, csv_file)
+
+        self.assertEqual(len(cm.exception.errors), 2)
+        self.assertTrue(cm.exception.errors[0].startswith("Row 3, sequence:"))
+        self.assertTrue(cm.exception.errors[1].startswith("Row 3, genre:"))
+        self.assertFalse(self.source.chant_set.exists())
+
+    def test_missing_columns(self):
+        csv_file = io.StringIO("folio,sequence\n001r,1\n")
+        with self.assertRaises(ChantImportError):
+            import_chants(self.source, csv_file)
+        self.assertFalse(self.source.chant_set.exists())
+
+    def test_command(self):
+        csv_file = make_csv([{"folio": "001r", "sequence": "1", "incipit": "Ecce"}])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "chants.csv")
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                f.write(csv_file.getvalue())
+
+            call_command(
+                "import_chants_csv",
+                self.source.id,
+                path,
+                "--dry-run",
+                stdout=io.StringIO(),
+            )
+            self.assertFalse(self.source.chant_set.exists())
+
+            call_command(
+                "import_chants_csv", self.source.id, path, stdout=io.StringIO()
+            )
+            self.assertEqual(self.source.chant_set.get().incipit, "Ecce")
+
+            with self.assertRaises(CommandError):
+                call_command("import_chants_csv", 0, path, stdout=io.StringIO())
@@ -0,0 +1,49 @@
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from main_app import melody_fields
+from main_app.melody_fields import (
+    NUMPY_MIN_BATCH_SIZE,
+    generate_melody_fields,
+    generate_volpiano_interval_codes,
+    generate_volpiano_intervals,
+    generate_volpiano_notes,
+)
+
+VOLPIANOS = [
+    "1---g--h---j--h---3",
+    "1---9-)-a--GH--k-w-k---3",
+    "1---s---8---q-yi-p---4",
+    "1---g---3",
+    "",
+]
+
+
+class GenerateMelodyFieldsTest(SimpleTestCase):
+    def test_single_chant(self):
+        self.assertEqual(generate_volpiano_notes("1---g--h---j--h---3"), "ghjh")
+        self.assertEqual(generate_volpiano_notes("1---9-)-a--GH--k-w-k---3"), "9aghkwk")
+        self.assertEqual(generate_volpiano_intervals("ghjh"), "11-1")
+        self.assertEqual(generate_volpiano_interval_codes("ghjh"), "iig")
+        # the flat isn't a note, and the widest intervals share the same code
+        self.assertEqual(generate_volpiano_interval_codes("kwk"), "h")
+        self.assertEqual(generate_volpiano_interval_codes("8s"), "y")
+
+    def test_batches(self):
+        volpianos = VOLPIANOS * NUMPY_MIN_BATCH_SIZE
+        expected = []
+        for volpiano in volpianos:
+            notes = generate_volpiano_notes(volpiano)
+            expected.append(
+                (
+                    notes,
+                    generate_volpiano_intervals(notes),
+                    generate_volpiano_interval_codes(notes),
+                )
+            )
+        # small batches, and large ones, with and without NumPy
+        self.assertEqual(generate_melody_fields(volpianos[:3]), expected[:3])
+        self.assertEqual(generate_melody_fields(volpianos), expected)
+        with patch.object(melody_fields, "np", None):
+            self.assertEqual(generate_melody_fields(volpianos), expected)
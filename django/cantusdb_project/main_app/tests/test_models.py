@@ -1,3 +1,4 @@
+import reversion  # type: ignore[import-untyped]
 from django.forms import ValidationError
 from django.test import TestCase
 from django.urls import reverse
@@ -19,6 +20,8 @@ from .make_fakes import (
     make_fake_sequence,
     make_fake_source,
 )
+from main_app.signals import defer_source_count_updates
+from reversion.models import Version  # type: ignore[import-untyped]
 
 # run with `python -Wa manage.py test main_app.tests.test_models`
 # the -Wa flag tells Python to display deprecation warnings
@@ -108,6 +111,57 @@ class ChantModelTest(TestCase):
         absolute_url = reverse("chant-detail", args=[str(chant.id)])
         self.assertEqual(chant.get_absolute_url(), absolute_url)
 
+    def test_save_writes_derived_fields(self):
+        source = make_fake_source()
+        chant = Chant(
+            source=source,
+            manuscript_full_text_std_spelling="one two three four five six",
+            volpiano="1---g--h---j---3",
+        )
+        # Derived fields are written along with the rest of the chant. The only
+        # other query is made by full_clean(), to check that the source exists.
+        # (The source's counts are recomputed once the block exits.)
+        with defer_source_count_updates():
+            with self.assertNumQueries(2):
+                chant.save()
+
+        chant = Chant.objects.get(id=chant.id)
+        self.assertEqual(chant.incipit, "one two three four five")
+        self.assertEqual(chant.volpiano_notes, "ghj")
+        self.assertEqual(chant.volpiano_intervals, "11")
+        self.assertEqual(chant.volpiano_interval_codes, "ii")
+        self.assertIn("'five':", chant.search_vector)
+
+    def test_save_again_after_save(self):
+        chant = make_fake_chant(manuscript_full_text_std_spelling="one two three")
+        # the search vector set on the instance when it was saved doesn't need
+        # to be fetched from the database when the chant is saved again, nor
+        # does the Cantus ID it was saved with
+        with defer_source_count_updates():
+            with self.assertNumQueries(2):
+                chant.save()
+        # a chant copied by resetting its pk is saved as a new chant
+        chant.pk = None
+        chant.save()
+        self.assertEqual(Chant.objects.filter(incipit="one two three").count(), 2)
+
+    def test_versions_exclude_search_vector(self):
+        chant = make_fake_chant(manuscript_full_text_std_spelling="one two three")
+        with reversion.create_revision():
+            chant.save()
+        version = Version.objects.get_for_object(chant).first()
+        self.assertEqual(
+            version.field_dict["manuscript_full_text_std_spelling"], "one two three"
+        )
+        self.assertNotIn("search_vector", version.field_dict)
+
+    def test_save_with_update_fields_writes_derived_fields(self):
+        chant = Chant.objects.first()
+        chant.manuscript_full_text_std_spelling = "one two three four five six"
+        chant.save(update_fields=["manuscript_full_text_std_spelling"])
+        chant.refresh_from_db()
+        self.assertEqual(chant.incipit, "one two three four five")
+
     def test_chant_and_sequence_have_same_fields(self):
         chant_fields = Chant.get_fields_and_properties()
         seq_fields = Sequence.get_fields_and_properties()
@@ -242,6 +296,26 @@ class ChantModelTest(TestCase):
         observed_incipit: str = chant.incipit
         self.assertEqual(observed_incipit, expected_incipit)
 
+    def test_folio_sort_key(self):
+        source = make_fake_source()
+        folios = ["a002r", "10r", "009v", "001r", "flyleaf", "9r", "001v", "001w"]
+        for folio in folios:
+            make_fake_chant(source=source, folio=folio, c_sequence=1)
+        chant = Chant.objects.get(source=source, folio="9r")
+        self.assertEqual(chant.folio_sort_key, "000009r")
+        ordered_folios = list(
+            source.chant_set.order_by("folio_sort_key").values_list("folio", flat=True)
+        )
+        self.assertEqual(
+            ordered_folios,
+            ["001r", "001v", "001w", "9r", "009v", "10r", "a002r", "flyleaf"],
+        )
+
+        chant.folio = "011r"
+        chant.save(update_fields=["folio"])
+        chant.refresh_from_db()
+        self.assertEqual(chant.folio_sort_key, "000011r")
+
 
 class FeastModelTest(TestCase):
     @classmethod
@@ -391,6 +465,20 @@ class SourceModelTest(TestCase):
         chant = Chant.objects.create(source=source)
         self.assertEqual(source.number_of_melodies, 1)
 
+    def test_deferred_number_of_chants_and_melodies(self):
+        source = Source.objects.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            with defer_source_count_updates():
+                Chant.objects.create(source=source, volpiano="1-a-b-c")
+                Chant.objects.create(source=source)
+                Sequence.objects.create(source=source)
+                # the counts are only recomputed once the block exits
+                source.refresh_from_db()
+                self.assertNotEqual(source.number_of_chants, 3)
+        source.refresh_from_db()
+        self.assertEqual(source.number_of_chants, 3)
+        self.assertEqual(source.number_of_melodies, 1)
+
     def test_display_name(self):
         source = Source.objects.first()
         display_name = source.display_name
@@ -0,0 +1,76 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from main_app.models import Chant
+from main_app.tests.make_fakes import make_fake_feast, make_fake_source
+from next_chants import next_chants
+
+
+class TestPopulateNextChantFields(TestCase):
+    def test_next_chants_match_get_next_chant(self):
+        source = make_fake_source()
+        feast_1 = make_fake_feast()
+        feast_2 = make_fake_feast()
+        chants = [
+            Chant.objects.create(
+                source=source, folio=folio, c_sequence=c_sequence, feast=feast
+            )
+            for folio, c_sequence, feast in [
+                ("001r", 1, feast_1),
+                ("001r", 2, feast_1),
+                # a lacuna after a gap in the numbering
+                ("001r", 99, feast_1),
+                ("001v", 1, feast_2),
+                ("001v", 3, feast_2),
+                ("002r", 1, feast_2),
+                # a folio that isn't the next folio of any other folio
+                ("X", 1, feast_2),
+            ]
+        ]
+        other_source_chant = Chant.objects.create(
+            source=make_fake_source(), folio="001r", c_sequence=1
+        )
+
+        call_command(
+            "populate_next_chant_fields", "--source-id", source.id, stdout=StringIO()
+        )
+
+        for chant in chants:
+            chant.refresh_from_db()
+            self.assertEqual(chant.next_chant, chant.get_next_chant())
+        last_chants_in_feast = [chant.is_last_chant_in_feast for chant in chants]
+        self.assertEqual(
+            last_chants_in_feast, [False, False, True, False, False, None, None]
+        )
+        other_source_chant.refresh_from_db()
+        self.assertIsNone(other_source_chant.is_last_chant_in_feast)
+
+    def test_next_chant_counts_are_updated(self):
+        source = make_fake_source(published=True)
+        Chant.objects.create(source=source, folio="001r", c_sequence=1, cantus_id="1")
+        Chant.objects.create(source=source, folio="001r", c_sequence=2, cantus_id="2")
+        self.assertEqual(next_chants("1"), [])
+
+        call_command("populate_next_chant_fields", stdout=StringIO())
+
+        self.assertEqual(next_chants("1"), [("2", 1)])
+
+    def test_next_chants_are_reassigned(self):
+        source = make_fake_source()
+        chant_1 = Chant.objects.create(source=source, folio="001r", c_sequence=1)
+        chant_2 = Chant.objects.create(source=source, folio="001r", c_sequence=2)
+        chant_3 = Chant.objects.create(source=source, folio="001r", c_sequence=3)
+        Chant.objects.filter(id=chant_1.id).update(next_chant=chant_2)
+        Chant.objects.filter(id=chant_2.id).update(next_chant=chant_3)
+        # chant_2 is moved after chant_3, so chant_1 takes over chant_3 from chant_2
+        Chant.objects.filter(id=chant_2.id).update(c_sequence=4)
+
+        call_command("populate_next_chant_fields", stdout=StringIO())
+
+        for chant in (chant_1, chant_2, chant_3):
+            chant.refresh_from_db()
+        self.assertEqual(chant_1.next_chant, chant_3)
+        self.assertEqual(chant_3.next_chant, chant_2)
+        self.assertIsNone(chant_2.next_chant)
@@ -0,0 +1,39 @@
+from django.core.management import call_command
+from django.test import TestCase
+
+from main_app.models import Chant
+from main_app.melody_fields import (
+    generate_volpiano_interval_codes,
+    generate_volpiano_intervals,
+    generate_volpiano_notes,
+)
+from main_app.tests.make_fakes import make_fake_chant
+
+
+class TestRebuildMelodyIndex(TestCase):
+    def test_missing_fields_are_populated(self):
+        chant_with_melody = make_fake_chant(volpiano="1---g--h---j--h---3")
+        chant_without_melody = make_fake_chant()
+        Chant.objects.filter(id=chant_without_melody.id).update(volpiano=None)
+        Chant.objects.update(
+            volpiano_notes=None, volpiano_intervals=None, volpiano_interval_codes=None
+        )
+
+        call_command("rebuild_melody_index")
+
+        chant_with_melody.refresh_from_db()
+        expected_notes = generate_volpiano_notes(chant_with_melody.volpiano)
+        self.assertEqual(chant_with_melody.volpiano_notes, expected_notes)
+        self.assertEqual(
+            chant_with_melody.volpiano_intervals,
+            generate_volpiano_intervals(expected_notes),
+        )
+        self.assertEqual(
+            chant_with_melody.volpiano_interval_codes,
+            generate_volpiano_interval_codes(expected_notes),
+        )
+
+        chant_without_melody.refresh_from_db()
+        self.assertIsNone(chant_without_melody.volpiano_notes)
+        self.assertIsNone(chant_without_melody.volpiano_intervals)
+        self.assertIsNone(chant_without_melody.volpiano_interval_codes)
@@ -0,0 +1,141 @@
+from io import StringIO
+
+from django.test import TestCase, override_settings
+
+from main_app.management.commands.add_cantus_index_merge_events import (
+    Command as AddCantusIndexMergeEventsCommand,
+)
+from main_app.models import Chant
+from main_app.source_navigation import get_feast_changes, get_folio_navigation
+from main_app.tests.make_fakes import make_fake_feast, make_fake_source
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class SourceNavigationTest(TestCase):
+    def test_folio_navigation(self):
+        source = make_fake_source()
+        feast_1 = make_fake_feast()
+        feast_2 = make_fake_feast()
+        chant_1 = Chant.objects.create(
+            source=source, folio="001r", c_sequence=1, feast=feast_1
+        )
+        chant_2 = Chant.objects.create(
+            source=source, folio="001v", c_sequence=1, feast=feast_1
+        )
+        chant_3 = Chant.objects.create(
+            source=source, folio="001v", c_sequence=2, feast=feast_2
+        )
+        chant_4 = Chant.objects.create(source=source, folio="001v", c_sequence=3)
+        chant_5 = Chant.objects.create(source=source, folio="002r", c_sequence=1)
+
+        navigation = get_folio_navigation(source.id, "001v")
+
+        self.assertEqual(navigation["folios"], ["001r", "001v", "002r"])
+        self.assertEqual(navigation["previous_folio"], "001r")
+        self.assertEqual(navigation["next_folio"], "002r")
+        self.assertEqual(
+            navigation["feasts_current_folio"],
+            [[feast_1, [chant_2]], [feast_2, [chant_3]], [None, [chant_4]]],
+        )
+        self.assertEqual(
+            navigation["feasts_previous_folio"], [[feast_1, [chant_1]], [None, []]]
+        )
+        self.assertEqual(navigation["feasts_next_folio"], [[None, [chant_5]]])
+
+    def test_warm_cache_needs_no_queries(self):
+        source = make_fake_source()
+        Chant.objects.create(source=source, folio="001r", c_sequence=1)
+        Chant.objects.create(source=source, folio="001v", c_sequence=1)
+        Chant.objects.create(source=source, folio="002r", c_sequence=1)
+
+        with self.assertNumQueries(2):
+            get_folio_navigation(source.id, "001v")
+        with self.assertNumQueries(0):
+            navigation = get_folio_navigation(source.id, "001v")
+            feast, chants = navigation["feasts_current_folio"][0]
+            # the chants' feasts, genres and services are cached along with them
+            self.assertIsNone(chants[0].incipit)
+            self.assertIsNone(chants[0].genre)
+        # the previous and next folios are cached as well
+        with self.assertNumQueries(0):
+            get_folio_navigation(source.id, "002r")
+
+    def test_cache_is_invalidated_when_chants_change(self):
+        source = make_fake_source()
+        chant = Chant.objects.create(source=source, folio="001r", c_sequence=1)
+        self.assertEqual(get_folio_navigation(source.id, "001r")["folios"], ["001r"])
+
+        Chant.objects.create(source=source, folio="001v", c_sequence=1)
+        self.assertEqual(
+            get_folio_navigation(source.id, "001r")["folios"], ["001r", "001v"]
+        )
+
+        chant.incipit = "Ecce"
+        chant.save()
+        navigation = get_folio_navigation(source.id, "001r")
+        feast, chants = navigation["feasts_current_folio"][0]
+        self.assertEqual(chants[0].incipit, "Ecce")
+
+        chant.delete()
+        self.assertEqual(get_folio_navigation(source.id, "001v")["folios"], ["001v"])
+
+    def test_cache_is_invalidated_when_cantus_ids_are_merged(self):
+        source = make_fake_source()
+        Chant.objects.create(source=source, folio="001r", cantus_id="001234")
+        get_folio_navigation(source.id, "001r")
+
+        AddCantusIndexMergeEventsCommand(stdout=StringIO()).apply_transaction(
+            {"old": "001234", "new": "001235"}
+        )
+
+        navigation = get_folio_navigation(source.id, "001r")
+        feast, chants = navigation["feasts_current_folio"][0]
+        self.assertEqual(chants[0].cantus_id, "001235")
+
+    def test_stale_folios_are_refreshed(self):
+        source = make_fake_source()
+        Chant.objects.create(source=source, folio="001r", c_sequence=1)
+        self.assertEqual(get_folio_navigation(source.id, "001r")["folios"], ["001r"])
+
+        # bulk_create() doesn't send the signals that invalidate the cache
+        Chant.objects.bulk_create([Chant(source=source, folio="001v", c_sequence=1)])
+        navigation = get_folio_navigation(source.id, "001v")
+        self.assertEqual(navigation["folios"], ["001r", "001v"])
+        self.assertEqual(navigation["previous_folio"], "001r")
+
+        # a folio without chants has no navigation
+        navigation = get_folio_navigation(source.id, "002r")
+        self.assertEqual(navigation["folios"], ["001r", "001v"])
+        self.assertIsNone(navigation["previous_folio"])
+        self.assertIsNone(navigation["next_folio"])
+        self.assertEqual(navigation["feasts_current_folio"], [])
+
+    def test_feast_changes(self):
+        source = make_fake_source()
+        feast_1 = make_fake_feast()
+        feast_2 = make_fake_feast()
+        Chant.objects.create(source=source, folio="001r", c_sequence=1, feast=feast_1)
+        Chant.objects.create(source=source, folio="001r", c_sequence=2, feast=feast_2)
+        Chant.objects.create(source=source, folio="001r", c_sequence=3, feast=feast_1)
+        Chant.objects.create(source=source, folio="001v", c_sequence=1, feast=feast_1)
+        Chant.objects.create(source=source, folio="001v", c_sequence=2)
+        Chant.objects.create(source=source, folio="001v", c_sequence=3, feast=feast_1)
+        Chant.objects.create(source=source, folio="002r", c_sequence=1, feast=feast_2)
+
+        expected = [
+            ("001r", feast_1.id, feast_1.name),
+            ("001r", feast_2.id, feast_2.name),
+            ("001v", feast_1.id, feast_1.name),
+            ("002r", feast_2.id, feast_2.name),
+        ]
+        with self.assertNumQueries(1):
+            self.assertEqual(get_feast_changes(source.id), expected)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_feast_changes(source.id), expected)
+
+        Chant.objects.create(source=source, folio="002v", c_sequence=1, feast=feast_1)
+        self.assertEqual(
+            get_feast_changes(source.id)[-1], ("002v", feast_1.id, feast_1.name)
+        )
@@ -0,0 +1,160 @@
+from io import StringIO
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase
+
+from main_app.management.commands.add_cantus_index_merge_events import (
+    Command as AddCantusIndexMergeEventsCommand,
+)
+from main_app.management.commands.reassign_feasts import FEAST_MAPPING
+from main_app.models import Chant, Feast, FeastChantCount
+from main_app.tests.make_fakes import (
+    make_fake_feast,
+    make_fake_genre,
+    make_fake_institution,
+    make_fake_source,
+    make_fake_user,
+)
+from main_app.views.feast import FeastDetailView
+
+
+def get_feast_context(feast, user=None) -> dict:
+    request = RequestFactory().get("/")
+    request.user = user or AnonymousUser()
+    view = FeastDetailView()
+    view.setup(request, pk=feast.pk)
+    view.object = feast
+    return view.get_context_data()
+
+
+class TestUpdateFeastChantCounts(TestCase):
+    def test_frequent_chants_and_sources(self):
+        feast = make_fake_feast()
+        genre_1 = make_fake_genre()
+        genre_2 = make_fake_genre()
+        big_source = make_fake_source(
+            holding_institution=make_fake_institution(siglum="big")
+        )
+        small_source = make_fake_source(
+            holding_institution=make_fake_institution(siglum="small")
+        )
+        for incipit, genre in [("First", genre_1), ("Second", genre_2), ("", None)]:
+            Chant.objects.create(
+                feast=feast,
+                source=big_source,
+                cantus_id="300000",
+                incipit=incipit,
+                genre=genre,
+            )
+        Chant.objects.create(feast=feast, source=big_source)
+        Chant.objects.create(feast=feast, source=small_source, cantus_id="100000")
+        # sources whose chants of the feast have no Cantus ID are not listed
+        Chant.objects.create(feast=feast, source=make_fake_source())
+
+        context = get_feast_context(feast)
+
+        frequent_chants = list(context["frequent_chants"])
+        self.assertEqual(context["frequent_chants_count"], 2)
+        self.assertEqual(
+            [(chant.cantus_id, chant.ccount) for chant in frequent_chants],
+            [("300000", 3), ("100000", 1)],
+        )
+        self.assertEqual(frequent_chants[0].incipit, "First")
+        self.assertEqual(
+            sorted(frequent_chants[0].genres),
+            sorted(
+                f"{genre.id}::{genre.name}::{genre.description}"
+                for genre in (genre_1, genre_2)
+            ),
+        )
+        sources = list(context["sources"])
+        self.assertEqual(context["sources_count"], 2)
+        self.assertEqual(
+            [(source.siglum, source.chant_count) for source in sources],
+            [("big", 4), ("small", 1)],
+        )
+
+    def test_published_field_follows_source(self):
+        feast = make_fake_feast()
+        source = make_fake_source(published=False)
+        Chant.objects.create(feast=feast, source=source, cantus_id="100000")
+        self.assertEqual(get_feast_context(feast)["frequent_chants_count"], 0)
+        context = get_feast_context(feast, user=make_fake_user())
+        self.assertEqual(context["frequent_chants_count"], 1)
+        self.assertEqual(context["sources_count"], 1)
+
+        source.published = True
+        source.save()
+        self.assertTrue(FeastChantCount.objects.get(source=source).published)
+        self.assertEqual(get_feast_context(feast)["frequent_chants_count"], 1)
+
+    def test_counts_are_rebuilt(self):
+        feast_1 = make_fake_feast()
+        feast_2 = make_fake_feast()
+        source = make_fake_source()
+        chant = Chant.objects.create(feast=feast_1, source=source, cantus_id="100000")
+        # updates made in bulk don't send signals
+        Chant.objects.filter(id=chant.id).update(feast=feast_2)
+        self.assertEqual(get_feast_context(feast_2)["frequent_chants_count"], 0)
+
+        call_command("update_feast_chant_counts", stdout=StringIO())
+
+        self.assertEqual(get_feast_context(feast_1)["frequent_chants_count"], 0)
+        self.assertEqual(get_feast_context(feast_2)["frequent_chants_count"], 1)
+
+    def test_counts_follow_saved_chants(self):
+        feast_1 = make_fake_feast()
+        feast_2 = make_fake_feast()
+        chant = Chant.objects.create(
+            feast=feast_1, source=make_fake_source(), cantus_id="100000"
+        )
+        self.assertEqual(get_feast_context(feast_1)["frequent_chants_count"], 1)
+
+        chant = Chant.objects.get(id=chant.id)
+        chant.feast = feast_2
+        chant.save()
+        self.assertEqual(get_feast_context(feast_1)["frequent_chants_count"], 0)
+        self.assertEqual(get_feast_context(feast_2)["frequent_chants_count"], 1)
+
+        chant.delete()
+        self.assertEqual(get_feast_context(feast_2)["frequent_chants_count"], 0)
+
+    def test_saving_a_chant_only_updates_the_counts_of_its_feasts(self):
+        feast_1 = make_fake_feast()
+        feast_2 = make_fake_feast()
+        source = make_fake_source()
+        chant = Chant.objects.create(feast=feast_1, source=source, cantus_id="100000")
+        Chant.objects.create(feast=feast_2, source=source, cantus_id="100000")
+        # updates made in bulk don't send signals
+        FeastChantCount.objects.filter(feast=feast_2).update(count=5)
+
+        chant.save()
+
+        self.assertEqual(FeastChantCount.objects.get(feast=feast_1).count, 1)
+        self.assertEqual(FeastChantCount.objects.get(feast=feast_2).count, 5)
+
+    def test_counts_follow_reassigned_feasts(self):
+        old_feast_id, new_feast_id = next(iter(FEAST_MAPPING.items()))
+        old_feast = Feast.objects.create(id=old_feast_id, name="Old feast")
+        new_feast = Feast.objects.create(id=new_feast_id, name="New feast")
+        Chant.objects.create(
+            feast=old_feast, source=make_fake_source(), cantus_id="100000"
+        )
+
+        call_command("reassign_feasts", stdout=StringIO(), stderr=StringIO())
+
+        context = get_feast_context(new_feast)
+        self.assertEqual(context["frequent_chants_count"], 1)
+        self.assertEqual(context["sources_count"], 1)
+
+    def test_counts_follow_merged_cantus_ids(self):
+        feast = make_fake_feast()
+        Chant.objects.create(feast=feast, source=make_fake_source(), cantus_id="100000")
+
+        AddCantusIndexMergeEventsCommand(stdout=StringIO()).apply_transaction(
+            {"old": "100000", "new": "200000"}
+        )
+
+        frequent_chants = list(get_feast_context(feast)["frequent_chants"])
+        self.assertEqual([chant.cantus_id for chant in frequent_chants], ["200000"])
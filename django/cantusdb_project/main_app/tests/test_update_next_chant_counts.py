@@ -0,0 +1,91 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from main_app.management.commands.add_cantus_index_merge_events import (
+    Command as AddCantusIndexMergeEventsCommand,
+)
+from main_app.models import Chant, NextChantCount
+from main_app.tests.make_fakes import make_fake_source
+from next_chants import next_chants
+
+
+class TestUpdateNextChantCounts(TestCase):
+    def test_counts_are_rebuilt(self):
+        source = make_fake_source(published=True)
+        chant_2 = Chant.objects.create(source=source, cantus_id="2000")
+        chant_1 = Chant.objects.create(
+            source=source, cantus_id="1000", next_chant=chant_2
+        )
+        # updates made in bulk don't send signals
+        Chant.objects.filter(id=chant_1.id).update(next_chant=None)
+        Chant.objects.filter(id=chant_2.id).update(next_chant=chant_1)
+        self.assertEqual(next_chants("1000"), [("2000", 1)])
+
+        call_command("update_next_chant_counts", stdout=StringIO())
+
+        self.assertEqual(next_chants("1000"), [])
+        self.assertEqual(next_chants("2000"), [("1000", 1)])
+
+    def test_counts_follow_saved_chants(self):
+        source = make_fake_source(published=True)
+        chant_2 = Chant.objects.create(source=source, cantus_id="2000")
+        Chant.objects.create(source=source, cantus_id="1000", next_chant=chant_2)
+        self.assertEqual(next_chants("1000"), [("2000", 1)])
+
+        chant_2 = Chant.objects.get(id=chant_2.id)
+        chant_2.cantus_id = "3000"
+        chant_2.save()
+        self.assertEqual(next_chants("1000"), [("3000", 1)])
+
+        chant_2.delete()
+        self.assertEqual(next_chants("1000"), [])
+
+    def test_saving_a_chant_only_updates_the_counts_of_its_cantus_ids(self):
+        source = make_fake_source(published=True)
+        chant_2 = Chant.objects.create(source=source, cantus_id="2000")
+        chant_1 = Chant.objects.create(
+            source=source, cantus_id="1000", next_chant=chant_2
+        )
+        chant_4 = Chant.objects.create(source=source, cantus_id="4000")
+        Chant.objects.create(source=source, cantus_id="3000", next_chant=chant_4)
+        # updates made in bulk don't send signals
+        NextChantCount.objects.filter(cantus_id="3000").update(count=5)
+
+        chant_1.save()
+
+        self.assertEqual(next_chants("1000"), [("2000", 1)])
+        self.assertEqual(next_chants("3000"), [("4000", 5)])
+
+    def test_counts_follow_merged_cantus_ids(self):
+        source = make_fake_source(published=True)
+        chant_2 = Chant.objects.create(source=source, cantus_id="2000")
+        Chant.objects.create(source=source, cantus_id="1000", next_chant=chant_2)
+
+        AddCantusIndexMergeEventsCommand(stdout=StringIO()).apply_transaction(
+            {"old": "2000", "new": "3000"}
+        )
+
+        self.assertEqual(next_chants("1000"), [("3000", 1)])
+
+    def test_published_field_follows_source(self):
+        source = make_fake_source(published=False)
+        chant_2 = Chant.objects.create(source=source, cantus_id="2000")
+        Chant.objects.create(source=source, cantus_id="1000", next_chant=chant_2)
+        self.assertEqual(next_chants("1000"), [])
+        self.assertEqual(next_chants("1000", display_unpublished=True), [("2000", 1)])
+
+        source.published = True
+        source.save()
+        self.assertTrue(NextChantCount.objects.get(source=source).published)
+        self.assertEqual(next_chants("1000"), [("2000", 1)])
+
+    def test_lookup_is_a_single_query(self):
+        source = make_fake_source(published=True)
+        for _ in range(3):
+            chant_2 = Chant.objects.create(source=source, cantus_id="2000")
+            Chant.objects.create(source=source, cantus_id="1000", next_chant=chant_2)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(next_chants("1000"), [("2000", 3)])
@@ -0,0 +1,24 @@
+from django.test import RequestFactory, SimpleTestCase
+from django.urls import reverse
+
+from main_app.url_templates import URLTemplate
+
+
+class URLTemplateTest(SimpleTestCase):
+    def test_format(self):
+        chant_url = URLTemplate("chant-detail")
+        for chant_id in (1, 123, 918273645546372819):
+            with self.subTest(chant_id=chant_id):
+                self.assertEqual(
+                    chant_url.format(chant_id),
+                    reverse("chant-detail", args=[chant_id]),
+                )
+
+    def test_format_absolute(self):
+        request = RequestFactory().get("/json-cid/1", SERVER_NAME="testserver")
+        source_url = URLTemplate("source-detail", request)
+        self.assertEqual(
+            source_url.format(42),
+            request.build_absolute_uri(reverse("source-detail", args=[42])),
+        )
+        self.assertTrue(source_url.format(42).startswith("http://testserver/"))
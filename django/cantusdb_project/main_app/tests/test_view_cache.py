@@ -0,0 +1,50 @@
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.views import View
+
+from main_app.mixins import AnonymousCacheMixin
+from main_app.tests.make_fakes import make_fake_genre, make_fake_user
+
+
+class CountingView(AnonymousCacheMixin, View):
+    calls = 0
+
+    def get(self, request):
+        CountingView.calls += 1
+        return HttpResponse(str(CountingView.calls))
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class AnonymousCacheMixinTest(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.view = CountingView.as_view()
+        # make the pages cached by previous tests stale
+        make_fake_genre()
+
+    def get(self, path="/pages/", user=None, **extra):
+        request = self.factory.get(path, **extra)
+        request.user = user or AnonymousUser()
+        return self.view(request).content
+
+    def test_anonymous_responses_are_cached(self):
+        first = self.get()
+        self.assertEqual(self.get(), first)
+        # a different query string or Accept header is a different page
+        self.assertNotEqual(self.get("/pages/?page=2"), first)
+        self.assertNotEqual(self.get(HTTP_ACCEPT="application/json"), first)
+
+    def test_logged_in_users_bypass_the_cache(self):
+        first = self.get()
+        user = make_fake_user()
+        self.assertNotEqual(self.get(user=user), first)
+        self.assertNotEqual(self.get(user=user), self.get(user=user))
+        self.assertEqual(self.get(), first)
+
+    def test_cache_is_invalidated_when_objects_are_saved(self):
+        first = self.get()
+        make_fake_genre()
+        self.assertNotEqual(self.get(), first)
@@ -5,6 +5,7 @@ Tests for views in views/api.py
 import json
 from typing import Optional
 import csv
+import gzip
 from collections.abc import ItemsView, KeysView
 
 from django.test import TestCase
@@ -246,6 +247,68 @@ class AjaxMelodyViewTest(TestCase):
                 self.assertEqual(value, concordance[key])
 
 
+class AjaxMelodySearchTest(TestCase):
+    def setUp(self):
+        source = make_fake_source(published=True)
+        self.chants = [
+            make_fake_chant(source=source, volpiano="1---f-g-h---") for _ in range(5)
+        ]
+        # a chant whose melody doesn't match
+        make_fake_chant(source=source, volpiano="1---k-h-g---")
+
+    def search(self, **params) -> dict:
+        response = self.client.get(
+            reverse("ajax-melody-search"), {"notes": "fgh", **params}
+        )
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_single_page(self):
+        content = self.search()
+        self.assertEqual(
+            [result["id"] for result in content["results"]],
+            [chant.id for chant in self.chants],
+        )
+        self.assertIsNone(content["next"])
+        self.assertEqual(content["result_count"], 5)
+        self.assertFalse(content["result_count_is_approximate"])
+
+    def test_pagination(self):
+        first_page = self.search(page_size=2)
+        self.assertEqual(len(first_page["results"]), 2)
+        self.assertEqual(first_page["result_count"], 5)
+        self.assertFalse(first_page["result_count_is_approximate"])
+
+        ids = [result["id"] for result in first_page["results"]]
+        next_page = first_page["next"]
+        while next_page is not None:
+            page = self.search(page_size=2, after=next_page)
+            # the total is only counted for the first page
+            self.assertNotIn("result_count", page)
+            ids.extend(result["id"] for result in page["results"])
+            next_page = page["next"]
+        self.assertEqual(ids, [chant.id for chant in self.chants])
+
+    def test_transpositions(self):
+        source = make_fake_source(published=True)
+        # the same intervals as "fgh", a step higher
+        transposed = make_fake_chant(source=source, volpiano="1---g-h-j---")
+        # a descending step and an ascending step, which contain "1" and "-11" in
+        # volpiano_intervals, but don't start with two ascending steps
+        make_fake_chant(source=source, volpiano="1---h-g-h---")
+        content = self.search(transpose="true")
+        self.assertEqual(
+            [result["id"] for result in content["results"]],
+            [chant.id for chant in self.chants] + [transposed.id],
+        )
+
+    def test_invalid_page_parameters(self):
+        response = self.client.get(
+            reverse("ajax-melody-search"), {"notes": "fgh", "after": "abc"}
+        )
+        self.assertEqual(response.status_code, 400)
+
+
 class JsonMelodyExportTest(TestCase):
     def test_json_melody_response(self):
         NUM_CHANTS = 10
@@ -908,7 +971,7 @@ class CsvExportTest(TestCase):
             chant.siglum = chant_siglum
             chant.save()
         response = self.client.get(reverse("csv-export", args=[source.id]))
-        content = response.content.decode("utf-8")
+        content = response.getvalue().decode("utf-8")
         split_content = list(csv.reader(content.splitlines(), delimiter=","))
         header, rows = split_content[0], split_content[1:]
 
@@ -954,6 +1017,17 @@ class CsvExportTest(TestCase):
             for row in rows:
                 self.assertEqual(row[0], source_shelfmark)
 
+    def test_gzip(self):
+        source = make_fake_source(published=True)
+        make_fake_chant(source=source)
+        response = self.client.get(reverse("csv-export", args=[source.id]))
+        self.assertFalse(response.has_header("Content-Encoding"))
+        gzip_response = self.client.get(
+            reverse("csv-export", args=[source.id]), HTTP_ACCEPT_ENCODING="gzip"
+        )
+        self.assertEqual(gzip_response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(gzip_response.getvalue()), response.getvalue())
+
     def test_published_vs_unpublished(self):
         published_source = make_fake_source(published=True)
         response_1 = self.client.get(reverse("csv-export", args=[published_source.id]))
@@ -971,10 +1045,11 @@ class CsvExportTest(TestCase):
         bower_segment.save()
         source = make_fake_source(published=True)
         source.segment = bower_segment
+        source.save()
         for _ in range(NUM_SEQUENCES):
             make_fake_sequence(source=source)
         response = self.client.get(reverse("csv-export", args=[source.id]))
-        content = response.content.decode("utf-8")
+        content = response.getvalue().decode("utf-8")
         split_content = list(csv.reader(content.splitlines(), delimiter=","))
         header, rows = split_content[0], split_content[1:]
 
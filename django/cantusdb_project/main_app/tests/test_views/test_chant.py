@@ -26,7 +26,7 @@ from main_app.tests.make_fakes import (
     get_random_search_term,
 )
 from main_app.tests.test_functions import mock_requests_get
-from main_app.models import Chant, Segment, Source, Feast, Service
+from main_app.models import Chant, Segment, Sequence, Source, Feast, Service
 
 
 # Create a Faker instance with locale set to Latin
@@ -580,6 +580,60 @@ class ChantSearchViewTest(TestCase):
         context_chant_id = response.context["chants"][0].id
         self.assertEqual(chant.id, context_chant_id)
 
+    def test_keyword_search_contains_ignores_accents(self):
+        source = make_fake_source(published=True)
+        chant = Chant.objects.create(
+            source=source,
+            manuscript_full_text="Ecce venit ad templum sanctum suum dominátor",
+        )
+        response = self.client.get(
+            reverse("chant-search"), {"keyword": "dominator", "op": "contains"}
+        )
+        context_chant_id = response.context["chants"][0].id
+        self.assertEqual(chant.id, context_chant_id)
+
+    def test_keyword_search_full_text(self):
+        source = make_fake_source(published=True)
+        less_relevant_chant = Chant.objects.create(
+            source=source,
+            manuscript_full_text="Gloria in excelsis deo alleluia",
+        )
+        more_relevant_chant = Chant.objects.create(
+            source=source,
+            manuscript_full_text="Alleluia alleluia alleluia",
+        )
+        Chant.objects.create(
+            source=source,
+            manuscript_full_text="hoc tantum possum dicere",
+        )
+        response = self.client.get(
+            reverse("chant-search"), {"keyword": "alleluia", "op": "full_text"}
+        )
+        # results are ordered by relevance by default
+        context_chant_ids = [chant.id for chant in response.context["chants"]]
+        self.assertEqual(
+            context_chant_ids, [more_relevant_chant.id, less_relevant_chant.id]
+        )
+
+    def test_keyword_search_full_text_ranks_chants_and_sequences_alike(self):
+        source = make_fake_source(published=True)
+        Chant.objects.create(
+            source=source,
+            incipit="Alleluia",
+            manuscript_full_text="Alleluia dies sanctificatus",
+        )
+        Sequence.objects.create(
+            source=source,
+            title="Alleluia",
+            manuscript_full_text="Alleluia dies sanctificatus",
+        )
+        response = self.client.get(
+            reverse("chant-search"), {"keyword": "alleluia", "op": "full_text"}
+        )
+        ranks = [result.rank for result in response.context["chants"]]
+        self.assertEqual(len(ranks), 2)
+        self.assertAlmostEqual(ranks[0], ranks[1])
+
     def test_search_bar_search(self):
         # note to developers: if you are changing the behavior of search_bar
         # searches, be sure to check static/js/chant_search.js to see if it needs
@@ -1901,17 +1955,25 @@ class ChantSearchMSViewTest(TestCase):
     def test_keyword_search_contains(self):
         source = make_fake_source()
         search_term = "quick"
+        # results are ordered by folio and sequence, so these are fixed to make
+        # the expected order deterministic
         chant_1 = make_fake_chant(
             source=source,
+            folio="001r",
+            c_sequence=1,
             manuscript_full_text_std_spelling="Quick brown fox jumps over the lazy dog",
         )
         # Make a chant that won't be returned by the search term
         make_fake_chant(
             source=source,
+            folio="001r",
+            c_sequence=2,
             manuscript_full_text_std_spelling="brown fox jumps over the lazy dog",
         )
         chant_3 = make_fake_chant(
             source=source,
+            folio="001v",
+            c_sequence=1,
             manuscript_full_text_std_spelling="lazy brown fox jumps quickly over the dog",
         )
         response = self.client.get(
@@ -1923,6 +1985,63 @@ class ChantSearchMSViewTest(TestCase):
         second_context_chant_id = response.context["chants"][1].id
         self.assertEqual(chant_3.id, second_context_chant_id)
 
+    def test_keyword_search_contains_ignores_accents(self):
+        source = make_fake_source()
+        chant = Chant.objects.create(
+            source=source,
+            manuscript_full_text="Ecce venit ad templum sanctum suum dominátor",
+        )
+        response = self.client.get(
+            reverse("chant-search-ms", args=[source.id]),
+            {"keyword": "dominator", "op": "contains"},
+        )
+        context_chant_id = response.context["chants"][0].id
+        self.assertEqual(chant.id, context_chant_id)
+
+    def test_keyword_search_full_text(self):
+        source = make_fake_source()
+        less_relevant_chant = make_fake_chant(
+            source=source,
+            manuscript_full_text_std_spelling="Gloria in excelsis deo alleluia",
+        )
+        more_relevant_chant = make_fake_chant(
+            source=source,
+            manuscript_full_text_std_spelling="Alleluia alleluia alleluia",
+        )
+        make_fake_chant(
+            source=source,
+            manuscript_full_text_std_spelling="hoc tantum possum dicere",
+        )
+        response = self.client.get(
+            reverse("chant-search-ms", args=[source.id]),
+            {"keyword": "alleluia", "op": "full_text"},
+        )
+        # results are ordered by relevance by default
+        context_chant_ids = [chant.id for chant in response.context["chants"]]
+        self.assertEqual(
+            context_chant_ids, [more_relevant_chant.id, less_relevant_chant.id]
+        )
+
+    def test_keyword_search_full_text_sort_desc(self):
+        source = make_fake_source()
+        less_relevant_chant = make_fake_chant(
+            source=source,
+            manuscript_full_text_std_spelling="Gloria in excelsis deo alleluia",
+        )
+        more_relevant_chant = make_fake_chant(
+            source=source,
+            manuscript_full_text_std_spelling="Alleluia alleluia alleluia",
+        )
+        response = self.client.get(
+            reverse("chant-search-ms", args=[source.id]),
+            {"keyword": "alleluia", "op": "full_text", "sort": "desc"},
+        )
+        # sort=desc reverses the default ordering by relevance
+        context_chant_ids = [chant.id for chant in response.context["chants"]]
+        self.assertEqual(
+            context_chant_ids, [less_relevant_chant.id, more_relevant_chant.id]
+        )
+
     def test_indexing_notes_search_starts_with(self):
         source = make_fake_source()
         search_term = "quick"
@@ -1951,17 +2070,25 @@ class ChantSearchMSViewTest(TestCase):
     def test_indexing_notes_search_contains(self):
         source = make_fake_source()
         search_term = "quick"
+        # results are ordered by folio and sequence, so these are fixed to make
+        # the expected order deterministic
         chant_1 = make_fake_chant(
             source=source,
+            folio="001r",
+            c_sequence=1,
             indexing_notes="Quick brown fox jumps over the lazy dog",
         )
         # Make a chant that won't be returned by the search term
         make_fake_chant(
             source=source,
+            folio="001r",
+            c_sequence=2,
             indexing_notes="brown fox jumps over the lazy dog",
         )
         chant_3 = make_fake_chant(
             source=source,
+            folio="001v",
+            c_sequence=1,
             indexing_notes="lazy brown fox jumps quickly over the dog",
         )
         response = self.client.get(
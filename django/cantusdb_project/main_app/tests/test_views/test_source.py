@@ -161,8 +161,8 @@ class SourceDetailViewTest(TestCase):
         # the element in "folios" should be unique and ordered in this way
         folios = response.context["folios"]
         self.assertEqual(list(folios), ["001r", "001v", "002r", "002v"])
-        # the folios should be ordered by the "folio" field
-        self.assertEqual(folios.query.order_by, ("folio",))
+        # the folios should be ordered by the "folio_sort_key" field
+        self.assertEqual(folios.query.order_by, ("folio_sort_key", "folio"))
 
     def test_context_feasts_with_folios(self):
         # create a source and several chants (associated with feasts) in it
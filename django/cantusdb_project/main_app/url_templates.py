@@ -0,0 +1,36 @@
+"""
+Building the URLs of many objects of the same kind, such as the chant links of
+the JSON exports in views/api.py.
+
+reverse() looks up and matches the URL pattern, and build_absolute_uri() parses
+the resulting URL, every time they are called. URLTemplate does this only once,
+for a placeholder ID, and then formats each object's ID into the result.
+"""
+
+from typing import Optional
+
+from django.http import HttpRequest
+from django.urls import reverse
+
+# an ID that can't otherwise appear in a URL
+PLACEHOLDER_ID = 918273645546372819
+
+
+class URLTemplate:
+    """The URLs of a URL pattern that takes a single ID argument, e.g.
+    `URLTemplate("chant-detail").format(1)` returns "/chant/1".
+
+    Args:
+        viewname (str): The name of the URL pattern
+        request (HttpRequest): If given, the URLs are absolute URLs for the
+            same host as the request (as built by request.build_absolute_uri())
+    """
+
+    def __init__(self, viewname: str, request: Optional[HttpRequest] = None) -> None:
+        url = reverse(viewname, args=[PLACEHOLDER_ID])
+        if request is not None:
+            url = request.build_absolute_uri(url)
+        self.prefix, self.suffix = url.split(str(PLACEHOLDER_ID))
+
+    def format(self, id: int) -> str:
+        return f"{self.prefix}{id}{self.suffix}"
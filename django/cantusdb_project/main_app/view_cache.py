@@ -0,0 +1,51 @@
+"""
+Whole-page caching of public views for anonymous users.
+
+Views that use mixins.AnonymousCacheMixin store the responses they send to
+anonymous users in Django's cache framework (see CACHES in settings.py), and
+serve them from there to later anonymous requests for the same URL. Logged-in
+users can see unpublished sources, so their responses are never cached.
+
+The cache keys include a version token, which is replaced whenever an object of
+the main app is saved or deleted (see signals.py), so that all the cached pages
+become stale at once.
+"""
+
+from hashlib import md5
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.http import HttpRequest
+
+from main_app.source_navigation import delete_version
+
+VERSION_KEY = "view-cache-version"
+
+
+def get_view_cache_version() -> str:
+    """Return the current version token of the cached pages, creating it if it
+    doesn't exist yet (or has been evicted from the cache)."""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # if another request has just created the token, use theirs
+        cache.add(VERSION_KEY, uuid4().hex, timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate_view_cache() -> None:
+    """Mark all the cached pages as stale.
+
+    Called when an object of the main app is saved or deleted, and after chants
+    are imported or their source's counts are recomputed.
+    """
+    delete_version(VERSION_KEY)
+
+
+def get_view_cache_key(request: HttpRequest, view_name: str) -> str:
+    """Build the cache key of a page, from the view, the full URL (including the
+    query string) and the Accept header, as some views can also return JSON."""
+    url = request.build_absolute_uri()
+    accept = request.META.get("HTTP_ACCEPT", "")
+    digest = md5(f"{url}\n{accept}".encode(), usedforsecurity=False).hexdigest()
+    return f"view-cache:{get_view_cache_version()}:{view_name}:{digest}"
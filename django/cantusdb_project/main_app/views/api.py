@@ -1,14 +1,28 @@
 import csv
-from typing import Optional, Union, Any
+import re
+from io import StringIO
+from typing import Iterator, Optional, Union, Any
+import ujson
 from django.contrib.auth import get_user_model
 from django.contrib.flatpages.models import FlatPage
 from django.core.exceptions import PermissionDenied
 from django.db.models.query import QuerySet
 from django.http.response import JsonResponse
-from django.http import HttpResponse, HttpResponseNotFound, Http404, HttpRequest
-from django.urls.base import reverse
+from django.http import (
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseNotFound,
+    Http404,
+    HttpRequest,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
 from articles.models import Article
+from main_app.cantus_id_cache import cache_cantus_id_response, set_last_modified
+from main_app.chant_export import CSV_COLUMNS, DEFAULT_CHUNK_SIZE, iter_export_rows
+from main_app.melody_fields import generate_volpiano_interval_codes
 from main_app.models import (
     Chant,
     Notation,
@@ -17,9 +31,11 @@ from main_app.models import (
     Sequence,
     Source,
 )
+from main_app.url_templates import URLTemplate
 from next_chants import next_chants
 
 
+@cache_cantus_id_response
 def ajax_melody_list(request: HttpRequest, cantus_id: str) -> JsonResponse:
     """
     Function-based view responding to the AJAX call for melody list on the chant detail page,
@@ -44,6 +60,8 @@ def ajax_melody_list(request: HttpRequest, cantus_id: str) -> JsonResponse:
     if not display_unpublished:
         chants = chants.filter(source__published=True)
 
+    chant_url = URLTemplate("chant-detail")
+    source_url = URLTemplate("source-detail")
     concordances: list[dict[str, str]] = []
     for chant in chants:
         concordance: dict[str, str] = {
@@ -60,31 +78,70 @@ def ajax_melody_list(request: HttpRequest, cantus_id: str) -> JsonResponse:
             "manuscript_full_text_std_spelling": chant.manuscript_full_text_std_spelling
             or "",
             "ci_link": chant.get_ci_url(),
-            "chant_link": chant.get_absolute_url(),
-            "source_link": chant.source.get_absolute_url(),
+            "chant_link": chant_url.format(chant.id),
+            "source_link": source_url.format(chant.source_id),
             "db": "CD",
         }
         concordances.append(concordance)
 
     concordance_count = len(concordances)
-    return JsonResponse(
+    response = JsonResponse(
         {"concordances": concordances, "concordance_count": concordance_count},
         safe=True,
     )
+    set_last_modified(response, chants)
+    return response
+
+
+# as in django.middleware.gzip.GZipMiddleware
+ACCEPTS_GZIP_RE = re.compile(r"\bgzip\b")
+
+
+def iter_csv_export(source: Source) -> Iterator[str]:
+    """
+    Yields the CSV export of a source in chunks of DEFAULT_CHUNK_SIZE rows
+    (see chant_export.iter_export_rows()), starting with the header.
+
+    Args:
+        source (Source): The source to export
+
+    Returns:
+        Iterator[str]: The chunks of the CSV file
+    """
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+
+    def flush() -> str:
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+    writer.writerow(CSV_COLUMNS)
+    yield flush()
+
+    for count, row in enumerate(iter_export_rows(source), start=1):
+        writer.writerow(row)
+        if count % DEFAULT_CHUNK_SIZE == 0:
+            yield flush()
+    yield flush()
 
 
 def csv_export(request, source_id):
     """
     Function-based view for the CSV export page, accessed with ``csv/<str:source_id>``
 
+    The CSV file is streamed as it is read from the database (see
+    iter_csv_export()), and compressed with gzip if the client accepts it.
+
     Args:
         source_id (str): The ID of the source to export
 
     Returns:
-        HttpResponse: The CSV response
+        StreamingHttpResponse: The CSV response
     """
     try:
-        source = Source.objects.get(id=source_id)
+        source = Source.objects.select_related("holding_institution").get(id=source_id)
     except:
         raise Http404("This source does not exist")
 
@@ -93,90 +150,33 @@ def csv_export(request, source_id):
     if not source.published and not display_unpublished:
         raise PermissionDenied
 
-    # "4064" is the segment id of the sequence DB, sources in that segment have sequences instead of chants
-    if source.segment and source.segment.id == 4064:
-        entries = source.sequence_set.order_by("id")
-    else:
-        entries = source.chant_set.order_by("id").select_related(
-            "feast", "service", "genre"
-        )
-
-    response = HttpResponse(content_type="text/csv")
+    response = StreamingHttpResponse(iter_csv_export(source), content_type="text/csv")
     # response["Content-Disposition"] = 'attachment; filename="somefilename.csv"'
 
-    writer = csv.writer(response)
-    writer.writerow(
-        [
-            "shelfmark",
-            "holding_institution",
-            "marginalia",
-            "folio",
-            "sequence",
-            "incipit",
-            "feast",
-            "service",
-            "genre",
-            "position",
-            "cantus_id",
-            "mode",
-            "finalis",
-            "differentia",
-            "differentiae_database",
-            "fulltext_standardized",
-            "fulltext_ms",
-            "volpiano",
-            "image_link",
-            "melody_id",
-            "addendum",
-            "extra",
-            "node_id",
-        ]
-    )
-    shelfmark = source.shelfmark
-    holding_institution = source.holding_institution
-
-    for entry in entries:
-        feast = entry.feast.name if entry.feast else ""
-        service = entry.service.name if entry.service else ""
-        genre = entry.genre.name if entry.genre else ""
-
-        writer.writerow(
-            [
-                shelfmark,
-                holding_institution,
-                entry.marginalia,
-                entry.folio,
-                # if entry has a c_sequence, it's a Chant. If it doesn't, it's a Sequence, so write its s_sequence
-                entry.c_sequence if entry.c_sequence is not None else entry.s_sequence,
-                entry.incipit,
-                feast,
-                service,
-                genre,
-                entry.position,
-                entry.cantus_id,
-                entry.mode,
-                entry.finalis,
-                entry.differentia,
-                entry.diff_db,
-                entry.manuscript_full_text_std_spelling,
-                entry.manuscript_full_text,
-                entry.volpiano,
-                entry.image_link,
-                entry.melody_id,
-                entry.addendum,
-                entry.extra,
-                entry.id,
-            ]
-        )
+    patch_vary_headers(response, ["Accept-Encoding"])
+    if ACCEPTS_GZIP_RE.search(request.META.get("HTTP_ACCEPT_ENCODING", "")):
+        response.streaming_content = compress_sequence(response.streaming_content)
+        response["Content-Encoding"] = "gzip"
 
     return response
 
 
+# number of results in a page of melody search results, by default and at most
+MELODY_SEARCH_PAGE_SIZE = 100
+MELODY_SEARCH_MAX_PAGE_SIZE = 500
+# melody searches estimated by the query planner to have more results than this
+# return the estimate instead of counting the results exactly
+MELODY_SEARCH_EXACT_COUNT_LIMIT = 10_000
+
+
 def ajax_melody_search(request):
     """
     Function-based view responding to melody search AJAX calls, accessed with ``melody``
 
-    The queryset is filtered according to the ``GET`` parameters
+    The queryset is filtered according to the ``GET`` parameters, and returned a
+    page at a time, in order of ID. Each page gives the ID after which the next
+    page starts in ``next``, or ``null`` if it is the last one. The total number
+    of results is only included in the first page (see count_melody_search_results()).
 
     ``GET`` parameters:
         ``notes``: Note sequence drawn on the canvas by the user
@@ -188,6 +188,8 @@ def ajax_melody_search(request):
         ``feast_name``: Filters by feast of chant
         ``mode``: Filters by mode of Chant
         ``source``: Search in a specific source
+        ``after``: Only return results with a greater ID (the ``next`` of the previous page)
+        ``page_size``: Number of results per page, at most MELODY_SEARCH_MAX_PAGE_SIZE
 
     Args:
         request (request): The request
@@ -205,6 +207,12 @@ def ajax_melody_search(request):
     feast_name = request.GET.get("feast")
     mode = request.GET.get("mode")
     source = request.GET.get("source")
+    try:
+        after = int(request.GET.get("after", 0))
+        page_size = int(request.GET.get("page_size", MELODY_SEARCH_PAGE_SIZE))
+    except ValueError:
+        return HttpResponseBadRequest("after and page_size must be integers")
+    page_size = max(1, min(page_size, MELODY_SEARCH_MAX_PAGE_SIZE))
 
     display_unpublished = request.user.is_authenticated
     if not display_unpublished:
@@ -216,28 +224,15 @@ def ajax_melody_search(request):
 
     # if "search exact matches + transpositions"
     if transpose == "true":
-        # calculate intervals
-        # replace '9' (the note G) with the char corresponding to (ASCII(a) - 1), because 'a' denotes the note A
-        notes_copy = list(notes.replace("9", chr(ord("a") - 1)))
-        # we model the interval between notes using the difference between the ASCII codes of corresponding letters
-        # the letter for the note B is "j" (106), note A is "h" (104), the letter "i" (105) is skipped
-        # move all notes above A down by one letter
-        for j, note in enumerate(notes_copy):
-            if ord(note) >= 106:
-                notes_copy[j] = chr(ord(note) - 1)
-        # `intervals` records the difference between two adjacent notes
-        intervals = "".join(
-            [
-                str(ord(notes_copy[j]) - ord(notes_copy[j - 1]))
-                for j in range(1, len(notes_copy))
-            ]
-        )
+        # search for the intervals between the notes, encoded in the same way as
+        # in the chants' volpiano_interval_codes field
+        intervals = generate_volpiano_interval_codes(notes)
         # if "search anywhere in the melody"
         if anywhere == "true":
-            chants = chants.filter(volpiano_intervals__contains=intervals)
+            chants = chants.filter(volpiano_interval_codes__contains=intervals)
         # if "search the beginning of melody"
         else:
-            chants = chants.filter(volpiano_intervals__startswith=intervals)
+            chants = chants.filter(volpiano_interval_codes__startswith=intervals)
     # if "search exact matches"
     else:
         # if "search anywhere in the melody"
@@ -282,14 +277,48 @@ def ajax_melody_search(request):
         )
     )
     # convert queryset to a list of dicts because QuerySet is not JSON serializable
-    # the above constructed queryset will be evaluated here
-    results = list(result_values)
+    # fetch one more result than needed, to know whether there is a next page
+    results = list(result_values.filter(id__gt=after)[: page_size + 1])
+    has_next_page = len(results) > page_size
+    results = results[:page_size]
+    chant_url = URLTemplate("chant-detail")
     for result in results:
         # construct the url for chant detail page and add it to the result
-        result["chant_link"] = reverse("chant-detail", args=[result["id"]])
+        result["chant_link"] = chant_url.format(result["id"])
+
+    response: dict[str, Any] = {
+        "results": results,
+        "next": results[-1]["id"] if has_next_page else None,
+    }
+    if "after" not in request.GET:
+        if has_next_page:
+            result_count, is_approximate = count_melody_search_results(result_values)
+        else:
+            # all the results are in this page
+            result_count, is_approximate = len(results), False
+        response["result_count"] = result_count
+        response["result_count_is_approximate"] = is_approximate
+    return JsonResponse(response, safe=True)
 
-    result_count = result_values.count()
-    return JsonResponse({"results": results, "result_count": result_count}, safe=True)
+
+def count_melody_search_results(results: QuerySet) -> tuple[int, bool]:
+    """Count the results of a melody search, unless the query planner estimates
+    that there are more than MELODY_SEARCH_EXACT_COUNT_LIMIT of them: short
+    melodies can match most of the chants, which would all have to be read to
+    count them exactly. In that case, return the estimate instead.
+
+    Args:
+        results (QuerySet): The results of the search
+
+    Returns:
+        tuple[int, bool]: The number of results, and whether it is an estimate
+    """
+    results = results.order_by()
+    plan = ujson.loads(results.explain(format="json"))
+    estimate = int(plan[0]["Plan"]["Plan Rows"])
+    if estimate > MELODY_SEARCH_EXACT_COUNT_LIMIT:
+        return estimate, True
+    return results.count(), False
 
 
 def ajax_search_bar(request, search_term):
@@ -339,12 +368,13 @@ def ajax_search_bar(request, search_term):
             "c_sequence",
         )
     )
+    chant_url = URLTemplate("chant-detail")
     for values_for_chant in returned_values:
-        chant_link = reverse("chant-detail", args=[values_for_chant["id"]])
-        values_for_chant["chant_link"] = chant_link
+        values_for_chant["chant_link"] = chant_url.format(values_for_chant["id"])
     return JsonResponse({"chants": returned_values}, safe=True)
 
 
+@cache_cantus_id_response
 def json_melody_export(request: HttpRequest, cantus_id: str) -> JsonResponse:
     """
     Similar to the ajax_melody_list view, but designed for external use (for instance,
@@ -355,6 +385,8 @@ def json_melody_export(request: HttpRequest, cantus_id: str) -> JsonResponse:
         cantus_id=cantus_id, volpiano__isnull=False, source__published=True
     ).select_related("source")
 
+    chant_url = URLTemplate("chant-detail", request)
+    source_url = URLTemplate("source-detail", request)
     chants_export: list[dict[str, Optional[Union[str, int]]]] = []
     for chant in chants:
         chant_values = {
@@ -374,18 +406,14 @@ def json_melody_export(request: HttpRequest, cantus_id: str) -> JsonResponse:
             "genre": chant.genre_id,
             "position": chant.position,
         }
-        chant_uri = request.build_absolute_uri(
-            reverse("chant-detail", args=[chant_values["nid"]])
-        )
-        chant_values["chantlink"] = chant_uri
-        src_uri = request.build_absolute_uri(
-            reverse("source-detail", args=[chant_values["srcnid"]])
-        )
-        chant_values["srclink"] = src_uri
+        chant_values["chantlink"] = chant_url.format(chant.id)
+        chant_values["srclink"] = source_url.format(chant.source_id)
 
         chants_export.append(chant_values)
 
-    return JsonResponse(chants_export, safe=False)
+    response = JsonResponse(chants_export, safe=False)
+    set_last_modified(response, chants)
+    return response
 
 
 def json_sources_export(request) -> JsonResponse:
@@ -396,24 +424,25 @@ def json_sources_export(request) -> JsonResponse:
     sources = cantus_segment.source_set.filter(published=True)
     ids = [source.id for source in sources]
 
-    csv_links = {id: build_json_sources_export_dictionary(id, request) for id in ids}
+    csv_url = URLTemplate("csv-export", request)
+    csv_links = {id: build_json_sources_export_dictionary(id, csv_url) for id in ids}
 
     return JsonResponse(csv_links)
 
 
-def build_json_sources_export_dictionary(id: int, request) -> dict:
+def build_json_sources_export_dictionary(id: int, csv_url: URLTemplate) -> dict:
     """Return a dictionary containing a link to the csv-export page for a source
 
     Args:
         id (int): the pk of the source
-        request: passed when this is called in json_sources_export. Used to get the domain
-            while building the CSV link
+        csv_url (URLTemplate): the absolute URLs of csv-export pages, built
+            in json_sources_export for the domain of the request
 
     Returns:
         dict: a dictionary with a single key, "csv", and a link to the source's csv-export
             page
     """
-    return {"csv": request.build_absolute_uri(reverse("csv-export", args=[id]))}
+    return {"csv": csv_url.format(id)}
 
 
 def json_nextchants(request, cantus_id):
@@ -422,6 +451,7 @@ def json_nextchants(request, cantus_id):
     return JsonResponse(suggested_chants_dict)
 
 
+@cache_cantus_id_response
 def json_cid_export(request, cantus_id: str) -> JsonResponse:
     """Return a JsonResponse containing information on all chants with a given
     Cantus ID, in the following format:
@@ -440,7 +470,9 @@ def json_cid_export(request, cantus_id: str) -> JsonResponse:
         ]
     }
     We believe Cantus Index uses this API in building its list of concordances
-    for a given Cantus ID across the databases in the Cantus Network
+    for a given Cantus ID across the databases in the Cantus Network, so the
+    response is cached, and clients can make conditional requests for it (see
+    cantus_id_cache.py)
 
     Args:
         request: the incoming request
@@ -455,31 +487,35 @@ def json_cid_export(request, cantus_id: str) -> JsonResponse:
         .filter(cantus_id=cantus_id)
         .filter(source__published=True)
     )
-    chant_dicts = [{"chant": build_json_cid_dictionary(c, request)} for c in chants]
-    response = {"chants": chant_dicts}
-    return JsonResponse(response)
+    chant_url = URLTemplate("chant-detail", request)
+    source_url = URLTemplate("source-detail", request)
+    chant_dicts = [
+        {"chant": build_json_cid_dictionary(c, chant_url, source_url)} for c in chants
+    ]
+    response = JsonResponse({"chants": chant_dicts})
+    set_last_modified(response, chants)
+    return response
 
 
-def build_json_cid_dictionary(chant, request) -> dict:
+def build_json_cid_dictionary(
+    chant, chant_url: URLTemplate, source_url: URLTemplate
+) -> dict:
     """Return a dictionary with information on a given chant in the database
 
     Args:
         chant: a Chant
-        request: passed when this is called in json_cid_export. Used to get the domain
-            while building the chant link
+        chant_url (URLTemplate): the absolute URLs of chant detail pages, built in
+            json_cid_export for the domain of the request
+        source_url (URLTemplate): the same, for source detail pages
 
     Returns:
         dict: a dictionary with information about the chant and its source, including
             absolute URLs for the chant and source detail pages
     """
-    source_relative_url = reverse("source-detail", args=[chant.source.id])
-    source_absolute_url = request.build_absolute_uri(source_relative_url)
-    chant_relative_url = reverse("chant-detail", args=[chant.id])
-    chant_absolute_url = request.build_absolute_uri(chant_relative_url)
     dictionary = {
         "siglum": chant.source.short_heading,
-        "srclink": source_absolute_url,
-        "chantlink": chant_absolute_url,
+        "srclink": source_url.format(chant.source_id),
+        "chantlink": chant_url.format(chant.id),
         "folio": chant.folio if chant.folio else "",
         "sequence": chant.c_sequence if chant.c_sequence else 0,
         "incipit": chant.incipit if chant.incipit else "",
@@ -645,10 +681,8 @@ def articles_list_export(request) -> HttpResponse:
         HttpResponse: A list of URLs, separated by newline characters
     """
     articles = Article.objects.all()
-    article_urls = [
-        request.build_absolute_uri(reverse("article-detail", args=[article.id]))
-        for article in articles
-    ]
+    article_url = URLTemplate("article-detail", request)
+    article_urls = [article_url.format(article.id) for article in articles]
     return HttpResponse(" ".join(article_urls), content_type="text/plain")
 
 
@@ -1,12 +1,13 @@
 import urllib.parse
 from collections import Counter, defaultdict
-from typing import Optional, Iterator, Any
+from typing import Optional, Any
 
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.mixins import UserPassesTestMixin
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
 from django.core.exceptions import PermissionDenied
-from django.db.models import Q, QuerySet
+from django.db.models import F, Q, QuerySet
 from django.forms import BaseModelForm
 from django.http import Http404, HttpResponse
 from django.shortcuts import get_object_or_404
@@ -21,16 +22,19 @@ from django.views.generic import (
 )
 from volpiano_display_utilities.latin_word_syllabification import LatinError
 from volpiano_display_utilities.cantus_text_syllabification import (
-    syllabify_text,
     flatten_syllabified_text,
 )
-from volpiano_display_utilities.text_volpiano_alignment import align_text_and_volpiano
 
 from cantusindex import (
     get_suggested_chants,
     get_suggested_fulltext,
     get_ci_text_search,
 )
+from main_app.alignment_cache import (
+    cached_align_text_and_volpiano,
+    cached_syllabify_text,
+    get_chant_alignment,
+)
 from main_app.forms import (
     ChantCreateForm,
     ChantEditForm,
@@ -49,6 +53,7 @@ from main_app.permissions import (
     user_can_proofread_chant,
     user_can_view_chant,
 )
+from main_app.source_navigation import get_feast_changes, get_folio_navigation
 from users.models import User
 
 CHANT_SEARCH_TEMPLATE_VALUES: tuple[str, ...] = (
@@ -111,6 +116,7 @@ def get_feast_selector_options(source: Source) -> list[tuple[str, int, str]]:
 
     Going through all chants in the source, folio by folio,
     a new entry (in the form of folio-feast) is added when the feast changes.
+    The entries are cached per source (see source_navigation.get_feast_changes()).
 
     Args:
         source (Source object): The source that the user is browsing in.
@@ -118,15 +124,49 @@ def get_feast_selector_options(source: Source) -> list[tuple[str, int, str]]:
     Returns:
         list of tuples: A list of folios and Feast objects, to be unpacked in template.
     """
-    folios_feasts_iter: Iterator[tuple[Optional[str], int, str]] = (
-        source.chant_set.exclude(feast=None)
-        .select_related("feast", "genre", "service")
-        .values_list("folio", "feast_id", "feast__name")
-        .order_by("folio", "c_sequence")
-        .iterator()
+    return get_feast_changes(source.id)
+
+
+def filter_by_full_text(queryset: QuerySet, keyword: str) -> QuerySet:
+    """Filter chants or sequences by a full-text search for `keyword`
+
+    Each result is annotated with its relevance to the search as ``rank``.
+    Chants are matched against their stored ``search_vector``, which is covered
+    by a GIN index (see Chant.Meta.indexes) and weights the chant's text and
+    source title above its genre, feast and service (see
+    Chant.index_components). Sequences have no stored search vector, so theirs
+    is built on the fly from the same fields, with the same weights, so that the
+    ranks of chants and sequences can be compared.
+
+    Args:
+        queryset (QuerySet): A QuerySet of Chants or Sequences.
+        keyword (str): The search terms, in the syntax accepted by web search
+            engines (e.g. `"alleluia" -pascha`).
+
+    Returns:
+        QuerySet: The matching chants/sequences, annotated with ``rank``.
+    """
+    query = SearchQuery(keyword, search_type="websearch")
+    if queryset.model is Chant:
+        document = F("search_vector")
+    else:
+        document = SearchVector(
+            "incipit",
+            "manuscript_full_text",
+            "manuscript_full_text_std_spelling",
+            "source__title",
+            weight="A",
+        ) + SearchVector("genre__name", "feast__name", "service__name", weight="B")
+    return (
+        queryset.alias(document=document)
+        .filter(document=query)
+        .annotate(rank=SearchRank(document, query))
     )
-    deduped_folios_feasts_lists = list(dict.fromkeys(folios_feasts_iter))
-    return deduped_folios_feasts_lists
+
+
+def reverse_order(order: str) -> str:
+    """Reverse an ordering given to QuerySet.order_by(), e.g. "-rank" to "rank"."""
+    return order[1:] if order.startswith("-") else f"-{order}"
 
 
 def get_chants_with_feasts(chants_in_folio: QuerySet) -> list:
@@ -162,7 +202,7 @@ def get_chants_with_folios(chants_in_feast: QuerySet) -> list:
     #   ...
     # ]
     folios_chants = defaultdict(list)
-    for chant in chants_in_feast.order_by("folio"):
+    for chant in chants_in_feast.order_by("folio_sort_key", "folio"):
         # if folios_chants is empty, or if your current chant in the for loop
         # belongs in a different folio than the last chant,
         # append a new list with your current chant's folio
@@ -206,13 +246,8 @@ class ChantDetailView(DetailView):
 
         # syllabification section
         if chant.volpiano:
-            has_syl_text = bool(chant.manuscript_syllabized_full_text)
             try:
-                text_and_mel, _ = align_text_and_volpiano(
-                    chant.get_best_text_for_syllabizing(),
-                    chant.volpiano,
-                    text_presyllabified=has_syl_text,
-                )
+                text_and_mel = get_chant_alignment(chant)
             except LatinError:
                 text_and_mel = None
             context["syllabized_text_with_melody"] = text_and_mel
@@ -226,46 +261,8 @@ class ChantDetailView(DetailView):
             return context
 
         # source navigation section
-        chants_in_source = chant.source.chant_set.select_related(
-            "source__holding_institution", "feast", "genre", "service"
-        )
-        context["folios"] = (
-            chants_in_source.values_list("folio", flat=True)
-            .distinct()
-            .order_by("folio")
-        )
-        folio_list = list(context["folios"])
-        index = folio_list.index(chant.folio)
-        context["previous_folio"] = folio_list[index - 1] if index != 0 else None
-        context["next_folio"] = (
-            folio_list[index + 1] if index < len(folio_list) - 1 else None
-        )
-
-        chants_current_folio = (
-            chants_in_source.filter(folio=chant.folio)
-            .prefetch_related("feast")
-            .order_by("c_sequence")
-        )
+        context.update(get_folio_navigation(source.id, chant.folio))
         context["exists_on_cantus_ultimus"] = source.exists_on_cantus_ultimus
-        context["feasts_current_folio"] = get_chants_with_feasts(chants_current_folio)
-
-        if context["previous_folio"]:
-            chants_previous_folio = (
-                chants_in_source.filter(folio=context["previous_folio"])
-                .prefetch_related("feast")
-                .order_by("c_sequence")
-            )
-            context["feasts_previous_folio"] = get_chants_with_feasts(
-                chants_previous_folio
-            )
-
-        if context["next_folio"]:
-            chants_next_folio = (
-                chants_in_source.filter(folio=context["next_folio"])
-                .prefetch_related("feast")
-                .order_by("c_sequence")
-            )
-            context["feasts_next_folio"] = get_chants_with_feasts(chants_next_folio)
 
         return context
 
@@ -323,7 +320,8 @@ class ChantSearchView(ListView):
                       Volpiano form. Valid values are "true" or "false".
         ``feast``: Filters by Feast of Chant
         ``keyword``: Searches text of Chant for keywords
-        ``op``: Operation to take with keyword search. Options are "contains" and "starts_with"
+        ``op``: Operation to take with keyword search. Options are "contains", "starts_with"
+                and "full_text" (ranked full-text search, ordered by relevance by default)
     """
 
     paginate_by = 100
@@ -398,6 +396,8 @@ class ChantSearchView(ListView):
         # Create a Q object to filter the QuerySet of Chants
         q_obj_filter = Q()
         display_unpublished = self.request.user.is_authenticated
+        # whether results are annotated with their relevance ("rank")
+        full_text_search = False
 
         # if the search is accessed by the global search bar
         if self.request.GET.get("search_bar"):
@@ -428,11 +428,13 @@ class ChantSearchView(ListView):
             else:
                 # if search bar is doing incipit search
                 search_term = self.request.GET.get("search_bar")
-                ms_spelling_filter = Q(manuscript_full_text__istartswith=search_term)
+                ms_spelling_filter = Q(
+                    manuscript_full_text__f_unaccent__istartswith=search_term
+                )
                 std_spelling_filter = Q(
-                    manuscript_full_text_std_spelling__istartswith=search_term
+                    manuscript_full_text_std_spelling__f_unaccent__istartswith=search_term
                 )
-                incipit_filter = Q(incipit__istartswith=search_term)
+                incipit_filter = Q(incipit__f_unaccent__istartswith=search_term)
                 search_term_filter = (
                     ms_spelling_filter | std_spelling_filter | incipit_filter
                 )
@@ -487,23 +489,35 @@ class ChantSearchView(ListView):
             if self.request.GET.get("keyword"):
                 keyword = self.request.GET.get("keyword")
                 operation: Optional[str] = self.request.GET.get("op")
-                if operation and operation == "contains":
-                    ms_spelling_filter = Q(manuscript_full_text__icontains=keyword)
+                # for "contains" and "starts_with" searches, the `f_unaccent` lookups
+                # match the trigram indexes in Chant.Meta.indexes, so these searches
+                # don't need to scan every chant
+                if operation == "full_text":
+                    full_text_search = True
+                    chant_set = filter_by_full_text(chant_set, keyword)
+                    sequence_set = filter_by_full_text(sequence_set, keyword)
+                elif operation and operation == "contains":
+                    ms_spelling_filter = Q(
+                        manuscript_full_text__f_unaccent__icontains=keyword
+                    )
                     std_spelling_filter = Q(
-                        manuscript_full_text_std_spelling__icontains=keyword
+                        manuscript_full_text_std_spelling__f_unaccent__icontains=keyword
                     )
-                    incipit_filter = Q(incipit__icontains=keyword)
+                    incipit_filter = Q(incipit__f_unaccent__icontains=keyword)
                 else:
-                    ms_spelling_filter = Q(manuscript_full_text__istartswith=keyword)
+                    ms_spelling_filter = Q(
+                        manuscript_full_text__f_unaccent__istartswith=keyword
+                    )
                     std_spelling_filter = Q(
-                        manuscript_full_text_std_spelling__istartswith=keyword
+                        manuscript_full_text_std_spelling__f_unaccent__istartswith=keyword
                     )
-                    incipit_filter = Q(incipit__istartswith=keyword)
-                keyword_filter = (
-                    ms_spelling_filter | std_spelling_filter | incipit_filter
-                )
-                chant_set = chant_set.filter(keyword_filter)
-                sequence_set = sequence_set.filter(keyword_filter)
+                    incipit_filter = Q(incipit__f_unaccent__istartswith=keyword)
+                if not full_text_search:
+                    keyword_filter = (
+                        ms_spelling_filter | std_spelling_filter | incipit_filter
+                    )
+                    chant_set = chant_set.filter(keyword_filter)
+                    sequence_set = sequence_set.filter(keyword_filter)
 
             # Fetch only the values necessary for rendering the template
             chant_set = chant_set.only(*ONLY_FIELDS)
@@ -535,12 +549,15 @@ class ChantSearchView(ListView):
                 order = "image_link"
             else:
                 order = order_get_param
+        elif full_text_search:
+            # unless another ordering is requested, show the most relevant results first
+            order = "-rank"
         else:
             order = "source__holding_institution__siglum"
 
-        # sort values: "asc" and "desc". Default is "asc"
+        # sort values: "asc" and "desc". Default is "asc"; "desc" reverses the ordering
         if sort_get_param and sort_get_param == "desc":
-            order = f"-{order}"
+            order = reverse_order(order)
 
         return queryset.order_by(order, "id")
 
@@ -585,7 +602,8 @@ class ChantSearchMSView(ListView):
                       Volpiano form. Valid values are "true" or "false".
         ``feast``: Filters by Feast of Chant
         ``keyword``: Searches text of Chant for keywords
-        ``op``: Operation to take with keyword search. Options are "contains" and "starts_with"
+        ``op``: Operation to take with keyword search. Options are "contains", "starts_with"
+                and "full_text" (ranked full-text search, ordered by relevance by default)
     """
 
     paginate_by = 100
@@ -714,9 +732,6 @@ class ChantSearchMSView(ListView):
         else:
             order = "siglum"
 
-        if sort := self.request.GET.get("sort"):
-            order = f"-{order}" if sort == "desc" else order
-
         source_id = self.kwargs["source_pk"]
         source = Source.objects.get(id=source_id)
         queryset = (
@@ -732,22 +747,35 @@ class ChantSearchMSView(ListView):
         # Finally, do keyword searching over the QuerySet
         if keyword := self.request.GET.get("keyword"):
             operation = self.request.GET.get("op")
-            # the operation parameter can be "contains" or "starts_with"
-            if operation == "contains":
-                ms_spelling_filter = Q(manuscript_full_text__icontains=keyword)
+            # the operation parameter can be "contains", "starts_with" or "full_text"
+            # (see ChantSearchView.get_queryset() for the `f_unaccent` lookups)
+            if operation == "full_text":
+                queryset = filter_by_full_text(queryset, keyword)
+                if not self.request.GET.get("order"):
+                    # unless another ordering is requested,
+                    # show the most relevant results first
+                    order = "-rank"
+            elif operation == "contains":
+                ms_spelling_filter = Q(
+                    manuscript_full_text__f_unaccent__icontains=keyword
+                )
                 std_spelling_filter = Q(
-                    manuscript_full_text_std_spelling__icontains=keyword
+                    manuscript_full_text_std_spelling__f_unaccent__icontains=keyword
                 )
-                incipit_filter = Q(incipit__icontains=keyword)
+                incipit_filter = Q(incipit__f_unaccent__icontains=keyword)
             else:
-                ms_spelling_filter = Q(manuscript_full_text__istartswith=keyword)
+                ms_spelling_filter = Q(
+                    manuscript_full_text__f_unaccent__istartswith=keyword
+                )
                 std_spelling_filter = Q(
-                    manuscript_full_text_std_spelling__istartswith=keyword
+                    manuscript_full_text_std_spelling__f_unaccent__istartswith=keyword
                 )
-                incipit_filter = Q(incipit__istartswith=keyword)
-
-            keyword_filter = ms_spelling_filter | std_spelling_filter | incipit_filter
-            queryset = queryset.filter(keyword_filter)
+                incipit_filter = Q(incipit__f_unaccent__istartswith=keyword)
+            if operation != "full_text":
+                keyword_filter = (
+                    ms_spelling_filter | std_spelling_filter | incipit_filter
+                )
+                queryset = queryset.filter(keyword_filter)
         if notes := self.request.GET.get("indexing_notes"):
             operation = self.request.GET.get("indexing_notes_op")
             # the operation parameter can be "contains" or "starts_with"
@@ -756,10 +784,12 @@ class ChantSearchMSView(ListView):
             else:
                 indexing_notes_filter = Q(indexing_notes__istartswith=notes)
             queryset = queryset.filter(indexing_notes_filter)
-        # ordering with the folio string gives wrong order
-        # old cantus is also not strictly ordered by folio (there are outliers)
-        # so we order by id for now, which is the order that the chants are entered into the DB
-        queryset = queryset.order_by(order, "id")
+        # sort values: "asc" and "desc". Default is "asc"; "desc" reverses the ordering
+        if self.request.GET.get("sort") == "desc":
+            order = reverse_order(order)
+        # chants that are equal in the requested ordering are listed in folio order
+        # (see BaseChant.folio_sort_key)
+        queryset = queryset.order_by(order, "folio_sort_key", "c_sequence", "id")
         return queryset
 
 
@@ -1022,7 +1052,11 @@ class SourceEditChantsView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         # if none of the optional search params are specified, the first folio in the
         # source is selected by default
         else:
-            folios = chants.values_list("folio", flat=True).distinct().order_by("folio")
+            folios = (
+                chants.values_list("folio", flat=True)
+                .distinct()
+                .order_by("folio_sort_key", "folio")
+            )
             if not folios:
                 # if the source has no chants (conceivable), or if it has chants but
                 # none of them have folios specified (we don't really expect this to happen)
@@ -1078,7 +1112,7 @@ class SourceEditChantsView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         folios = (
             chants_in_source.values_list("folio", flat=True)
             .distinct()
-            .order_by("folio")
+            .order_by("folio_sort_key", "folio")
         )
         context["folios"] = folios
         # the options for the feast selector on the right, same as the source detail page
@@ -1126,15 +1160,8 @@ class SourceEditChantsView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
 
         chant = self.get_object()
         if chant.volpiano:
-            has_syl_text = bool(chant.manuscript_syllabized_full_text)
-            # Note: the second value returned is a flag indicating whether the alignment process
-            # encountered errors. In future, this could be used to display a message to the user.
             try:
-                text_and_mel, _ = align_text_and_volpiano(
-                    chant.get_best_text_for_syllabizing(),
-                    chant.volpiano,
-                    text_presyllabified=has_syl_text,
-                )
+                text_and_mel = get_chant_alignment(chant)
             except LatinError as err:
                 messages.error(
                     self.request,
@@ -1234,7 +1261,7 @@ class ChantEditSyllabificationView(LoginRequiredMixin, UserPassesTestMixin, Upda
             # Second value returned is a flag indicating
             # whether the alignment process encountered errors.
             # In future, this could be used to display a message to the user.
-            text_and_mel, _ = align_text_and_volpiano(
+            text_and_mel, _ = cached_align_text_and_volpiano(
                 chant_text=self.flattened_syls_text,
                 volpiano=chant.volpiano,
                 text_presyllabified=True,
@@ -1248,7 +1275,7 @@ class ChantEditSyllabificationView(LoginRequiredMixin, UserPassesTestMixin, Upda
         chant = self.get_object()
         has_syl_text = bool(chant.manuscript_syllabized_full_text)
         try:
-            syls_text, _ = syllabify_text(
+            syls_text, _ = cached_syllabify_text(
                 text=chant.get_best_text_for_syllabizing(),
                 clean_text=True,
                 text_presyllabified=has_syl_text,
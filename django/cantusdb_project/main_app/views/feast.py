@@ -6,6 +6,7 @@ from django.db.models.functions import Lower
 from django.views.generic import DetailView, ListView
 from extra_views import SearchableListMixin
 
+from main_app.mixins import AnonymousCacheMixin
 from main_app.models import Feast
 
 # this categorization is not finalized yet
@@ -29,42 +30,41 @@ TEMP_PREFIX = [
 SANC_PREFIX = ["12", "13", "14", "15"]
 
 
+# These SQL queries read the FeastChantCount table (see feast_chant_counts.py),
+# which holds the number of chants of each feast in each source by Cantus ID and
+# genre, rather than aggregating over all of the feast's chants.
+
 # This SQL Query will return four columns: cantus_id, ccount, incipit, and genres.
-# These will be the field names when turned in to the Result named tuple. The genre
+# These will be the field names when turned in to the Result named tuple. The
+# incipit is that of the feast's first chant with the Cantus ID. The genre
 # column is an aggregate array of genre entries, with the separator "::" between the
 # fields.
-feast_chant_query: str = """SELECT cs.cantus_id, COUNT(cs.cantus_id) AS ccount,
-       (SELECT cs2.incipit
-        FROM main_app_chant AS cs2
-        WHERE cs.cantus_id = cs2.cantus_id
-        ORDER BY cs2.id LIMIT 1) as incipit,
+feast_chant_query: str = """SELECT fc.cantus_id, SUM(fc.count) AS ccount,
+       (array_agg(fc.incipit ORDER BY fc.first_chant_id))[1] AS incipit,
         array_remove(
                array_agg(DISTINCT gs.id || '::' || gs.name || '::' || gs.description),
                NULL
        ) AS genres
-FROM main_app_feast AS fs
-LEFT JOIN main_app_chant AS cs ON cs.feast_id = fs.id
-LEFT JOIN main_app_source AS ss ON cs.source_id = ss.id
-LEFT JOIN main_app_genre AS gs ON cs.genre_id = gs.id
-WHERE fs.id = %s AND cs.cantus_id IS NOT NULL {published_filt}
-GROUP BY cs.cantus_id
+FROM main_app_feastchantcount AS fc
+LEFT JOIN main_app_genre AS gs ON fc.genre_id = gs.id
+WHERE fc.feast_id = %s AND fc.cantus_id IS NOT NULL {published_filt}
+GROUP BY fc.cantus_id
 ORDER BY ccount desc;"""
 
 # This SQL query will return five columns: the source ID, shelfmark, the holding
 # institution siglum and name, and count of the number of chants in that source
-# that match a given feast.
-feast_source_query: str = """SELECT DISTINCT ss.id AS source_id, ss.shelfmark, 
-                COALESCE(hs.siglum, 'Private') as siglum, 
-                hs.name AS institution_name, 
-                (SELECT COUNT(cs2.id) 
-                 FROM main_app_chant AS cs2 
-                 WHERE cs2.source_id = ss.id AND cs2.feast_id = %s) AS chant_count
-FROM main_app_source ss
+# that match a given feast. Only the sources with at least one chant of the feast
+# with a Cantus ID are returned.
+feast_source_query: str = """SELECT ss.id AS source_id, ss.shelfmark,
+                COALESCE(hs.siglum, 'Private') as siglum,
+                hs.name AS institution_name,
+                SUM(fc.count) AS chant_count
+FROM main_app_feastchantcount AS fc
+         JOIN main_app_source AS ss ON fc.source_id = ss.id
          LEFT JOIN main_app_institution AS hs ON ss.holding_institution_id = hs.id
-         LEFT JOIN main_app_chant AS cs ON cs.source_id = ss.id
-         LEFT JOIN main_app_feast AS fs ON cs.feast_id = fs.id
-WHERE fs.id = %s AND cs.cantus_id IS NOT NULL {published_filt}
+WHERE fc.feast_id = %s {published_filt}
 GROUP BY ss.id, hs.name, hs.siglum
+HAVING COUNT(fc.cantus_id) > 0
 ORDER BY chant_count DESC, siglum;
 """
 
@@ -86,7 +86,7 @@ def namedtuple_fetch(results, description) -> Generator[NamedTuple, None, None]:
         yield nt_result(*res)
 
 
-class FeastDetailView(DetailView):
+class FeastDetailView(AnonymousCacheMixin, DetailView):
     model = Feast
     context_object_name = "feast"
     template_name = "feast_detail.html"
@@ -101,10 +101,10 @@ class FeastDetailView(DetailView):
         # only those from published sources.
         if not display_unpublished:
             chant_sql_query = feast_chant_query.format(
-                published_filt="AND ss.published IS TRUE"
+                published_filt="AND fc.published IS TRUE"
             )
             source_sql_query = feast_source_query.format(
-                published_filt="AND ss.published IS TRUE"
+                published_filt="AND fc.published IS TRUE"
             )
         else:
             chant_sql_query = feast_chant_query.format(published_filt="")
@@ -119,7 +119,7 @@ class FeastDetailView(DetailView):
         context["frequent_chants_count"] = num_chant_results
 
         with connection.cursor() as cursor:
-            cursor.execute(source_sql_query, [feast_id, feast_id])
+            cursor.execute(source_sql_query, [feast_id])
             num_sources_results = cursor.rowcount
             sources_from_db = namedtuple_fetch(cursor.fetchall(), cursor.description)
 
@@ -1,6 +1,6 @@
 from django.views.generic import DetailView, ListView
 from main_app.models import Genre
-from main_app.mixins import JSONResponseMixin
+from main_app.mixins import AnonymousCacheMixin, JSONResponseMixin
 
 
 class GenreDetailView(JSONResponseMixin, DetailView):
@@ -10,7 +10,7 @@ class GenreDetailView(JSONResponseMixin, DetailView):
     json_fields = ["id", "name", "description", "mass_office"]
 
 
-class GenreListView(JSONResponseMixin, ListView):
+class GenreListView(AnonymousCacheMixin, JSONResponseMixin, ListView):
     model = Genre
     paginate_by = 100
     context_object_name = "genres"
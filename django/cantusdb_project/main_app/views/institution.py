@@ -2,10 +2,11 @@ from django.db.models import Count, Subquery, OuterRef, Aggregate, F, Q, Func
 from django.views.generic import DetailView, ListView
 
 from main_app.identifiers import IDENTIFIER_TYPES, TYPE_PREFIX
+from main_app.mixins import AnonymousCacheMixin
 from main_app.models import Institution, Source, Segment, InstitutionIdentifier
 
 
-class InstitutionListView(ListView):
+class InstitutionListView(AnonymousCacheMixin, ListView):
     model = Institution
     context_object_name = "institutions"
     paginate_by = 100
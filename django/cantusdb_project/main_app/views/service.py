@@ -1,7 +1,7 @@
 from django.views.generic import DetailView, ListView
 
 from main_app.models import Service
-from main_app.mixins import JSONResponseMixin
+from main_app.mixins import AnonymousCacheMixin, JSONResponseMixin
 
 
 class ServiceDetailView(JSONResponseMixin, DetailView):
@@ -11,7 +11,7 @@ class ServiceDetailView(JSONResponseMixin, DetailView):
     json_fields = ["id", "name", "description"]
 
 
-class ServiceListView(JSONResponseMixin, ListView):
+class ServiceListView(AnonymousCacheMixin, JSONResponseMixin, ListView):
     model = Service
     queryset = Service.objects.order_by("name")
     paginate_by = 100
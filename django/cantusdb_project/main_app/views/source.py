@@ -19,6 +19,7 @@ from django.views.generic import (
 )
 
 from main_app.forms import SourceCreateForm, SourceEditForm
+from main_app.mixins import AnonymousCacheMixin
 from main_app.models import (
     Century,
     Chant,
@@ -36,6 +37,7 @@ from main_app.permissions import (
     user_can_manage_source_editors,
 )
 from main_app.views.chant import (
+    filter_by_full_text,
     get_feast_selector_options,
     user_can_edit_chants_in_source,
 )
@@ -52,6 +54,8 @@ class SourceBrowseChantsView(ListView):
     ``GET`` parameters:
         ``feast``: Filters by Feast of Chant
         ``search_text``: Filters by text of Chant
+        ``op``: How to search by ``search_text``. Options are "contains" (the default)
+                and "full_text" (ranked full-text search, ordered by relevance)
         ``genre``: Filters by genre of Chant
         ``folio``: Filters by folio of Chant
     """
@@ -95,12 +99,15 @@ class SourceBrowseChantsView(ListView):
             chants = chants.filter(folio=folio)
         if search_text:
             search_text = search_text.replace("+", " ").strip(" ")
+            if self.request.GET.get("op") == "full_text":
+                chants = filter_by_full_text(chants, search_text)
+                return chants.order_by("-rank", "folio_sort_key", "c_sequence")
             chants = chants.filter(
                 Q(manuscript_full_text_std_spelling__icontains=search_text)
                 | Q(incipit__icontains=search_text)
                 | Q(manuscript_full_text__icontains=search_text)
             )
-        return chants.order_by("folio", "c_sequence")
+        return chants.order_by("folio_sort_key", "c_sequence")
 
     def get_context_data(self, **kwargs):
         context: dict = super().get_context_data(**kwargs)
@@ -149,7 +156,7 @@ class SourceBrowseChantsView(ListView):
         folios: tuple[str] = (
             chants_in_source.values_list("folio", flat=True)
             .distinct()
-            .order_by("folio")
+            .order_by("folio_sort_key", "folio")
         )
         context["folios"] = folios
 
@@ -168,7 +175,7 @@ class SourceBrowseChantsView(ListView):
         return context
 
 
-class SourceDetailView(DetailView):
+class SourceDetailView(AnonymousCacheMixin, DetailView):
     model = Source
     context_object_name = "source"
     template_name = "source_detail.html"
@@ -192,14 +199,16 @@ class SourceDetailView(DetailView):
             sequences = source.sequence_set.select_related("genre", "service")
             context["sequences"] = sequences.order_by("s_sequence")
             context["folios"] = (
-                sequences.values_list("folio", flat=True).distinct().order_by("folio")
+                sequences.values_list("folio", flat=True)
+                .distinct()
+                .order_by("folio_sort_key", "folio")
             )
         else:
             # if this is a chant source
             folios = (
                 source.chant_set.values_list("folio", flat=True)
                 .distinct()
-                .order_by("folio")
+                .order_by("folio_sort_key", "folio")
             )
             context["folios"] = folios
             # the options for the feast selector on the right, only chant sources have this
@@ -211,7 +220,7 @@ class SourceDetailView(DetailView):
         return context
 
 
-class SourceListView(ListView):  # type: ignore
+class SourceListView(AnonymousCacheMixin, ListView):  # type: ignore
     model = Source
     paginate_by = 100
     context_object_name = "sources"
@@ -289,10 +298,11 @@ class SourceListView(ListView):  # type: ignore
                 holding_institution_city_q |= Q(
                     holding_institution__city__icontains=term
                 )
-                shelfmark_q |= Q(shelfmark__unaccent__icontains=term)
+                # the `f_unaccent` lookups match the trigram indexes in Source.Meta.indexes
+                shelfmark_q |= Q(shelfmark__f_unaccent__icontains=term)
                 siglum_q |= Q(holding_institution__siglum__unaccent__icontains=term)
-                description_q |= Q(description__unaccent__icontains=term)
-                summary_q |= Q(summary__unaccent__icontains=term)
+                description_q |= Q(description__f_unaccent__icontains=term)
+                summary_q |= Q(summary__f_unaccent__icontains=term)
                 # provenance_q |= Q(provenance__name__icontains=term)
             # All the Q objects are put together with OR.
             # The end result is that at least one term has to match in at least one
@@ -441,14 +451,14 @@ class SourceEditView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
             context["folios"] = (
                 source.sequence_set.values_list("folio", flat=True)
                 .distinct()
-                .order_by("folio")
+                .order_by("folio_sort_key", "folio")
             )
         else:
             # if this is a chant source
             folios = (
                 source.chant_set.values_list("folio", flat=True)
                 .distinct()
-                .order_by("folio")
+                .order_by("folio_sort_key", "folio")
             )
             context["folios"] = folios
             # the options for the feast selector on the right, only chant sources have this
@@ -507,7 +517,7 @@ class SourceInventoryView(TemplateView):
         else:
             queryset = (
                 source.chant_set.annotate(record_type=Value("chant"))
-                .order_by("folio", "c_sequence")
+                .order_by("folio_sort_key", "c_sequence")
                 .select_related("feast", "service", "genre", "diff_db")
             )
 
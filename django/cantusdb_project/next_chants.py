@@ -1,5 +1,11 @@
-from main_app.models import Chant
-from collections import Counter
+from main_app.models import Chant, NextChantCount, Source
+from main_app.models.chant import get_next_folio
+from bisect import bisect_right
+from collections import defaultdict
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+from typing import Iterable, Optional
 
 
 def next_chants(cantus_id, display_unpublished=False):
@@ -8,25 +14,253 @@ def next_chants(cantus_id, display_unpublished=False):
     specified chant in those manuscripts, and count how often each
     following chant occurs.
 
+    The counts are read from the NextChantCount table, which is kept up to
+    date by update_next_chant_counts(), so this is a single indexed query.
+
     Returns:
         list of duples, each representing a cantusID-count pair
     """
-    concordances = Chant.objects.filter(cantus_id=cantus_id).only(
-        "source", "folio", "c_sequence"
-    )
+    counts = NextChantCount.objects.filter(cantus_id=cantus_id)
     if not display_unpublished:
-        concordances = concordances.filter(source__published=True)
-
-    next_chants = [
-        chant.next_chant for chant in concordances if chant.next_chant is not None
-    ]
-    ids = [
-        chant.cantus_id for chant in next_chants if chant.cantus_id is not None
-    ]  # chant would be None if .get_next_chant() returned None,
-    # i.e. if the chant in concordances was the last in the manuscript
-    counts = Counter(ids)
-    ids_and_counts = [
-        item for item in counts.items()
-    ]  # each item is an id-count key-value pair
+        counts = counts.filter(published=True)
+    counts = (
+        counts.values("next_cantus_id")
+        .annotate(total=Sum("count"))
+        .order_by("-total", "next_cantus_id")
+        .values_list("next_cantus_id", "total")
+    )
+    ids_and_counts = list(counts)  # each item is an id-count key-value pair
 
     return ids_and_counts
+
+
+def update_next_chant_counts(
+    source_ids: Iterable[int], cantus_ids: Optional[Iterable[str]] = None
+) -> None:
+    """Recompute the NextChantCount rows of several sources from the
+    next_chant fields of their chants.
+
+    Called in signals.refresh_source_counts() and signals.update_chant_counts(),
+    and by the update_next_chant_counts and add_cantus_index_merge_events
+    commands.
+
+    Args:
+        source_ids (Iterable[int]): The IDs of the sources to update
+        cantus_ids (Iterable[str], optional): If given, only the rows of these
+            Cantus IDs, as the Cantus ID of a chant or of its next chant, are
+            recomputed
+    """
+    source_ids = list(source_ids)
+    rows = NextChantCount.objects.filter(source_id__in=source_ids)
+    counts = (
+        Chant.objects.filter(
+            source_id__in=source_ids,
+            cantus_id__isnull=False,
+            next_chant__cantus_id__isnull=False,
+        )
+        .values(
+            "source_id",
+            "cantus_id",
+            next_cantus_id=F("next_chant__cantus_id"),
+            published=F("source__published"),
+        )
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+    if cantus_ids is not None:
+        cantus_ids = list(cantus_ids)
+        rows = rows.filter(
+            Q(cantus_id__in=cantus_ids) | Q(next_cantus_id__in=cantus_ids)
+        )
+        counts = counts.filter(
+            Q(cantus_id__in=cantus_ids) | Q(next_chant__cantus_id__in=cantus_ids)
+        )
+    with transaction.atomic():
+        rows.delete()
+        NextChantCount.objects.bulk_create(
+            NextChantCount(**row) for row in counts.iterator()
+        )
+
+
+def update_next_chant_counts_published(source: Source) -> None:
+    """Keep the published field of a source's NextChantCount rows in line with
+    the source's.
+
+    Called in signals.on_source_save()
+    """
+    NextChantCount.objects.filter(source=source).exclude(
+        published=source.published
+    ).update(published=source.published)
+
+
+def compute_next_chants(chants: Iterable[Chant]) -> dict[int, Optional[int]]:
+    """Find the next chant of each of the chants of a source, in the same way
+    as Chant.get_next_chant(), without querying the database.
+
+    The next chant of a chant is:
+    - the chant on the same folio whose c_sequence is one more than the chant's
+      (or none, if there are several of them), or else
+    - the chant on the same folio with the smallest greater c_sequence, or else
+    - the chant with the smallest c_sequence on the next folio (see
+      get_next_folio()).
+
+    Unlike Chant.get_next_chant(), chants without a folio have no next chant on
+    the "next folio", and if several chants would have the same next chant
+    (which Chant.next_chant, a one-to-one field, doesn't allow), only the one
+    with the smallest ID keeps it.
+
+    Args:
+        chants (Iterable[Chant]): All the chants of a source, with at least
+            their id, folio and c_sequence fields
+
+    Returns:
+        dict[int, Optional[int]]: The ID of the next chant of each chant, or
+            None if it has no next chant, keyed by chant ID
+    """
+    chants_by_folio: dict[Optional[str], list[Chant]] = defaultdict(list)
+    for chant in chants:
+        chants_by_folio[chant.folio].append(chant)
+    for folio_chants in chants_by_folio.values():
+        # like order_by("c_sequence"), which puts chants without c_sequence last
+        folio_chants.sort(
+            key=lambda chant: (chant.c_sequence is None, chant.c_sequence, chant.id)
+        )
+    sequences_by_folio: dict[Optional[str], list[int]] = {
+        folio: [
+            chant.c_sequence for chant in folio_chants if chant.c_sequence is not None
+        ]
+        for folio, folio_chants in chants_by_folio.items()
+    }
+
+    def find_next_chant(chant: Chant) -> Optional[Chant]:
+        if chant.c_sequence is None:
+            return None
+        folio_chants = chants_by_folio[chant.folio]
+        sequences = sequences_by_folio[chant.folio]
+        # index of the first chant on the folio with a greater c_sequence
+        index = bisect_right(sequences, chant.c_sequence)
+        if index < len(sequences):
+            if sequences[index] != chant.c_sequence + 1:
+                return folio_chants[index]
+            if index + 1 < len(sequences) and sequences[index + 1] == sequences[index]:
+                # several chants have the subsequent c_sequence
+                return None
+            return folio_chants[index]
+        if chant.folio is None:
+            return None
+        next_folio_chants = chants_by_folio.get(get_next_folio(chant.folio))
+        if not next_folio_chants:
+            return None
+        return next_folio_chants[0]
+
+    next_chant_ids: dict[int, Optional[int]] = {}
+    claimed_ids: set[int] = set()
+    all_chants = sorted(
+        (chant for folio_chants in chants_by_folio.values() for chant in folio_chants),
+        key=lambda chant: chant.id,
+    )
+    for chant in all_chants:
+        next_chant = find_next_chant(chant)
+        if next_chant is None or next_chant.id in claimed_ids:
+            next_chant_ids[chant.id] = None
+        else:
+            claimed_ids.add(next_chant.id)
+            next_chant_ids[chant.id] = next_chant.id
+    return next_chant_ids
+
+
+def write_next_chant_fields(chants: list[Chant]) -> None:
+    """Write the next_chant and is_last_chant_in_feast fields of several
+    chants with a single UPDATE query, setting their date_updated like save()
+    would.
+
+    This does the same as `Chant.objects.bulk_update(chants, [...])`, which
+    builds a CASE expression with one branch per chant, and takes much longer
+    to build and run when there are thousands of chants.
+    """
+    table = Chant._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {table}
+            SET next_chant_id = new_values.next_chant_id,
+                is_last_chant_in_feast = new_values.is_last_chant_in_feast,
+                date_updated = %s
+            FROM (
+                SELECT
+                    UNNEST(%s::integer[]) AS id,
+                    UNNEST(%s::integer[]) AS next_chant_id,
+                    UNNEST(%s::boolean[]) AS is_last_chant_in_feast
+            ) AS new_values
+            WHERE {table}.id = new_values.id
+            """,
+            [
+                timezone.now(),
+                [chant.id for chant in chants],
+                [chant.next_chant_id for chant in chants],
+                [chant.is_last_chant_in_feast for chant in chants],
+            ],
+        )
+
+
+def update_next_chant_fields(source_id: int) -> int:
+    """Compute the next_chant and is_last_chant_in_feast fields of all the
+    chants of a source, loading the chants with a single query and writing
+    the fields that have changed with a single query.
+
+    A chant is the last chant in its feast if its next chant belongs to
+    another feast. is_last_chant_in_feast is None for chants without a next
+    chant.
+
+    Args:
+        source_id (int): The ID of the source
+
+    Returns:
+        int: The number of chants whose fields were changed
+    """
+    with transaction.atomic():
+        chants = list(
+            Chant.objects.filter(source_id=source_id).only(
+                "id",
+                "folio",
+                "c_sequence",
+                "feast_id",
+                "next_chant_id",
+                "is_last_chant_in_feast",
+            )
+        )
+        chants_by_id = {chant.id: chant for chant in chants}
+        next_chant_ids = compute_next_chants(chants)
+
+        changed_chants: list[Chant] = []
+        for chant in chants:
+            next_chant_id = next_chant_ids[chant.id]
+            if next_chant_id is None:
+                is_last_chant_in_feast = None
+            else:
+                next_feast_id = chants_by_id[next_chant_id].feast_id
+                is_last_chant_in_feast = next_feast_id != chant.feast_id
+            if (
+                chant.next_chant_id != next_chant_id
+                or chant.is_last_chant_in_feast != is_last_chant_in_feast
+            ):
+                chant.next_chant_id = next_chant_id
+                chant.is_last_chant_in_feast = is_last_chant_in_feast
+                changed_chants.append(chant)
+
+        # next_chant is unique: release the next chants that are being
+        # reassigned before assigning them again. Chants in other sources
+        # can't have a next chant in this source.
+        chants_in_other_sources = Chant.objects.filter(
+            next_chant__source_id=source_id
+        ).exclude(source_id=source_id)
+        other_source_ids = set(
+            chants_in_other_sources.values_list("source_id", flat=True)
+        )
+        chants_in_other_sources.update(next_chant=None, date_updated=timezone.now())
+        Chant.objects.filter(id__in=[chant.id for chant in changed_chants]).update(
+            next_chant=None
+        )
+        write_next_chant_fields(changed_chants)
+        update_next_chant_counts([source_id, *other_source_ids])
+    return len(changed_chants)
@@ -1,5 +1,6 @@
 window.addEventListener("load", function () {
     const searchText = document.getElementById("search");
+    const searchOp = document.getElementById("searchOp");
     const sourceFilter = document.getElementById("sourceFilter");
     const feastFilter = document.getElementById("feastFilter");
     const feastSelect = document.getElementById("feastSelect");
@@ -9,6 +10,9 @@ window.addEventListener("load", function () {
     // Make sure the select components keep their values across multiple GET requests
     // so the user can "drill down" on what they want
     const urlParams = new URLSearchParams(window.location.search);
+    if (urlParams.has("op")) {
+        searchOp.value = urlParams.get("op");
+    }
     if (urlParams.has("source")) {
         sourceFilter.value = urlParams.get("source");
     }
@@ -24,6 +28,7 @@ window.addEventListener("load", function () {
     }
 
     searchText.addEventListener("change", setSearch);
+    searchOp.addEventListener("change", setSearch);
     sourceFilter.addEventListener("change", setSource);
     feastFilter.addEventListener("change", setFeastLeft);
     feastSelect.addEventListener("change", setFeastRight);
@@ -38,6 +43,7 @@ window.addEventListener("load", function () {
     function setSearch() {
         const searchTerm = searchText.value;
         url.searchParams.set('search_text', searchTerm);
+        url.searchParams.set('op', searchOp.value);
         window.location.assign(url);
     }
 
@@ -48,6 +54,7 @@ window.addEventListener("load", function () {
         url.searchParams.delete('source');
         url.searchParams.delete('feast');
         url.searchParams.delete('search_text');
+        url.searchParams.delete('op');
         url.searchParams.delete('genre');
         url.searchParams.delete('folio');
         window.location.assign(url);
@@ -23,6 +23,17 @@ function melodySearch() {
     // potentially with wrong results from the older requests
     // therefore we keep a pointer to the last request and abort it whenever sending a new request
     var lastXhttp = new XMLHttpRequest();
+    // the results are loaded a page at a time: `searchUrl` is the url of the current search,
+    // and `nextPage` is the ID after which its next page starts, or null if all the results have been loaded
+    var searchUrl = null;
+    var nextPage = null;
+    // the next page is loaded when the element below the results table (the "sentinel") is scrolled into view
+    const nextPageObserver = new IntersectionObserver((entries) => {
+        // don't load the next page if it is already being loaded
+        if (entries[entries.length - 1].isIntersecting && nextPage !== null && lastXhttp.readyState === XMLHttpRequest.DONE) {
+            loadPage(nextPage);
+        }
+    });
     const drawArea = document.getElementById("drawArea");
     const deleteOneButton = document.getElementById("deleteOne");
     const deleteAllButton = document.getElementById("deleteAll");
@@ -194,17 +205,22 @@ function melodySearch() {
         }
     }
 
-    // make an ajax call to the Django backend: do the search and return results
+    // make an ajax call to the Django backend: do the search and display the first page of results
     function search() {
         // if there's no notes, don't search
         // this happens when the user fills in the search fields but doesn't input melody
         if (notes === "") {
             return;
         }
-        // whenever a new search begins, abort the previous one, so that it does not update the result table with wrong data
-        lastXhttp.abort()
-        const xhttp = new XMLHttpRequest();
-        // construct the ajax url with search parameters
+        // the next pages are loaded by `loadPage` when the end of the results table is scrolled into view
+        // the URL is built now, so that the next pages use the same search parameters
+        searchUrl = buildSearchUrl();
+        nextPage = null;
+        loadPage(null);
+    }
+
+    // construct the ajax url with search parameters
+    function buildSearchUrl() {
         const url = new URL("/ajax/melody-search/", window.location.origin);
         url.searchParams.append("notes", notes);
         url.searchParams.append("anywhere", anywhere);
@@ -218,13 +234,30 @@ function melodySearch() {
         if (searchInSource) {
             url.searchParams.append("source", urlParams.get("source"));
         }
+        return url;
+    }
 
+    // fetch a page of results: the first page if `after` is null, otherwise the results after the chant with that ID
+    function loadPage(after) {
+        // whenever a new search begins, abort the previous one, so that it does not update the result table with wrong data
+        lastXhttp.abort()
+        const xhttp = new XMLHttpRequest();
+        const url = new URL(searchUrl);
+        if (after !== null) {
+            url.searchParams.append("after", after);
+        }
 
         xhttp.open("GET", url);
         xhttp.onload = function () {
             const data = JSON.parse(this.response);
-            resultsDiv.innerHTML = `Search results <b>(${data.result_count} melodies)</b>`;
-            resultsDiv.innerHTML += `<table id="resultsTable" class="table table-bordered table-sm small" style="table-layout: fixed; width: 100%;"><tbody></tbody></table>`;
+            if (after === null) {
+                const approximately = data.result_count_is_approximate ? "about " : "";
+                resultsDiv.innerHTML = `Search results <b>(${approximately}${data.result_count} melodies)</b>`;
+                resultsDiv.innerHTML += `<table id="resultsTable" class="table table-bordered table-sm small" style="table-layout: fixed; width: 100%;"><tbody></tbody></table>`;
+                resultsDiv.innerHTML += `<div id="nextPageSentinel"></div>`;
+                nextPageObserver.disconnect();
+                nextPageObserver.observe(document.getElementById("nextPageSentinel"));
+            }
 
             const table = document.getElementById("resultsTable").getElementsByTagName("tbody")[0];
             data.results.map(chant => {
@@ -248,8 +281,14 @@ function melodySearch() {
                                             <div style="float: right">${chant.feast__name}</div>
                                     </td>`;
             });
+            nextPage = data.next;
             // hide the "updating results" prompt after loading the data
             document.getElementById("searchingPrompt").style.display = "none";
+            // if the end of the table is still in view (e.g. the page is short), load the next page straight away
+            const sentinel = document.getElementById("nextPageSentinel");
+            if (nextPage !== null && sentinel.getBoundingClientRect().top < window.innerHeight) {
+                loadPage(nextPage);
+            }
         }
         xhttp.onerror = function () {
             // handle errors